@@ -0,0 +1,150 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+
+from authentication.tokens import ACCESS, InvalidToken, decode_token, token_user
+
+
+class TokenCache:
+    """
+    Bounded LRU of token key -> (user, token) pairs with a TTL.
+
+    Entries are evicted when the token is deleted (logout) or its user is saved or deleted, which covers
+    deactivation. Eviction happens in the process handling the change, other processes drop the entry
+    after settings.TOKEN_CACHE_TTL seconds, so the TTL bounds how long a revoked token may still be accepted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._entries[key] = (user, token, time.monotonic() + settings.TOKEN_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_MAX_SIZE:
+                self._entries.popitem(last=False)
+
+    def evict(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (user, _, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'size': len(self._entries),
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication memoizing the token and user lookup in token_cache.
+    Disabled with settings.TOKEN_CACHE_TTL = 0.
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE_TTL:
+            return super().authenticate_credentials(key)
+
+        cached = token_cache.get(key)
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+            cached = user, token
+        # Every request gets its own copy, views may change request.user.
+        user, token = cached
+        return copy.copy(user), token
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views, looking the token up with the async ORM.
+        """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        cached = token_cache.get(key) if settings.TOKEN_CACHE_TTL else None
+        if cached is None:
+            try:
+                token = await self.get_model().objects.select_related('user').aget(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+            cached = token.user, token
+            if settings.TOKEN_CACHE_TTL:
+                token_cache.set(key, *cached)
+        user, token = cached
+        return copy.copy(user), token
+
+
+class JWTAuthentication(BaseAuthentication):
+    """
+    Stateless authentication by signed access tokens in the 'Authorization: Bearer <token>' header.
+    Verifying a token takes no database queries while the denylist is cached, the user is built from its claims.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        try:
+            claims = decode_token(auth[1].decode(), ACCESS)
+        except (InvalidToken, UnicodeError) as error:
+            raise exceptions.AuthenticationFailed(f'Invalid token: {error}')
+        if not claims['is_active']:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return token_user(claims), claims
+
+    async def aauthenticate(self, request):
+        # The denylist may be loaded from the database.
+        return await sync_to_async(self.authenticate)(request)
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from authentication.authentication import CachedTokenAuthentication, JWTAuthentication, token_cache
+from authentication.tokens import issue_tokens
+from service.management.benchmarks import median_ms
+
+
+class Command(BaseCommand):
+    """
+    Measuring the overhead of authenticating one request with each authentication class.
+    The user is created inside a transaction which is rolled back afterwards.
+    """
+    help = 'Benchmark of TokenAuthentication against the token cache and stateless JWT access tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=1_000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), override_settings(DEBUG=False):
+            user = User.objects.create(username='benchmark_auth_user')
+            token = Token.objects.create(user=user)
+            access = issue_tokens(user)['access']
+            token_cache.clear()
+
+            factory = APIRequestFactory()
+            cases = [
+                ('TokenAuthentication', TokenAuthentication(), f'Token {token.key}'),
+                ('CachedTokenAuthentication', CachedTokenAuthentication(), f'Token {token.key}'),
+                ('JWTAuthentication', JWTAuthentication(), f'Bearer {access}'),
+            ]
+            for name, authentication, header in cases:
+                def authenticate():
+                    authentication.authenticate(Request(factory.get('/', HTTP_AUTHORIZATION=header)))
+
+                authenticate()
+                with CaptureQueriesContext(connection) as context:
+                    authenticate()
+                elapsed_ms = median_ms(options['repeat'], authenticate)
+
+                self.stdout.write(f'{name:>26}: {elapsed_ms * 1000:8.1f} us, '
+                                  f'{len(context.captured_queries)} queries per request '
+                                  f'(median of {options["repeat"]})')
+            token_cache.clear()
+            transaction.set_rollback(True)
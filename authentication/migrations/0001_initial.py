@@ -0,0 +1,29 @@
+# Generated by Django 5.0.3 on 2026-10-18 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedToken',
+            fields=[
+                ('jti', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('expires_at', models.IntegerField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RevokedUserTokens',
+            fields=[
+                ('user_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('issued_before', models.FloatField()),
+                ('expires_at', models.IntegerField(db_index=True)),
+            ],
+        ),
+    ]
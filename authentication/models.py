@@ -1 +1,19 @@
 from django.db import models
+
+
+class RevokedToken(models.Model):
+    """
+    Signed token rejected until it expires by itself, see authentication.tokens.revoke_token.
+    """
+    jti = models.CharField(max_length=32, primary_key=True)
+    expires_at = models.IntegerField(db_index=True)
+
+
+class RevokedUserTokens(models.Model):
+    """
+    Signed tokens of the user issued up to issued_before, rejected until the last of them expires.
+    Not a foreign key, the tokens of deleted users stay revoked.
+    """
+    user_id = models.IntegerField(primary_key=True)
+    issued_before = models.FloatField()
+    expires_at = models.IntegerField(db_index=True)
@@ -0,0 +1,11 @@
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.plumbing import build_bearer_security_scheme_object
+
+
+class JWTAuthenticationScheme(OpenApiAuthenticationExtension):
+    target_class = 'authentication.authentication.JWTAuthentication'
+    name = 'jwtAuth'
+
+    def get_security_definition(self, auto_schema):
+        return build_bearer_security_scheme_object(header_name='Authorization', token_prefix='Bearer',
+                                                   bearer_format='JWT')
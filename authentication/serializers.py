@@ -0,0 +1,63 @@
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from rest_framework import serializers
+
+from authentication.tokens import REFRESH, InvalidToken, decode_token, issue_tokens, revoke_token
+
+INVALID_CREDENTIALS_MESSAGE = 'Unable to log in with provided credentials.'
+
+
+class TokenCacheStatsSerializer(serializers.Serializer):
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+    hit_rate = serializers.FloatField()
+    size = serializers.IntegerField()
+
+
+class JWTPairSerializer(serializers.Serializer):
+    access = serializers.CharField(read_only=True)
+    refresh = serializers.CharField(read_only=True)
+
+
+class JWTLoginSerializer(serializers.Serializer):
+    username = serializers.CharField(write_only=True)
+    password = serializers.CharField(write_only=True, style={'input_type': 'password'})
+
+    def validate(self, attrs):
+        user = authenticate(self.context.get('request'), username=attrs['username'], password=attrs['password'])
+        if user is None or not user.is_active:
+            raise serializers.ValidationError(INVALID_CREDENTIALS_MESSAGE)
+        return issue_tokens(user)
+
+
+class JWTRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        """
+        Checking whether the refresh token is valid and its user is still active. The token is rotated:
+        it is revoked and a new pair is issued.
+        """
+        try:
+            claims = decode_token(attrs['refresh'], REFRESH)
+        except InvalidToken as error:
+            raise serializers.ValidationError({'refresh': str(error)})
+
+        user = User.objects.filter(pk=claims['sub'], is_active=True).first()
+        if user is None:
+            raise serializers.ValidationError({'refresh': 'User inactive or deleted.'})
+        revoke_token(claims)
+        return issue_tokens(user)
+
+
+class JWTLogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True, required=False)
+
+    def validate_refresh(self, value):
+        try:
+            claims = decode_token(value, REFRESH)
+        except InvalidToken as error:
+            raise serializers.ValidationError(str(error))
+        if claims['sub'] != self.context['request'].auth['sub']:
+            raise serializers.ValidationError('Token belongs to another user.')
+        return claims
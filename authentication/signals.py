@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from authentication.authentication import token_cache
+from authentication.tokens import revoke_user_tokens
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    token_cache.evict(instance.key)
+
+
+@receiver([post_save, post_delete], sender=User)
+def evict_user_tokens(sender, instance, **kwargs):
+    token_cache.evict_user(instance.pk)
+
+
+# Fields whose change invalidates the tokens of the user, access tokens carry the privileges as claims.
+REVOKING_FIELDS = ('is_staff', 'is_superuser', 'password')
+
+
+@receiver(pre_save, sender=User)
+def detect_revoking_changes(sender, instance, using, update_fields=None, **kwargs):
+    """
+    Comparing the saved revoking fields with the stored ones. Deferred fields are not saved, so they are skipped.
+    """
+    fields = [name for name in REVOKING_FIELDS
+              if name in instance.__dict__ and (update_fields is None or name in update_fields)]
+    instance._revoke_tokens = False
+    if instance.pk is None or not fields:
+        return
+    stored = User._base_manager.using(using).filter(pk=instance.pk).values(*fields).first()
+    instance._revoke_tokens = stored is not None and any(stored[name] != getattr(instance, name) for name in fields)
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_user_tokens(sender, instance, **kwargs):
+    if not instance.is_active or getattr(instance, '_revoke_tokens', False):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
@@ -1,7 +1,12 @@
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from authentication.authentication import JWTAuthentication, token_cache
+from service.permissions import IsAdmin
 
 
 class AuthenticationTestCase(APITestCase):
@@ -164,3 +169,170 @@ class AuthenticationTestCase(APITestCase):
         })
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.superuser = User.objects.create_superuser(username='superuser', password='password')
+        self.user = User.objects.create_user(username='testuser', password='testuserpassword123')
+        response = self.client.post(reverse('auth:login'), data={
+            'username': 'testuser',
+            'password': 'testuserpassword123',
+        })
+        self.headers = {'Authorization': f'Token {response.data["key"]}'}
+        self.client.cookies.clear()
+
+    def test_cached_lookup(self):
+        url_user_details = reverse('auth:user-details')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url_user_details, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url_user_details, headers=self.headers)
+        self.assertEqual(response.data['username'], 'testuser')
+
+        self.assertEqual(token_cache.stats()['hits'], 1)
+        self.assertEqual(token_cache.stats()['misses'], 1)
+
+    def test_logout_invalidates(self):
+        url_user_details = reverse('auth:user-details')
+        self.client.get(url_user_details, headers=self.headers)
+
+        response = self.client.post(reverse('auth:logout'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url_user_details, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates(self):
+        url_user_details = reverse('auth:user-details')
+        self.client.get(url_user_details, headers=self.headers)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(url_user_details, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats(self):
+        url_stats = reverse('auth:token-cache-stats')
+
+        response = self.client.get(url_stats, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.superuser)
+        response = self.client.get(url_stats)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['size'], 1)
+
+
+class JWTAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testuserpassword123')
+        response = self.client.post(reverse('auth:jwt-login'), data={
+            'username': 'testuser',
+            'password': 'testuserpassword123',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.tokens = response.data
+        self.headers = {'Authorization': f'Bearer {self.tokens["access"]}'}
+
+    def test_login(self):
+        response = self.client.post(reverse('auth:jwt-login'), data={
+            'username': 'testuser',
+            'password': 'wrongpassword',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('booking:booking-list'), headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_verification_without_queries(self):
+        request = Request(APIRequestFactory().get('/', headers=self.headers))
+        # The denylist is read from the database once, then from the cache.
+        cache.clear()
+        with self.assertNumQueries(2):
+            JWTAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            user, claims = JWTAuthentication().authenticate(request)
+            self.assertTrue(user.is_authenticated)
+            self.assertFalse(IsAdmin().has_permission(request, None))
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, 'testuser')
+
+        response = self.client.get(reverse('booking:booking-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_user_details_save_keeps_password(self):
+        response = self.client.patch(reverse('auth:user-details'), data={'first_name': 'Test'}, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Test')
+        self.assertTrue(self.user.check_password('testuserpassword123'))
+
+    def test_refresh_rotates(self):
+        url_refresh = reverse('auth:jwt-refresh')
+
+        response = self.client.post(url_refresh, data={'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['access'], self.tokens['access'])
+
+        response = self.client.post(url_refresh, data={'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(url_refresh, data={'refresh': self.tokens['access']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_logout_revokes(self):
+        response = self.client.post(reverse('auth:jwt-logout'), data={'refresh': self.tokens['refresh']},
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse('booking:booking-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(reverse('auth:jwt-refresh'), data={'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Revocations are stored in the database, they outlive the cache.
+        cache.clear()
+        response = self.client.get(reverse('booking:booking-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_revokes(self):
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(reverse('booking:booking-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        cache.clear()
+        response = self.client.get(reverse('booking:booking-list'), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_privilege_and_password_changes_revoke(self):
+        url = reverse('booking:booking-list')
+        changes = [('is_staff', True), ('is_superuser', True), ('first_name', 'Test'), ('password', None)]
+        for field, value in changes:
+            with self.subTest(field=field):
+                response = self.client.post(reverse('auth:jwt-login'), data={
+                    'username': 'testuser', 'password': 'testuserpassword123'
+                })
+                headers = {'Authorization': f'Bearer {response.data["access"]}'}
+
+                user = User.objects.get(pk=self.user.pk)
+                if field == 'password':
+                    user.set_password('newpassword123')
+                else:
+                    setattr(user, field, value)
+                user.save()
+                response = self.client.get(url, headers=headers)
+                # Other fields keep the tokens.
+                self.assertEqual(response.status_code,
+                                 status.HTTP_200_OK if field == 'first_name' else status.HTTP_401_UNAUTHORIZED)
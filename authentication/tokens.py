@@ -0,0 +1,131 @@
+import time
+from uuid import uuid4
+
+import jwt
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import router, transaction
+
+from authentication.models import RevokedToken, RevokedUserTokens
+
+JWT_ALGORITHM = 'HS256'
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+# Claims copied into access tokens, enough for the permission checks of the API without loading the user.
+USER_CLAIMS = ('username', 'is_active', 'is_staff', 'is_superuser')
+
+
+class InvalidToken(Exception):
+    pass
+
+
+DENYLIST_KEY = 'auth:jwt:denylist'
+
+
+def issue_tokens(user):
+    """
+    Pair of signed access and refresh tokens of the user.
+    """
+    # Fractional issue times, so that tokens issued in the second of a revocation but after it stay valid.
+    now = time.time()
+    access = {
+        'type': ACCESS, 'sub': str(user.pk), 'jti': uuid4().hex,
+        'iat': now, 'exp': int(now) + settings.JWT_ACCESS_TTL,
+        **{claim: getattr(user, claim) for claim in USER_CLAIMS},
+    }
+    refresh = {
+        'type': REFRESH, 'sub': str(user.pk), 'jti': uuid4().hex,
+        'iat': now, 'exp': int(now) + settings.JWT_REFRESH_TTL,
+    }
+    return {
+        ACCESS: jwt.encode(access, settings.JWT_SIGNING_KEY, algorithm=JWT_ALGORITHM),
+        REFRESH: jwt.encode(refresh, settings.JWT_SIGNING_KEY, algorithm=JWT_ALGORITHM),
+    }
+
+
+def decode_token(token, token_type):
+    """
+    Verified claims of the token of the given type, raising InvalidToken if it is expired, forged or revoked.
+
+    Only the signature and the cached denylist are checked, the database is queried when the denylist
+    is not cached.
+    """
+    try:
+        claims = jwt.decode(token, settings.JWT_SIGNING_KEY, algorithms=[JWT_ALGORITHM],
+                            options={'require': ['type', 'sub', 'jti', 'iat', 'exp']})
+    except jwt.InvalidTokenError as error:
+        raise InvalidToken(str(error))
+    if claims['type'] != token_type:
+        raise InvalidToken(f'Not an {token_type} token.')
+
+    revoked = denylist()
+    if claims['jti'] in revoked['tokens'] or claims['iat'] <= revoked['users'].get(claims['sub'], -1):
+        raise InvalidToken('Token has been revoked.')
+    return claims
+
+
+def denylist():
+    """
+    Revoked tokens which have not expired yet, as the set of their jti, and the revocation time of the tokens
+    of each user by user id. Loaded from the database, where revocations are stored so that they outlive
+    the cache, and cached for settings.JWT_DENYLIST_CACHE_TTL seconds.
+    """
+    revoked = cache.get(DENYLIST_KEY)
+    if revoked is None:
+        now = time.time()
+        # Revocations are read from the primary, a replica may not have them yet.
+        database = router.db_for_write(RevokedToken)
+        tokens = RevokedToken.objects.using(database).filter(expires_at__gt=now)
+        users = RevokedUserTokens.objects.using(database).filter(expires_at__gt=now)
+        revoked = {
+            'tokens': set(tokens.values_list('jti', flat=True)),
+            'users': {str(user_id): issued_before for user_id, issued_before in users.values_list('user_id',
+                                                                                                  'issued_before')},
+        }
+        cache.set(DENYLIST_KEY, revoked, settings.JWT_DENYLIST_CACHE_TTL)
+    return revoked
+
+
+def _denylist_changed():
+    """
+    Dropping the expired revocations and the cached denylist, now and again on commit,
+    so that it is not reloaded without the revocation by a concurrent request.
+    """
+    now = time.time()
+    RevokedToken.objects.filter(expires_at__lte=now).delete()
+    RevokedUserTokens.objects.filter(expires_at__lte=now).delete()
+    cache.delete(DENYLIST_KEY)
+    transaction.on_commit(lambda: cache.delete(DENYLIST_KEY))
+
+
+def revoke_token(claims):
+    """
+    Adding the token to the denylist until it expires by itself, so the list holds only live tokens.
+    """
+    if claims['exp'] > time.time():
+        RevokedToken.objects.update_or_create(jti=claims['jti'], defaults={'expires_at': claims['exp']})
+        _denylist_changed()
+
+
+def revoke_user_tokens(user_id):
+    """
+    Rejecting every token of the user issued up to now with a single denylist entry.
+    """
+    now = time.time()
+    RevokedUserTokens.objects.update_or_create(user_id=user_id, defaults={
+        'issued_before': now, 'expires_at': int(now) + settings.JWT_REFRESH_TTL + 1,
+    })
+    _denylist_changed()
+
+
+def token_user(claims):
+    """
+    User built from the access token claims without a query. The remaining fields are deferred,
+    so they are loaded on access, and save() writes only the fields that were set.
+    """
+    values = {'id': int(claims['sub']), **{claim: claims[claim] for claim in USER_CLAIMS}}
+    # from_db() takes the loaded values in the order of the model fields.
+    field_names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(router.db_for_read(User), field_names, [values[name] for name in field_names])
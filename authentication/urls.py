@@ -3,6 +3,8 @@ from django.urls import path
 from dj_rest_auth.registration.views import RegisterView
 from dj_rest_auth.views import LoginView, LogoutView, UserDetailsView
 
+from authentication.views import JWTLoginView, JWTLogoutView, JWTRefreshView, TokenCacheStatsView
+
 app_name = 'auth'
 
 urlpatterns = [
@@ -10,4 +12,8 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('user/', UserDetailsView.as_view(), name='user-details'),
+    path('jwt/login/', JWTLoginView.as_view(), name='jwt-login'),
+    path('jwt/refresh/', JWTRefreshView.as_view(), name='jwt-refresh'),
+    path('jwt/logout/', JWTLogoutView.as_view(), name='jwt-logout'),
+    path('token-cache/', TokenCacheStatsView.as_view(), name='token-cache-stats'),
 ]
@@ -1,3 +1,74 @@
+from drf_spectacular.utils import extend_schema
+from rest_framework import status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from authentication.authentication import JWTAuthentication, token_cache
+from authentication.serializers import (JWTLoginSerializer, JWTLogoutSerializer, JWTPairSerializer,
+                                        JWTRefreshSerializer, TokenCacheStatsSerializer)
+from authentication.tokens import revoke_token
+from service.permissions import IsAdmin
 
 
+@extend_schema(
+    tags=['Аутентификация'],
+    summary='Статистика кэша токенов',
+    description='Доступно только суперюзеру. Количество попаданий и промахов кэша токенов в текущем процессе.',
+    responses=TokenCacheStatsSerializer
+)
+class TokenCacheStatsView(APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(TokenCacheStatsSerializer(token_cache.stats()).data)
+
+
+@extend_schema(
+    tags=['Аутентификация'],
+    summary='Вход с JWT',
+    description='Выдает пару подписанных токенов: access для заголовка "Authorization: Bearer <token>" '
+                'и refresh для его обновления. Проверка access токена не обращается к базе данных.',
+    request=JWTLoginSerializer,
+    responses=JWTPairSerializer
+)
+class JWTLoginView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    serializer_class = JWTLoginSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.validated_data)
+
+
+@extend_schema(
+    tags=['Аутентификация'],
+    summary='Обновление JWT',
+    description='Выдает новую пару токенов по refresh токену, использованный refresh токен отзывается.',
+    request=JWTRefreshSerializer,
+    responses=JWTPairSerializer
+)
+class JWTRefreshView(JWTLoginView):
+    serializer_class = JWTRefreshSerializer
+
+
+@extend_schema(
+    tags=['Аутентификация'],
+    summary='Выход с JWT',
+    description='Отзывает access токен запроса и переданный refresh токен.',
+    request=JWTLogoutSerializer,
+    responses={200: None}
+)
+class JWTLogoutView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = JWTLogoutSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        revoke_token(request.auth)
+        if 'refresh' in serializer.validated_data:
+            revoke_token(serializer.validated_data['refresh'])
+        return Response({'detail': 'Successfully logged out.'}, status=status.HTTP_200_OK)
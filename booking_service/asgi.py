@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'booking_service.settings')
+# Under ASGI every thread running synchronous code keeps its own persistent connection, so they pile up
+# instead of being reused, connections are closed after each request unless DB_CONN_MAX_AGE is set.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'service.middleware.PerformanceMiddleware',
+    'service.query_inspector.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,15 +67,76 @@ WSGI_APPLICATION = 'booking_service.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Seconds a connection is reused by the following requests of the worker, 0 closes it after each one.
+        # Defaults to 0 under ASGI, see asgi.py.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # A reused connection is checked before the first query of a request and reopened if it was lost.
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', '1') == '1',
     }
 }
 
+# Connection pool of psycopg 3 shared by the threads of the process, enabled by a non-zero DB_POOL_MAX_SIZE.
+# Needs Django 5.1+ and psycopg[pool]; persistent connections are replaced by the pool.
+if int(os.getenv('DB_POOL_MAX_SIZE', 0)):
+    import django
+    from django.core.exceptions import ImproperlyConfigured
+
+    if django.VERSION < (5, 1):
+        raise ImproperlyConfigured('DB_POOL_MAX_SIZE requires Django 5.1 or newer with psycopg[pool].')
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+
+# Read replicas as 'host:port:weight' separated by commas, sharing the name and credentials of the primary.
+DATABASE_REPLICAS = {}
+for number, replica in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1):
+    host, port, weight = (replica.strip().split(':') + ['', '1'])[:3]
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'], 'HOST': host, 'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS[f'replica_{number}'] = int(weight or 1)
+
+DATABASE_ROUTERS = ['service.db_router.ReplicaRouter']
+# Seconds the reads of a user go to the primary after a write.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+# Seconds between health checks of a replica and the replication lag at which it is skipped.
+REPLICA_HEALTH_INTERVAL = int(os.getenv('REPLICA_HEALTH_INTERVAL', 10))
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 5))
+
+# Redis (or a Redis-compatible server) is used when REDIS_URL is set, local memory otherwise.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# The reads of a user are pinned to the primary in the cache, which must be shared by the processes.
+if DATABASE_REPLICAS and CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    from django.core.exceptions import ImproperlyConfigured
+
+    raise ImproperlyConfigured('DB_REPLICAS requires REDIS_URL, reads after a write are pinned to the primary '
+                               'in the cache shared by the processes.')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -103,13 +166,63 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'authentication.authentication.CachedTokenAuthentication',
+        'authentication.authentication.JWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_PAGINATION_CLASS': 'service.pagination.KeysetPagination',
 }
 
 SITE_ID = 1
 
+# Seconds a token lookup is cached in the process, 0 disables the cache. Logout, token deletion and user
+# deactivation only evict the entry in the process handling them, the other processes accept the token as long.
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 5))
+TOKEN_CACHE_MAX_SIZE = int(os.getenv('TOKEN_CACHE_MAX_SIZE', 10_000))
+
+# Signed stateless tokens issued by auth/jwt/, lifetimes in seconds.
+JWT_SIGNING_KEY = os.getenv('JWT_SIGNING_KEY', SECRET_KEY)
+JWT_ACCESS_TTL = int(os.getenv('JWT_ACCESS_TTL', 300))
+JWT_REFRESH_TTL = int(os.getenv('JWT_REFRESH_TTL', 86_400))
+# Seconds the denylist of revoked tokens is cached, a process-local cache may accept revoked tokens as long.
+JWT_DENYLIST_CACHE_TTL = int(os.getenv('JWT_DENYLIST_CACHE_TTL', 5))
+
+# Engine answering available_rooms searches: 'sql' or the in-process 'memory' index.
+AVAILABILITY_ENGINE = os.getenv('AVAILABILITY_ENGINE', 'sql')
+# Seconds after which the in-process index is rebuilt from the database.
+AVAILABILITY_INDEX_TTL = int(os.getenv('AVAILABILITY_INDEX_TTL', 300))
+
+# Seconds to cache room list and detail responses, 0 disables the cache.
+ROOM_CACHE_TIMEOUT = int(os.getenv('ROOM_CACHE_TIMEOUT', 0))
+# Seconds to cache the occupancy calendars of a room per month, 0 disables the cache.
+CALENDAR_CACHE_TIMEOUT = int(os.getenv('CALENDAR_CACHE_TIMEOUT', 3_600))
+
+# Whether the booking table was partitioned by the partition_bookings command.
+BOOKING_PARTITIONING = os.getenv('BOOKING_PARTITIONING', '0') == '1'
+
+# Server-Timing headers and request histograms exported at booking/diagnostics/metrics/.
+PERFORMANCE_METRICS = os.getenv('PERFORMANCE_METRICS', '1') == '1'
+
+# Logging of slow queries and of query shapes repeated in one request, for a sample of the requests.
+QUERY_INSPECTOR = os.getenv('QUERY_INSPECTOR', '0') == '1'
+QUERY_INSPECTOR_SAMPLE_RATE = float(os.getenv('QUERY_INSPECTOR_SAMPLE_RATE', 1.0))
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+DUPLICATE_QUERY_THRESHOLD = int(os.getenv('DUPLICATE_QUERY_THRESHOLD', 5))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'service.query_inspector.JSONFormatter'},
+    },
+    'handlers': {
+        'json_console': {'class': 'logging.StreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        'service.queries': {'handlers': ['json_console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Сервис бронирований",
     "VERSION": "1.0.0",
@@ -10,4 +10,7 @@ class RoomAdmin(admin.ModelAdmin):
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
-    pass
+    # Booking.__str__ uses both relations.
+    list_select_related = ['room', 'client']
+    # Select widgets would load every room and user.
+    raw_id_fields = ['room', 'client']
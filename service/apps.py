@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ServiceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'service'
+
+    def ready(self):
+        from service import diagnostics, instrumentation, query_inspector, signals  # noqa: F401
@@ -0,0 +1,112 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from service.db_router import replica_reads, is_pinned_to_primary
+from service.mixins import conditional_response, set_version_headers
+from service.views import RoomViewSet, BookingViewSet
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status_code)
+
+
+async def authenticate(request):
+    """
+    User and auth of the request from the aauthenticate() of the authentication classes.
+    """
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = await authentication_class().aauthenticate(request)
+        if result is not None:
+            return result
+    return AnonymousUser(), None
+
+
+def async_api_view(viewset, action):
+    """
+    Async GET view reusing the queryset, filters, permissions, serializer and pagination of the viewset action.
+    The decorated coroutine gets the viewset instance and the DRF request. Everything it does outside the
+    database is synchronous code of the viewset, so it must not run queries other than with the async ORM.
+    """
+    def decorator(func):
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            if request.method != 'GET':
+                return HttpResponseNotAllowed(['GET'])
+            drf_request = Request(request, authenticators=())
+            drf_request.accepted_renderer, drf_request.accepted_media_type = JSONRenderer(), 'application/json'
+            instance = viewset(request=drf_request, args=args, kwargs=kwargs, format_kwarg=None, action=action)
+            try:
+                drf_request.user, drf_request.auth = await authenticate(request)
+                for permission in instance.get_permissions():
+                    if not permission.has_permission(drf_request, instance):
+                        if not drf_request.user.is_authenticated:
+                            raise exceptions.NotAuthenticated()
+                        raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+                # Like ReplicaReadMixin, the handler reads from the replicas.
+                replica = settings.DATABASE_REPLICAS and not is_pinned_to_primary(drf_request.user)
+                token = replica_reads.set(True) if replica else None
+                try:
+                    return await func(instance, drf_request, *args, **kwargs)
+                finally:
+                    if token is not None:
+                        replica_reads.reset(token)
+            except exceptions.APIException as exc:
+                detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                response = json_response(detail, exc.status_code)
+                if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                    response['WWW-Authenticate'] = api_settings.DEFAULT_AUTHENTICATION_CLASSES[0]().keyword
+                return response
+        return view
+    return decorator
+
+
+async def paginated_list(view, request, queryset):
+    """
+    Page of the queryset fetched with the async ORM, with the ETag of ConditionalGetMixin.list().
+    """
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(queryset, request, view)
+    links = (paginator.get_next_link(), paginator.get_previous_link())
+    etag = view.get_etag(request, [(row.pk, row.updated_at) for row in page], *links)
+
+    not_modified = conditional_response(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    data = paginator.get_paginated_response(view.get_serializer(page, many=True).data).data
+    return set_version_headers(json_response(data), etag)
+
+
+@async_api_view(RoomViewSet, 'list')
+async def room_list(view, request):
+    # The in-process index may be rebuilt from the database on this call, and on a partitioned table
+    # the length of the longest booking bounding the overlap searches may be read from it.
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    return await paginated_list(view, request, queryset)
+
+
+@async_api_view(RoomViewSet, 'retrieve')
+async def room_detail(view, request, pk):
+    instance = await view.get_queryset().filter(pk=pk).afirst()
+    if instance is None:
+        raise exceptions.NotFound()
+    etag = view.get_etag(request, [(instance.pk, instance.updated_at)])
+    last_modified = int(instance.updated_at.timestamp())
+
+    not_modified = conditional_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return set_version_headers(json_response(view.get_serializer(instance).data), etag, last_modified)
+
+
+@async_api_view(BookingViewSet, 'list')
+async def booking_list(view, request):
+    return await paginated_list(view, request, view.filter_queryset(view.get_queryset()))
@@ -0,0 +1,211 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+
+from service.models import Booking
+
+
+def _timestamp(value):
+    # Instances created from strings keep them until they are reloaded.
+    return Booking._meta.get_field('start_time').to_python(value).timestamp()
+
+
+def overlaps(periods, start, end):
+    """
+    Whether [start, end) intersects one of the sorted non-overlapping (start, end, ...) periods.
+    """
+    position = bisect_left(periods, (end,))
+    return position > 0 and periods[position - 1][1] > start
+
+
+def first_free_window(periods, start, end, duration):
+    """
+    Start of the earliest window of the duration within [start, end) not intersecting the (start, end, ...)
+    periods sorted by start, or None. A single merge sweep, stopping as soon as the window is found.
+    """
+    cursor = start
+    for period_start, period_end, *_ in periods:
+        if period_end <= cursor:
+            continue
+        if period_start - cursor >= duration:
+            return cursor
+        cursor = period_end
+        if end - cursor < duration:
+            return None
+    return cursor if end - cursor >= duration else None
+
+
+class AvailabilityIndex:
+    """
+    In-process index of booking periods used to answer available_rooms searches without the database.
+
+    Bookings of every room are kept as (start, end, booking_id) tuples sorted by start. Since periods
+    of one room never overlap (see BookingSerializer and the exclusion constraint), the ends are sorted
+    as well, so the only booking that can intersect [start_time, end_time) is the last one starting
+    before end_time. The index is updated by Booking signals and rebuilt from the database once
+    settings.AVAILABILITY_INDEX_TTL seconds have passed, which also picks up writes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held by the thread rebuilding the index, the others keep reading the previous one meanwhile.
+        self._rebuild_lock = threading.Lock()
+        self._rooms = {}
+        self._bookings = {}
+        self._built_at = None
+        self._generation = 0
+        # Writes made during a rebuild, replayed on the rebuilt index.
+        self._pending = None
+
+    def busy_rooms(self, start_time, end_time):
+        """
+        Ids of the rooms having a booking intersecting the half-open period [start_time, end_time).
+        """
+        self._refresh_if_stale()
+        start, end = start_time.timestamp(), end_time.timestamp()
+        with self._lock:
+            return {room_id for room_id, periods in self._rooms.items() if overlaps(periods, start, end)}
+
+    def free_windows(self, room_ids, start, end, duration):
+        """
+        first_free_window() of every room on timestamps, skipping the periods ending before start by bisection.
+        """
+        self._refresh_if_stale()
+        windows = {}
+        with self._lock:
+            for room_id in room_ids:
+                periods = self._rooms.get(room_id, [])
+                position = max(bisect_left(periods, (start,)) - 1, 0)
+                windows[room_id] = first_free_window(islice(periods, position, None), start, end, duration)
+        return windows
+
+    def add(self, booking):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((booking, None))
+            if self._built_at is None:
+                return
+            self._discard(booking.pk)
+            self._add(booking.pk, booking.room_id, booking.start_time, booking.end_time)
+
+    def discard(self, booking_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((None, booking_id))
+            self._discard(booking_id)
+
+    def rebuild(self):
+        with self._rebuild_lock:
+            self._rebuild()
+
+    def invalidate(self):
+        with self._lock:
+            self._rooms, self._bookings = {}, {}
+            self._built_at = None
+            self._generation += 1
+
+    def _refresh_if_stale(self):
+        built_at = self._built_at
+        if built_at is not None and time.monotonic() - built_at <= settings.AVAILABILITY_INDEX_TTL:
+            return
+        # Before the first build there is no index to read, so the other threads wait for it.
+        if self._rebuild_lock.acquire(blocking=built_at is None):
+            try:
+                if self._built_at == built_at:
+                    self._rebuild()
+            finally:
+                self._rebuild_lock.release()
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending, generation = [], self._generation
+        rooms, bookings = {}, {}
+        try:
+            queryset = Booking.objects.order_by('start_time').values_list('pk', 'room_id', 'start_time', 'end_time')
+            for booking_id, room_id, start_time, end_time in queryset.iterator(chunk_size=10_000):
+                period = (start_time.timestamp(), end_time.timestamp(), booking_id)
+                rooms.setdefault(room_id, []).append(period)
+                bookings[booking_id] = (room_id, period)
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._rooms, self._bookings = rooms, bookings
+            # Writes may be read by the query as well, replaying them is idempotent.
+            for booking, booking_id in pending:
+                if booking is None:
+                    self._discard(booking_id)
+                else:
+                    self._discard(booking.pk)
+                    self._add(booking.pk, booking.room_id, booking.start_time, booking.end_time)
+            # An index invalidated during the rebuild may miss the changes, it is rebuilt on the next read.
+            self._built_at = time.monotonic() if generation == self._generation else None
+
+    def _add(self, booking_id, room_id, start_time, end_time):
+        period = (_timestamp(start_time), _timestamp(end_time), booking_id)
+        insort(self._rooms.setdefault(room_id, []), period)
+        self._bookings[booking_id] = (room_id, period)
+
+    def _discard(self, booking_id):
+        room_id, period = self._bookings.pop(booking_id, (None, None))
+        if room_id is None:
+            return
+        periods = self._rooms[room_id]
+        del periods[bisect_left(periods, period)]
+        if not periods:
+            del self._rooms[room_id]
+
+
+availability_index = AvailabilityIndex()
+
+
+def earliest_free_windows(rooms, start, end, duration, limit):
+    """
+    (window start, room id) of the limit rooms of the queryset with the earliest free window of the duration
+    within [start, end), ties in the order of the queryset.
+
+    The bookings of all the rooms are read in one query sorted by room and start, or taken from
+    the availability index with AVAILABILITY_ENGINE = 'memory', and swept up to a search end growing
+    from two durations after start. Any window starting a duration before the search end is found, so once
+    there are limit windows, the rooms without one cannot have an earlier window and the search stops.
+    """
+    if not rooms.ordered:
+        rooms = rooms.order_by('pk')
+    room_ids = list(rooms.values_list('pk', flat=True))
+    span = duration * 2
+    while True:
+        search_end = min(start + span, end)
+        windows = _free_windows(rooms, room_ids, start, search_end, duration)
+        ranked = ((windows[room_id], rank, room_id) for rank, room_id in enumerate(room_ids)
+                  if windows[room_id] is not None)
+        found = [(window, room_id) for window, _, room_id in heapq.nsmallest(limit, ranked)]
+        if len(found) == limit or search_end == end:
+            return found
+        span *= 4
+
+
+def _free_windows(rooms, room_ids, start, end, duration):
+    if settings.AVAILABILITY_ENGINE == 'memory':
+        return {
+            room_id: None if window is None else datetime.fromtimestamp(window, timezone.utc)
+            for room_id, window in availability_index.free_windows(
+                room_ids, start.timestamp(), end.timestamp(), duration.total_seconds()
+            ).items()
+        }
+
+    # Rooms without bookings in the period are free from its start.
+    windows = dict.fromkeys(room_ids, start)
+    bookings = Booking.objects.filter(room__in=rooms.order_by().values('pk')).overlapping(start, end).order_by(
+        'room_id', 'start_time'
+    ).values_list('room_id', 'start_time', 'end_time')
+    for room_id, periods in groupby(bookings.iterator(chunk_size=10_000), key=itemgetter(0)):
+        windows[room_id] = first_free_window((period[1:] for period in periods), start, end, duration)
+    return windows
@@ -0,0 +1,126 @@
+import threading
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from service.db_router import primary
+from service.mixins import conditional_response, set_version_headers
+
+ROOMS_GENERATION = 'service:rooms:generation'
+BOOKINGS_GENERATION = 'service:bookings:generation'
+
+
+def room_generation(room_id):
+    return f'service:room:{room_id}:generation'
+
+
+def calendar_generation(room_id):
+    return f'service:room:{room_id}:calendar:generation'
+
+
+def get_generations(names):
+    """
+    Current tokens of the generations, in the order of the names.
+    """
+    generations = cache.get_many(names)
+    for name in names:
+        if name not in generations:
+            # An evicted generation gets a new token, so old entries cannot become valid again.
+            cache.add(name, uuid4().hex, timeout=None)
+            generations[name] = cache.get(name)
+    return [generations[name] for name in names]
+
+
+def replace_generations(names):
+    """
+    Replacing the generations now, so that entries are not served right after the commit, and once more
+    on commit, dropping entries rendered from the database state before it.
+    """
+    def replace():
+        cache.set_many({name: uuid4().hex for name in names}, timeout=None)
+
+    replace()
+    transaction.on_commit(replace)
+
+
+class RoomCache:
+    """
+    Cache of RoomViewSet list and detail responses, enabled by a non-zero settings.ROOM_CACHE_TIMEOUT.
+
+    Every entry key contains the generations of the data the response depends on: all rooms for lists,
+    the room for details and additionally all bookings for lists filtered by available_rooms. A write
+    replaces the generation with a new random token, so entries rendered before it are never read again.
+    Generations live in the cache too, so with several processes a shared backend such as Redis is required,
+    the local-memory backend is only consistent within one process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def response(self, request, name, dependencies, render):
+        """
+        Cached response data for the request or the response of render(), stored when successful.
+        Misses are rendered from the primary: a lagging replica could store the data from before a write
+        under the generation the write has just replaced, which would then be served until the entry expires.
+        """
+        if not settings.ROOM_CACHE_TIMEOUT:
+            return render()
+
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        key = 'service:response:' + md5(repr((
+            name, get_generations(dependencies), request.get_host(), request.accepted_renderer.format, params
+        )).encode()).hexdigest()
+
+        cached = cache.get(key)
+        if cached is not None:
+            self._count(hit=True)
+            data, etag, last_modified = cached
+            response = conditional_response(request, etag, last_modified) if etag else None
+            if response is None:
+                response = set_version_headers(Response(data), etag, last_modified) if etag else Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        self._count(hit=False)
+        with primary():
+            response = render()
+        if response.status_code == status.HTTP_200_OK:
+            last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+            cache.set(key, (response.data, response.get('ETag'), last_modified), settings.ROOM_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def invalidate(self, *generations):
+        if settings.ROOM_CACHE_TIMEOUT:
+            replace_generations(generations)
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+room_cache = RoomCache()
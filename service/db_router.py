@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Set by ReplicaReadMixin for the handler of safe-method requests, reads go to the primary otherwise.
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def primary():
+    """
+    Reading from the primary inside the block, for checks that must see the latest writes.
+    """
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def _pin_key(user_id):
+    return f'service:db:primary:user:{user_id}'
+
+
+def pin_to_primary(user):
+    """
+    Sending the reads of the user to the primary for settings.REPLICA_PIN_SECONDS after a write,
+    so that replication lag does not hide it from the next requests.
+    """
+    if settings.DATABASE_REPLICAS and user.is_authenticated:
+        cache.set(_pin_key(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+class ReplicaHealth:
+    """
+    Per-process availability of the replicas, probed at most every settings.REPLICA_HEALTH_INTERVAL seconds.
+    A replica is down when it cannot be queried or, on PostgreSQL, lags behind the primary
+    more than settings.REPLICA_MAX_LAG seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}
+
+    def is_up(self, alias):
+        with self._lock:
+            up, checked_at = self._status.get(alias, (None, 0.0))
+        if up is None or time.monotonic() - checked_at > settings.REPLICA_HEALTH_INTERVAL:
+            up = self.probe(alias)
+            self.mark(alias, up)
+        return up
+
+    def mark(self, alias, up):
+        with self._lock:
+            self._status[alias] = (up, time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._status.clear()
+
+    @staticmethod
+    def probe(alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor != 'postgresql':
+                    cursor.execute('SELECT 1')
+                    return True
+                # Lag is 0 when everything received is replayed and NULL on a server which is not a standby.
+                cursor.execute("""
+                    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                                ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END
+                """)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            return False
+        return lag is None or lag <= settings.REPLICA_MAX_LAG
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """
+    Sending reads to one of settings.DATABASE_REPLICAS, chosen randomly by weight among healthy ones,
+    while replica_reads is set, and all the other queries to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get():
+            return self.choose_replica() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+    @staticmethod
+    def choose_replica():
+        replicas = [(alias, weight) for alias, weight in settings.DATABASE_REPLICAS.items()
+                    if weight > 0 and replica_health.is_up(alias)]
+        if not replicas:
+            return None
+        aliases, weights = zip(*replicas)
+        return random.choices(aliases, weights)[0]
@@ -0,0 +1,58 @@
+import threading
+from collections import Counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_lock = threading.Lock()
+connections_opened = Counter()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    with _lock:
+        connections_opened[connection.alias] += 1
+
+
+def pool_stats(connection):
+    """
+    Statistics of the psycopg connection pool of the database, None without a pool.
+    """
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    requests = stats.get('requests_num', 0)
+    return {
+        'size': stats.get('pool_size', 0),
+        'max_size': stats.get('pool_max', 0),
+        'in_use': stats.get('pool_size', 0) - stats.get('pool_available', 0),
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': requests,
+        'queued': stats.get('requests_queued', 0),
+        'wait_ms': stats.get('requests_wait_ms', 0),
+        'avg_wait_ms': stats.get('requests_wait_ms', 0) / requests if requests else 0.0,
+        'errors': stats.get('requests_errors', 0),
+    }
+
+
+def database_stats():
+    """
+    Connection settings and usage of every configured database in the current process. With persistent
+    connections working, connections_opened stays near the number of worker threads while requests grow.
+    """
+    with _lock:
+        opened = dict(connections_opened)
+    return [
+        {
+            'alias': alias,
+            'vendor': connections[alias].vendor,
+            'conn_max_age': connections[alias].settings_dict['CONN_MAX_AGE'],
+            'conn_health_checks': connections[alias].settings_dict['CONN_HEALTH_CHECKS'],
+            'connected': connections[alias].connection is not None,
+            'connections_opened': opened.get(alias, 0),
+            'pool': pool_stats(connections[alias]),
+        }
+        for alias in connections
+    ]
@@ -0,0 +1,48 @@
+import csv
+import json
+from itertools import islice
+
+from rest_framework.fields import DateTimeField
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_CHUNK_SIZE = 2_000
+
+BOOKING_EXPORT_FIELDS = ['id', 'room', 'client', 'start_time', 'end_time', 'total_cost']
+
+
+class _Echo:
+    """
+    File-like object returning written values, for csv.writer producing lines one by one.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_bookings(queryset, file_format):
+    """
+    Lazily rendering bookings, one chunk of lines at a time. The queryset is read with
+    a server-side cursor in chunks, so memory does not grow with the number of exported rows.
+    """
+    lines = _booking_lines(queryset, file_format)
+    while chunk := ''.join(islice(lines, EXPORT_CHUNK_SIZE)):
+        yield chunk
+
+
+def _booking_lines(queryset, file_format):
+    datetime_field = DateTimeField()
+    rows = queryset.order_by('id').values_list(
+        'id', 'room_id', 'client_id', 'start_time', 'end_time', 'total_cost'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    writer = csv.writer(_Echo())
+    if file_format == 'csv':
+        yield writer.writerow(BOOKING_EXPORT_FIELDS)
+    for booking_id, room_id, client_id, start_time, end_time, total_cost in rows:
+        values = [booking_id, room_id, client_id,
+                  datetime_field.to_representation(start_time), datetime_field.to_representation(end_time),
+                  str(total_cost)]
+        if file_format == 'csv':
+            yield writer.writerow(values)
+        else:
+            yield json.dumps(dict(zip(BOOKING_EXPORT_FIELDS, values))) + '\n'
@@ -1,26 +1,39 @@
 from datetime import datetime
 
-from django.db.models import Q
-from django_filters import CharFilter, NumberFilter
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django_filters import BaseInFilter, CharFilter, NumberFilter
 from django_filters.rest_framework import FilterSet
 
-from service.models import Room
+from service.availability import availability_index
+from service.models import Room, Booking
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    pass
 
 
 class RoomFilter(FilterSet):
     """
     Filter class for RoomViewSet.
     """
+    ids = NumberInFilter(field_name='id')
     available_rooms = CharFilter(method='filter_available_rooms')
     beds = NumberFilter()
     cost_per_day = NumberFilter()
 
     def filter_available_rooms(self, queryset, name, value):
+        """
+        Rooms without bookings intersecting the period, as a NOT EXISTS anti-join
+        or, with AVAILABILITY_ENGINE = 'memory', using the in-process availability index.
+        """
         start_time, end_time = [datetime.strptime(val, '%y-%m-%d_%H:%M:%S').astimezone()
                                 for val in value.split(',')]
-        return queryset.exclude(Q(bookings__start_time__range=(start_time, end_time)) |
-                                Q(bookings__end_time__range=(start_time, end_time)) |
-                                Q(bookings__start_time__lte=start_time) & Q(bookings__end_time__gte=end_time))
+        if settings.AVAILABILITY_ENGINE == 'memory':
+            return queryset.exclude(pk__in=availability_index.busy_rooms(start_time, end_time))
+        return queryset.filter(~Exists(
+            Booking.objects.filter(room=OuterRef('pk')).overlapping(start_time, end_time)
+        ))
 
     class Meta:
         model = Room
@@ -0,0 +1,75 @@
+import csv
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from service.models import Room
+from service.serializers import RoomImportSerializer, ROOM_IMPORT_FORMATS
+from service.signals import rooms_bulk_saved
+
+MAX_REPORTED_ERRORS = 100
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    imported: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+    errors: list = field(default_factory=list)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_rows(lines, file_format):
+    """
+    Lazily parsing rows of a CSV file with a header or of a JSONL file, one object per line.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(lines)
+    elif file_format == 'jsonl':
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f'Unsupported format "{file_format}", expected one of {", ".join(ROOM_IMPORT_FORMATS)}.')
+
+
+def import_rooms(rows, batch_size=1_000, on_batch=None):
+    """
+    Upserting rooms on Room.number with one bulk_create(update_conflicts=True) per batch.
+    Rows are consumed lazily, so only one batch is kept in memory. Invalid rows are skipped.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        rooms = {}
+        for row in batch:
+            result.rows += 1
+            serializer = RoomImportSerializer(data=row)
+            if not serializer.is_valid():
+                result.skipped += 1
+                if len(result.errors) < MAX_REPORTED_ERRORS:
+                    result.errors.append({'row': result.rows, 'errors': serializer.errors})
+                continue
+            # The same number twice in one statement is rejected by ON CONFLICT, the last row wins.
+            rooms[serializer.validated_data['number']] = Room(**serializer.validated_data)
+
+        with transaction.atomic():
+            Room.objects.bulk_create(rooms.values(), update_conflicts=True,
+                                     unique_fields=['number'], update_fields=['cost_per_day', 'beds', 'updated_at'])
+            if settings.ROOM_CACHE_TIMEOUT:
+                rooms_bulk_saved(Room.objects.filter(number__in=rooms).values_list('pk', flat=True))
+        result.imported += len(rooms)
+        result.seconds = time.perf_counter() - started
+        if on_batch is not None:
+            on_batch(result)
+    result.seconds = time.perf_counter() - started
+    return result
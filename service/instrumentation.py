@@ -0,0 +1,136 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestTimings:
+    """
+    Measurements of the request being handled, collected through the current_timings context variable,
+    which is also visible in the threads running the queries of async views.
+    """
+    __slots__ = ('view', 'queries', 'db_seconds', 'serialize_seconds')
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db_seconds += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serialization():
+    """
+    Adding the time spent in the block to the serialization time of the current request.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_timings.get()
+        if timings is not None:
+            timings.serialize_seconds += time.perf_counter() - started
+
+
+class Histogram:
+    """
+    Prometheus histogram with one series per label value.
+    """
+
+    def __init__(self, name, documentation, buckets, label):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+
+    def observe(self, label_value, value):
+        series = self._series.get(label_value)
+        if series is None:
+            # Counts per bucket plus the one above the last bound, then the sum of the values.
+            series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_value, series in sorted(self._series.items()):
+            label = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class RequestMetrics:
+    """
+    Per-process histograms of the request measurements by view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.histograms = [
+            Histogram('http_request_duration_seconds', 'Wall time of the request.', DURATION_BUCKETS, 'view'),
+            Histogram('http_request_db_queries', 'Database queries of the request.', QUERY_BUCKETS, 'view'),
+            Histogram('http_request_db_seconds', 'Time of the database queries of the request.',
+                      DURATION_BUCKETS, 'view'),
+            Histogram('http_request_serialize_seconds', 'Serialization and rendering time of the request.',
+                      DURATION_BUCKETS, 'view'),
+            Histogram('http_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS, 'view'),
+        ]
+
+    def record(self, timings, duration, size):
+        view = timings.view or 'unresolved'
+        values = (duration, timings.queries, timings.db_seconds, timings.serialize_seconds, size)
+        with self._lock:
+            for histogram, value in zip(self.histograms, values):
+                histogram.observe(view, value)
+
+    def expose(self):
+        """
+        Histograms in the Prometheus text exposition format.
+        """
+        with self._lock:
+            return '\n'.join(line for histogram in self.histograms for line in histogram.expose()) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,118 @@
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from statistics import median, quantiles
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from service.models import Room, Booking
+from service.pricing import booking_cost
+from service.signals import bookings_bulk_created, rooms_bulk_saved
+
+BENCHMARK_PREFIX = 'bench-'
+
+
+def median_ms(repeat, func):
+    """
+    Median wall time of func() over repeat calls, in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return median(timings)
+
+
+def latency_summary(latencies, elapsed, errors=0):
+    """
+    Throughput and latency percentiles of requests with the given latencies in milliseconds,
+    sent in elapsed seconds.
+    """
+    if len(latencies) > 1:
+        percentiles = quantiles(latencies, n=100, method='inclusive')
+        p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+    }
+
+
+@dataclass
+class SyntheticData:
+    rooms: list
+    tokens: list
+    start: object
+    end: object
+
+
+def generate_data(rooms, users, bookings_per_room):
+    """
+    Rooms, users with tokens and bookings of every room spread over the users. The bookings of a room
+    take one hour every two hours from tomorrow on. All the objects are named with BENCHMARK_PREFIX,
+    the users are reused by the following runs.
+    """
+    usernames = [f'{BENCHMARK_PREFIX}user-{i}' for i in range(users)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    User.objects.bulk_create(User(username=username, password='!')
+                             for username in usernames if username not in existing)
+    users = list(User.objects.filter(username__in=usernames).order_by('id'))
+    Token.objects.bulk_create((Token(user=user, key=Token.generate_key()) for user in users),
+                              ignore_conflicts=True)
+    tokens = Token.objects.filter(user__in=users)
+    rooms = Room.objects.bulk_create(
+        Room(number=f'{BENCHMARK_PREFIX}{i}', cost_per_day=50 + i % 10 * 25, beds=1 + i % 4)
+        for i in range(rooms)
+    )
+    rooms_bulk_saved([room.pk for room in rooms])
+
+    # The search format has neither microseconds nor a time zone.
+    start = timezone.now().astimezone().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    with transaction.atomic():
+        bookings = Booking.objects.bulk_create(
+            (Booking(room=room, client=users[(n * bookings_per_room + i) % len(users)],
+                     start_time=start + timedelta(hours=2 * i), end_time=start + timedelta(hours=2 * i + 1),
+                     total_cost=booking_cost(room.cost_per_day, timedelta(0), timedelta(hours=1)))
+             for n, room in enumerate(rooms) for i in range(bookings_per_room)),
+            batch_size=5_000
+        )
+        bookings_bulk_created(bookings)
+    return SyntheticData(rooms, [token.key for token in tokens], start,
+                         start + timedelta(hours=2 * bookings_per_room))
+
+
+def delete_data():
+    """
+    Deleting the rooms and bookings created by generate_data().
+    """
+    Booking.objects.filter(room__number__startswith=BENCHMARK_PREFIX).delete()
+    Room.objects.filter(number__startswith=BENCHMARK_PREFIX).delete()
+
+
+def compare_results(baseline, results, threshold):
+    """
+    Regressions of the results against the baseline, both written by the benchmark_suite command:
+    throughput lower or p95 latency higher by more than the threshold share, or more errors.
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+        if current['throughput'] < previous['throughput'] * (1 - threshold):
+            regressions.append(f'{name}: throughput {current["throughput"]:.1f} req/s, '
+                               f'was {previous["throughput"]:.1f} req/s')
+        if current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+            regressions.append(f'{name}: p95 {current["p95_ms"]:.1f} ms, was {previous["p95_ms"]:.1f} ms')
+        if current['errors'] > previous['errors']:
+            regressions.append(f'{name}: {current["errors"]} errors, was {previous["errors"]}')
+    return regressions
@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from service.partitions import add_months, archivable_months, archive_month, month_start
+
+
+def month(value):
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+class Command(BaseCommand):
+    """
+    Archiving the bookings which started before a month, one UTC month at a time, into gzipped NDJSON files
+    in the format of the booking export. The partitions of the months are detached and dropped
+    or, when the table is not partitioned, the bookings are deleted. Months with bookings which
+    have not ended yet are skipped.
+    """
+    help = 'Archive the bookings of past months into compressed files and remove them from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=month,
+                            help='First month to keep, YYYY-MM. Defaults to --keep-months before the current one.')
+        parser.add_argument('--keep-months', type=int, default=12)
+        parser.add_argument('--output-dir', default='archive')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the months to archive.')
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+        before = min(options['before'] or add_months(current, -options['keep_months']), current)
+        months = archivable_months(before)
+        if options['dry_run']:
+            self.stdout.write(f'Months to archive: {", ".join(f"{month:%Y-%m}" for month in months) or "none"}.')
+            return
+
+        os.makedirs(options['output_dir'], exist_ok=True)
+        for month in months:
+            try:
+                archived = archive_month(month, options['output_dir'])
+            except FileExistsError as exc:
+                raise CommandError(f'The archive {exc.filename} already exists.')
+            if archived is None:
+                self.stdout.write(f'{month:%Y-%m}: kept, some bookings have not ended yet.')
+            elif archived[1] is None:
+                self.stdout.write(f'{month:%Y-%m}: no bookings.')
+            else:
+                self.stdout.write(f'{month:%Y-%m}: {archived[0]} bookings archived into {archived[1]}.')
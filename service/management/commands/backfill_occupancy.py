@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from service.rollups import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Rebuilding the occupancy rollup from the bookings to repair it, the migration creating it fills it.
+    Booking writes during the rebuild may be missed, so it should run while bookings are not written.
+    """
+    help = 'Rebuild the daily and monthly occupancy rollup of all the rooms or of the given ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, nargs='+', help='Ids of the rooms to rebuild.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild(options['rooms'])
+        self.stdout.write(f'{rows} rollup rows written in {time.perf_counter() - started:.1f} s.')
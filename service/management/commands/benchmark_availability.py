@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from service.availability import availability_index
+from service.filters import RoomFilter
+from service.management.benchmarks import median_ms
+from service.models import Room, Booking
+
+
+class Command(BaseCommand):
+    """
+    Comparing available_rooms searches through SQL and through the in-process availability index.
+    The data is created inside a transaction which is rolled back afterwards.
+    """
+    help = 'Benchmark of the SQL and in-memory available_rooms engines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=1_000)
+        parser.add_argument('--bookings-per-room', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            client = User.objects.create(username='benchmark_availability_user')
+            rooms = Room.objects.bulk_create(
+                Room(number=f'bench-{i}', cost_per_day=100, beds=1 + i % 4)
+                for i in range(options['rooms'])
+            )
+            # The search format has neither microseconds nor a time zone.
+            start = timezone.now().astimezone().replace(microsecond=0) + timedelta(days=1)
+            for room in rooms:
+                Booking.objects.bulk_create(
+                    Booking(room=room, client=client,
+                            start_time=start + timedelta(days=3 * i + room.pk % 3),
+                            end_time=start + timedelta(days=3 * i + room.pk % 3 + 2))
+                    for i in range(options['bookings_per_room'])
+                )
+
+            middle = start + timedelta(days=3 * options['bookings_per_room'] // 2)
+            value = ','.join(moment.strftime('%y-%m-%d_%H:%M:%S')
+                             for moment in (middle, middle + timedelta(days=1)))
+
+            def search():
+                return list(RoomFilter({'available_rooms': value}, Room.objects.all()).qs.values_list('pk'))
+
+            for engine in ('sql', 'memory'):
+                with override_settings(AVAILABILITY_ENGINE=engine):
+                    availability_index.invalidate()
+                    found = len(search())
+                    elapsed = median_ms(options['repeat'], search)
+                self.stdout.write(f'{engine:>6}: {elapsed:8.3f} ms, {found} rooms available '
+                                  f'(median of {options["repeat"]})')
+            availability_index.invalidate()
+            transaction.set_rollback(True)
@@ -0,0 +1,83 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from service.availability import availability_index, earliest_free_windows
+from service.filters import RoomFilter
+from service.management.benchmarks import median_ms
+from service.models import Room, Booking
+
+
+class Command(BaseCommand):
+    """
+    Comparing the free slot search by a merge sweep, through SQL and through the in-process availability
+    index, with the search a client does by trying available_rooms windows one day after another.
+    The data is created inside a transaction which is rolled back afterwards.
+    """
+    help = 'Benchmark of the free slot search against repeated available_rooms searches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=10_000)
+        parser.add_argument('--bookings-per-room', type=int, default=20)
+        parser.add_argument('--nights', type=int, default=3)
+        parser.add_argument('--horizon-days', type=int, default=90)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        duration, horizon = timedelta(days=options['nights']), timedelta(days=options['horizon_days'])
+        with transaction.atomic():
+            client = User.objects.create(username='benchmark_free_slots_user')
+            rooms = Room.objects.bulk_create(
+                (Room(number=f'bench-{i}', cost_per_day=100, beds=1 + i % 4) for i in range(options['rooms'])),
+                batch_size=5_000
+            )
+            # The search format has neither microseconds nor a time zone.
+            start = timezone.now().astimezone().replace(microsecond=0) + timedelta(days=1)
+
+            def bookings():
+                # Rooms booked from the start for stays of 1 to 5 nights, mostly separated by gaps
+                # of up to 2 nights, rarely by 3 or more.
+                for room in rooms:
+                    end = start
+                    for i in range(options['bookings_per_room']):
+                        gap = rng.randint(3, 5) if i and rng.random() < 0.02 else rng.choice((0, 0, 1, 2)) * bool(i)
+                        begin = end + timedelta(days=gap)
+                        end = begin + timedelta(days=rng.randint(1, 5))
+                        yield Booking(room=room, client=client, start_time=begin, end_time=end)
+
+            Booking.objects.bulk_create(bookings(), batch_size=5_000)
+
+            def sweep():
+                return earliest_free_windows(Room.objects.filter(beds=2), start, start + horizon, duration,
+                                             options['limit'])
+
+            def windows():
+                found, window_start = [], start
+                while len(found) < options['limit'] and window_start + duration <= start + horizon:
+                    value = ','.join(moment.strftime('%y-%m-%d_%H:%M:%S')
+                                     for moment in (window_start, window_start + duration))
+                    queryset = RoomFilter({'available_rooms': value, 'beds': 2}, Room.objects.order_by('pk')).qs
+                    found += [(window_start, room_id) for room_id in queryset.exclude(
+                        pk__in=[room_id for _, room_id in found]
+                    ).values_list('pk', flat=True)[:options['limit'] - len(found)]]
+                    window_start += timedelta(days=1)
+                return found
+
+            for name, search, engine in [('windows', windows, 'sql'), ('sql', sweep, 'sql'),
+                                         ('memory', sweep, 'memory')]:
+                with override_settings(AVAILABILITY_ENGINE=engine):
+                    availability_index.invalidate()
+                    found = search()
+                    elapsed = median_ms(options['repeat'], search)
+                latest = max((window for window, _ in found), default=start) - start
+                self.stdout.write(f'{name:>8}: {elapsed:9.3f} ms, {len(found)} rooms found, latest window '
+                                  f'after {latest} (median of {options["repeat"]})')
+            availability_index.invalidate()
+            transaction.set_rollback(True)
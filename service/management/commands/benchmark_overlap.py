@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from service.management.benchmarks import median_ms
+from service.models import Room, Booking
+
+
+class Command(BaseCommand):
+    """
+    Measuring booking overlap check latency for rooms with many bookings.
+    The data is created inside a transaction which is rolled back afterwards.
+    """
+    help = 'Benchmark of the booking overlap check against rooms with 1k/10k/100k bookings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            client = User.objects.create(username='benchmark_overlap_user')
+            for size in options['sizes']:
+                room = Room.objects.create(number=f'bench-{size}', cost_per_day=100, beds=1)
+                start = timezone.now() + timedelta(days=1)
+                Booking.objects.bulk_create(
+                    (Booking(room=room, client=client,
+                             start_time=start + timedelta(hours=2 * i),
+                             end_time=start + timedelta(hours=2 * i + 1))
+                     for i in range(size)),
+                    batch_size=5_000
+                )
+                # A free one-hour slot in the middle of the room history.
+                free_start = start + timedelta(hours=size + 1)
+                free_end = free_start + timedelta(hours=1)
+
+                query_ms = median_ms(options['repeat'], lambda: Booking.objects.filter(
+                    room=room).overlapping(free_start, free_end).exists())
+                scan_ms = median_ms(options['repeat'], lambda: any(
+                    booking.start_time < free_end and free_start < booking.end_time
+                    for booking in Booking.objects.filter(room=room)))
+
+                self.stdout.write(f'{size:>7} bookings: query {query_ms:8.3f} ms, '
+                                  f'python scan {scan_ms:10.3f} ms (median of {options["repeat"]})')
+            transaction.set_rollback(True)
@@ -0,0 +1,157 @@
+import json
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from service.management.benchmarks import compare_results, delete_data, generate_data, latency_summary
+
+SEARCH_FORMAT = '%y-%m-%d_%H:%M:%S'
+
+
+def room_search(client, data, rng, options):
+    """
+    Available rooms for an hour inside the booked period, which every room has a booking in half the time.
+    """
+    start = data.start + timedelta(hours=rng.randrange(int((data.end - data.start).total_seconds() // 3600)))
+    value = f'{start:{SEARCH_FORMAT}},{start + timedelta(hours=1):{SEARCH_FORMAT}}'
+    return client.get(reverse('booking:room-list'), {'available_rooms': value, 'page_size': 50}), (200,)
+
+
+def booking_create(client, data, rng, options):
+    """
+    Booking of one of the few hot rooms for a random period of a short window, so the requests conflict.
+    """
+    room = data.rooms[rng.randrange(min(options['hot_rooms'], len(data.rooms)))]
+    start = data.end + timedelta(hours=rng.randrange(48))
+    response = client.post(reverse('booking:booking-list'), data={
+        'room': room.pk,
+        'start_time': start.isoformat(),
+        'end_time': (start + timedelta(hours=rng.randint(1, 3))).isoformat(),
+    }, headers={'Authorization': f'Token {rng.choice(data.tokens)}'})
+    return response, (201, 400)
+
+
+def booking_list(client, data, rng, options):
+    response = client.get(reverse('booking:booking-list'), {'page_size': 50},
+                          headers={'Authorization': f'Token {rng.choice(data.tokens)}'})
+    return response, (200,)
+
+
+SCENARIOS = {
+    'room_search': room_search,
+    'booking_create': booking_create,
+    'booking_list': booking_list,
+}
+
+
+class Command(BaseCommand):
+    """
+    Load of the API through the whole request stack by concurrent in-process clients, one scenario after
+    another, over synthetic data which is deleted afterwards. The data is committed, since every client
+    thread uses its own connection, so the command must not run against a production database.
+    """
+    help = ('Benchmark suite of room search, booking create under contention and booking list, '
+            'with JSON results and a regression check against a baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=200)
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--bookings-per-room', type=int, default=50)
+        parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--hot-rooms', type=int, default=3,
+                            help='Number of rooms the booking_create requests compete for.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='File to write the JSON results to.')
+        parser.add_argument('--baseline', help='JSON results of an earlier run to compare with.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Share of throughput loss or p95 growth which fails the run.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+
+        # Allowing the test client host and keeping DEBUG off, so the queries are not stored.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False):
+            delete_data()
+            try:
+                data = generate_data(options['rooms'], options['users'], options['bookings_per_room'])
+                results = {name: self.run_scenario(SCENARIOS[name], data, options)
+                           for name in options['scenarios']}
+            finally:
+                delete_data()
+
+        report = {'meta': self.meta(options), 'scenarios': results}
+        for name, summary in results.items():
+            self.stdout.write(f'{name:>15}: {summary["throughput"]:8.1f} req/s, errors {summary["errors"]}, '
+                              f'p50 {summary["p50_ms"]:.1f} ms, p95 {summary["p95_ms"]:.1f} ms, '
+                              f'p99 {summary["p99_ms"]:.1f} ms')
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+
+        if baseline is not None:
+            regressions = compare_results(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError('Performance regression:\n' + '\n'.join(regressions))
+            self.stdout.write(f'No regression over {options["threshold"]:.0%} against {options["baseline"]}.')
+
+    @staticmethod
+    def run_scenario(scenario, data, options):
+        """
+        Latency summary of the scenario run options['requests'] times, split between the client threads.
+        A response with an unexpected status is counted as an error.
+        """
+        concurrency = max(1, min(options['concurrency'], options['requests']))
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1_000 + index)
+            client, latencies, errors = Client(), [], 0
+            try:
+                for _ in range(options['requests'] // concurrency + (index < options['requests'] % concurrency)):
+                    started = time.perf_counter()
+                    response, expected = scenario(client, data, rng, options)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    errors += response.status_code not in expected
+            finally:
+                if concurrency > 1:
+                    connections.close_all()
+            return latencies, errors
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            outcomes = [worker(0)]
+        else:
+            with ThreadPoolExecutor(concurrency) as executor:
+                outcomes = list(executor.map(worker, range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for worker_latencies, _ in outcomes for latency in worker_latencies]
+        return latency_summary(latencies, elapsed, sum(errors for _, errors in outcomes))
+
+    @staticmethod
+    def meta(options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'time': timezone.now().isoformat(),
+            'database': connection.vendor,
+            **{key: options[key] for key in ('rooms', 'users', 'bookings_per_room', 'requests',
+                                             'concurrency', 'hot_rooms', 'seed')},
+        }
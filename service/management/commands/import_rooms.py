@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from service.importers import import_rooms, read_rows
+from service.serializers import ROOM_IMPORT_FORMATS
+
+
+class Command(BaseCommand):
+    """
+    Upserting rooms from a CSV or JSONL file, streaming it in batches.
+    """
+    help = 'Import rooms from a CSV (with a header) or JSONL file, updating rooms with existing numbers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=ROOM_IMPORT_FORMATS,
+                            help='File format, detected from the extension by default.')
+        parser.add_argument('--batch-size', type=int, default=1_000)
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if file_format not in ROOM_IMPORT_FORMATS:
+            raise CommandError(f'Cannot detect the format of {options["path"]}, use --format.')
+
+        def report(result):
+            self.stdout.write(f'{result.rows} rows processed, {result.rows_per_second:.0f} rows/sec')
+
+        with open(options['path'], newline='', encoding='utf-8') as file:
+            try:
+                result = import_rooms(read_rows(file, file_format), options['batch_size'], on_batch=report)
+            except ValueError as exc:
+                raise CommandError(f'Import stopped, the batches before the error are saved: {exc}')
+
+        for error in result.errors:
+            self.stderr.write(f'Row {error["row"]}: {error["errors"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.imported} rooms imported, {result.skipped} rows skipped in {result.seconds:.2f} s '
+            f'({result.rows_per_second:.0f} rows/sec)'
+        ))
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service.management.benchmarks import latency_summary
+
+
+async def fetch(url, headers, slow_ms=0):
+    """
+    Status code of a GET request to the url, sent over a new HTTP/1.1 connection.
+    The end of the request is sent slow_ms after the rest, keeping the connection open on the server
+    like a client on a slow network.
+    """
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    request_lines = [f'GET {path or "/"} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close', *headers]
+    writer.write(('\r\n'.join(request_lines) + '\r\n').encode('latin-1'))
+    await writer.drain()
+    if slow_ms:
+        await asyncio.sleep(slow_ms / 1000)
+    writer.write(b'\r\n')
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1])
+
+
+async def run(url, headers, concurrency, requests, slow_ms):
+    """
+    Latencies in milliseconds and the number of failed requests, with concurrency clients sending requests
+    one after another, each taking slow_ms to send its request, see fetch().
+    """
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                status_code = await fetch(url, headers, slow_ms)
+            except (OSError, IndexError, ValueError):
+                status_code = None
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status_code != 200:
+                errors += 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    """
+    Load test of running deployments, for example the synchronous views behind a WSGI server
+    against the async views behind an ASGI server.
+    """
+    help = 'Load test of one or more URLs with concurrent clients, reporting throughput and latency percentiles.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=2_000)
+        parser.add_argument('--slow-ms', type=int, default=0,
+                            help='Time every client takes to send a request over an open connection, in milliseconds.')
+        parser.add_argument('--header', action='append', default=[],
+                            help="Request header, e.g. 'Authorization: Token ...'.")
+
+    def handle(self, *args, **options):
+        for url in options['urls']:
+            if urlsplit(url).scheme != 'http':
+                raise CommandError(f'Only http:// URLs are supported: {url}')
+
+            started = time.perf_counter()
+            latencies, errors = asyncio.run(run(url, options['header'], options['concurrency'],
+                                                options['requests'], options['slow_ms']))
+            summary = latency_summary(latencies, time.perf_counter() - started, errors)
+
+            self.stdout.write(f'{url}\n  {summary["throughput"]:8.1f} req/s, errors {errors}, '
+                              f'latency p50 {summary["p50_ms"]:.1f} ms, p95 {summary["p95_ms"]:.1f} ms, '
+                              f'p99 {summary["p99_ms"]:.1f} ms '
+                              f'({len(latencies)} requests, concurrency {options["concurrency"]})')
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from service.partitions import add_partitions, is_partitioned, partition_table
+
+
+class Command(BaseCommand):
+    """
+    Partitioning the booking table of PostgreSQL by UTC month of start_time on the first run, which locks
+    the table while the bookings are copied, and creating the partitions of the coming months on the next ones,
+    so it is meant to run monthly.
+    """
+    help = 'Partition the booking table by month and create the partitions of the coming months.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=12)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning is only supported on PostgreSQL, '
+                               'archive_bookings deletes the archived bookings on other databases.')
+        if not is_partitioned():
+            partitions = partition_table(options['months_ahead'])
+            self.stdout.write(f'The booking table was partitioned into {partitions} monthly partitions.')
+        created = add_partitions(options['months_ahead'])
+        self.stdout.write(f'{len(created)} partitions created: {", ".join(f"{month:%Y-%m}" for month in created)}.'
+                          if created else 'No partitions created.')
+        if not settings.BOOKING_PARTITIONING:
+            self.stderr.write('Set BOOKING_PARTITIONING=1, overlapping bookings in different partitions are only '
+                              'rejected with it.')
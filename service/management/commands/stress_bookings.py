@@ -0,0 +1,124 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from statistics import mean
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from service.management.benchmarks import BENCHMARK_PREFIX, delete_data, generate_data, latency_summary
+from service.models import Room
+
+
+def post_booking(task):
+    """
+    Status and latency in milliseconds of one booking request, sent at the start_at wall clock time
+    so that all the requests of a round hit the server together.
+    """
+    url, data, token, start_at = task
+    # Errors of the server, such as a locked database, are counted instead of stopping the test.
+    client = Client(raise_request_exception=False)
+    connection.ensure_connection()
+    try:
+        time.sleep(max(0.0, start_at - time.time()))
+        started = time.perf_counter()
+        response = client.post(url, data=data, headers={'Authorization': f'Token {token}'})
+        return response.status_code, (time.perf_counter() - started) * 1000
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    """
+    Firing rounds of parallel requests booking overlapping periods of one room and checking that exactly
+    one of them succeeds, for growing concurrency. The rooms and bookings are committed and deleted
+    afterwards, so the command must not run against a production database.
+    """
+    help = 'Stress test of parallel overlapping bookings of the same room against double-booking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[2, 4, 8, 16])
+        parser.add_argument('--rounds', type=int, default=10)
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--output', help='File to write the JSON results to.')
+
+    def handle(self, *args, **options):
+        levels = sorted(set(options['concurrency']))
+        # Allowing the test client host and keeping DEBUG off, so the queries are not stored.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], DEBUG=False):
+            delete_data()
+            try:
+                tokens = generate_data(0, max(levels), 0).tokens
+                baseline = self.run_level(1, tokens, options, label='uncontended')
+                results = {level: self.run_level(level, tokens, options) for level in levels}
+            finally:
+                delete_data()
+
+        uncontended = baseline['p50_ms']
+        self.stdout.write(f'Uncontended request: p50 {uncontended:.1f} ms')
+        for level, result in results.items():
+            # Time over an uncontended request, spent waiting for locks or retrying.
+            result['wait_ms'] = max(0.0, result['mean_ms'] - uncontended)
+            self.stdout.write(
+                f'{level:>4} parallel: {result["throughput"]:8.1f} req/s, p50 {result["p50_ms"]:.1f} ms, '
+                f'p95 {result["p95_ms"]:.1f} ms, wait {result["wait_ms"]:.1f} ms, '
+                f'double bookings {result["double_bookings"]}, no booking {result["no_booking"]}, '
+                f'errors {result["errors"]} ({result["rounds"]} rounds)'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'database': connection.vendor, 'pool': options['pool'], 'uncontended_ms': uncontended,
+                           'levels': results}, file, indent=2)
+
+        failed = [level for level, result in results.items()
+                  if result['double_bookings'] or result['no_booking'] or result['errors']]
+        if failed:
+            raise CommandError(f'Rounds without exactly one booking at concurrency {failed}.')
+
+    def run_level(self, level, tokens, options, label=None):
+        """
+        Rounds of level requests for periods of a new room, each overlapping all the others.
+        """
+        url = reverse('booking:booking-list')
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        double_bookings = no_booking = errors = 0
+        latencies, elapsed = [], 0.0
+
+        # Connections must not be shared with forked processes.
+        connections.close_all()
+        executor_class = ThreadPoolExecutor if options['pool'] == 'thread' else ProcessPoolExecutor
+        with executor_class(level) as executor:
+            for round_number in range(options['rounds']):
+                room = Room.objects.create(number=f'{BENCHMARK_PREFIX}stress-{label or level}-{round_number}',
+                                           cost_per_day=100, beds=1)
+                connections.close_all()
+                start_at = time.time() + (0.05 if options['pool'] == 'thread' else 0.5)
+                tasks = [
+                    (url, {'room': room.pk,
+                           'start_time': (start + timedelta(minutes=i)).isoformat(),
+                           'end_time': (start + timedelta(hours=1, minutes=i)).isoformat()},
+                     tokens[i % len(tokens)], start_at)
+                    for i in range(level)
+                ]
+                outcomes = list(executor.map(post_booking, tasks))
+                elapsed += max(latency for _, latency in outcomes) / 1000
+                latencies += [latency for _, latency in outcomes]
+
+                statuses = [status_code for status_code, _ in outcomes]
+                created = statuses.count(201)
+                double_bookings += created > 1
+                no_booking += created == 0
+                errors += sum(status_code not in (201, 400) for status_code in statuses)
+
+        return {
+            **latency_summary(latencies, elapsed, errors),
+            'rounds': options['rounds'],
+            'mean_ms': mean(latencies),
+            'double_bookings': double_bookings,
+            'no_booking': no_booking,
+        }
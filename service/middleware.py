@@ -0,0 +1,85 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from service.instrumentation import RequestTimings, current_timings, request_metrics
+
+
+def view_name(view_func, method):
+    """
+    Name of the view as 'RoomViewSet.list' for viewsets, 'DatabaseStatsView.get' for API views
+    and 'async_views.room_list' for function views.
+    """
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__.rsplit(".", 1)[-1]}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+
+
+class PerformanceMiddleware:
+    """
+    Measuring the wall time, database queries and time, serialization time and response size of every
+    request. They are sent in the Server-Timing header and recorded in request_metrics by view.
+    Disabled with settings.PERFORMANCE_METRICS = False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, timings = time.perf_counter(), RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(response, timings, started)
+
+    async def __acall__(self, request):
+        started, timings = time.perf_counter(), RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.finish(response, timings, started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.view = view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        timings = current_timings.get()
+        if timings is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timings.serialize_seconds += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def finish(response, timings, started):
+        duration = time.perf_counter() - started
+        # The size of streamed bodies is not known until they are sent.
+        size = 0 if response.streaming else len(response.content)
+        response['Server-Timing'] = (
+            f'db;dur={timings.db_seconds * 1000:.2f};desc="{timings.queries} queries", '
+            f'serialize;dur={timings.serialize_seconds * 1000:.2f}, '
+            f'total;dur={duration * 1000:.2f}'
+        )
+        request_metrics.record(timings, duration, size)
+        return response
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+CONSTRAINT_NAME = 'booking_room_period_excl'
+CONFLICTS_SHOWN = 20
+
+
+def check_booking_periods(connection):
+    """
+    Failing with the list of the bookings the constraint would reject: overlapping bookings of the same room
+    and periods ending before they start. They have to be moved or deleted before migrating.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT a.id, b.id, a.room_id FROM service_booking a JOIN service_booking b '
+            'ON a.room_id = b.room_id AND a.id < b.id AND a.start_time < b.end_time AND b.start_time < a.end_time '
+            'ORDER BY a.id, b.id'
+        )
+        overlapping = cursor.fetchall()
+        cursor.execute('SELECT id FROM service_booking WHERE end_time < start_time ORDER BY id')
+        inverted = [booking_id for booking_id, in cursor.fetchall()]
+    if not overlapping and not inverted:
+        return
+    problems = [f'bookings {first} and {second} of room {room_id} overlap'
+                for first, second, room_id in overlapping[:CONFLICTS_SHOWN]]
+    problems += [f'booking {booking_id} ends before it starts' for booking_id in inverted[:CONFLICTS_SHOWN]]
+    more = len(overlapping) + len(inverted) - len(problems)
+    raise RuntimeError(
+        'The booking exclusion constraint cannot be added, move or delete these bookings and migrate again: '
+        + '; '.join(problems) + (f'; and {more} more.' if more else '.')
+    )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    """
+    Race-free protection from double bookings, available only on PostgreSQL.
+    On other databases BookingSerializer re-checks the period after the insert.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    check_booking_periods(schema_editor.connection)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE service_booking ADD CONSTRAINT {CONSTRAINT_NAME} '
+        f"EXCLUDE USING gist (room_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&)"
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'ALTER TABLE service_booking DROP CONSTRAINT IF EXISTS {CONSTRAINT_NAME}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0007_booking_room_period_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.3 on 2026-10-18 20:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0008_booking_room_period_excl'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'end_time', 'start_time'], name='booking_room_end_idx'),
+        ),
+    ]
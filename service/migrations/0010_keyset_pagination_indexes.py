@@ -0,0 +1,27 @@
+# Generated by Django 5.0.3 on 2026-10-18 21:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0009_booking_room_end_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['client', 'id'], name='booking_client_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['cost_per_day', 'id'], name='room_cost_per_day_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['beds', 'id'], name='room_beds_id_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:13
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 5_000
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def backfill(apps, schema_editor):
+    """
+    Rollup rows of the existing bookings, computed as service.rollups did when the rollup was added.
+    """
+    Booking = apps.get_model('service', 'Booking')
+    RoomOccupancy = apps.get_model('service', 'RoomOccupancy')
+    database = schema_editor.connection.alias
+    periods = Booking.objects.using(database).order_by('room_id').values_list(
+        'room_id', 'start_time', 'end_time').iterator(chunk_size=BATCH_SIZE)
+    batch = []
+    for room_id, room_periods in groupby(periods, key=itemgetter(0)):
+        seconds = Counter()
+        for _, start_time, end_time in room_periods:
+            start, end = timezone.localtime(start_time), timezone.localtime(end_time)
+            day = start.date()
+            while (day_start := local_midnight(day)) < end:
+                next_day = day + timedelta(days=1)
+                day_seconds = int((min(end, local_midnight(next_day)) - max(start, day_start)).total_seconds())
+                seconds['day', day] += day_seconds
+                seconds['month', day.replace(day=1)] += day_seconds
+                day = next_day
+        batch += [RoomOccupancy(room_id=room_id, granularity=granularity, period_start=period_start,
+                                booked_seconds=booked_seconds)
+                  for (granularity, period_start), booked_seconds in seconds.items()]
+        if len(batch) >= BATCH_SIZE:
+            RoomOccupancy.objects.using(database).bulk_create(batch)
+            batch = []
+    RoomOccupancy.objects.using(database).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0011_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('booked_seconds', models.BigIntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='service.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'period_start', 'room'], name='room_occupancy_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='roomoccupancy',
+            constraint=models.UniqueConstraint(fields=('room', 'granularity', 'period_start'), name='room_occupancy_uniq'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.3 on 2026-10-18 22:22
+
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import migrations, models
+
+BATCH_SIZE = 2_000
+CENT = Decimal('0.01')
+MICROSECONDS_PER_DAY = timedelta(days=1) // timedelta(microseconds=1)
+
+
+def booking_cost(cost_per_day, start_time, end_time):
+    """
+    Frozen copy of service.pricing.booking_cost as it was when the field was added.
+    """
+    microseconds = (end_time - start_time) // timedelta(microseconds=1)
+    return (Decimal(cost_per_day) * microseconds / MICROSECONDS_PER_DAY).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def price_bookings(apps, schema_editor):
+    """
+    Pricing the existing bookings at the current cost_per_day of their rooms.
+    """
+    Booking = apps.get_model('service', 'Booking')
+    bookings = Booking.objects.using(schema_editor.connection.alias)
+    rows = bookings.order_by('pk').values_list(
+        'pk', 'start_time', 'end_time', 'room__cost_per_day'
+    ).iterator(chunk_size=BATCH_SIZE)
+    batch = []
+    for pk, start_time, end_time, cost_per_day in rows:
+        batch.append(Booking(pk=pk, total_cost=booking_cost(cost_per_day, start_time, end_time)))
+        if len(batch) == BATCH_SIZE:
+            bookings.bulk_update(batch, ['total_cost'])
+            batch = []
+    bookings.bulk_update(batch, ['total_cost'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0012_room_occupancy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12),
+        ),
+        migrations.RunPython(price_bookings, migrations.RunPython.noop),
+    ]
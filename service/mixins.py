@@ -0,0 +1,103 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from service.db_router import replica_reads, pin_to_primary, is_pinned_to_primary
+from service.instrumentation import serialization
+
+
+def conditional_response(request, etag, last_modified=None):
+    """
+    304 response if the client already has this version of the resource, None otherwise.
+    Only the ETag is compared: Last-Modified has a one-second granularity, so If-Modified-Since
+    would miss the writes made in the second of the version the client has.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_version_headers(response, etag, last_modified)
+    return response
+
+
+def set_version_headers(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag headers for list and retrieve, plus Last-Modified for retrieve, built from the updated_at
+    column of the rows instead of the rendered body. A request with a matching If-None-Match
+    is answered with 304 before the serialization, If-Modified-Since alone is not, see conditional_response().
+
+    List ETags cover the rows of the page and the pagination links, so deletions and new rows
+    on the page change them as well. Lists have no Last-Modified, since a deletion does not change it.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self.get_etag(request, [(instance.pk, instance.updated_at)])
+        last_modified = int(instance.updated_at.timestamp())
+
+        not_modified = conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        with serialization():
+            data = self.get_serializer(instance).data
+        return set_version_headers(Response(data), etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        links = () if page is None else (self.paginator.get_next_link(), self.paginator.get_previous_link())
+        etag = self.get_etag(request, [(row.pk, row.updated_at) for row in rows], *links)
+
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        with serialization():
+            data = self.get_serializer(rows, many=True).data
+        if page is None:
+            response = Response(data)
+        else:
+            response = self.get_paginated_response(data)
+        return set_version_headers(response, etag)
+
+    @staticmethod
+    def get_etag(request, versions, *extra):
+        """
+        Strong ETag of the (pk, updated_at) versions of the rows in the representation chosen by the request.
+        """
+        return quote_etag(md5(repr((
+            request.accepted_renderer.format, request.get_host(), request.get_full_path(), versions, extra
+        )).encode()).hexdigest())
+
+
+class ReplicaReadMixin:
+    """
+    Safe-method requests are handled reading from the replicas, after the authentication and permission
+    checks, which see the primary. A successful write pins the reads of its user to the primary for a while.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.DATABASE_REPLICAS and request.method in SAFE_METHODS
+                and not is_pinned_to_primary(request.user)):
+            self._replica_reads_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_reads_token', None)
+        if token is not None:
+            replica_reads.reset(token)
+            self._replica_reads_token = None
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,8 +1,21 @@
+from datetime import timedelta
 from decimal import Decimal
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, router
+from django.db.models import Exists, F, Max, OuterRef
+
+from service.pricing import booking_cost
+
+# Exclusion constraint created on PostgreSQL by migration 0008.
+BOOKING_PERIOD_CONSTRAINT = 'booking_room_period_excl'
+# Index on the length of the bookings created by the partition_bookings command.
+BOOKING_LENGTH_INDEX = 'booking_length_idx'
+LONGEST_BOOKING_KEY = 'service:bookings:longest'
+LONGEST_BOOKING_TIMEOUT = 60
 
 
 class Room(models.Model):
@@ -10,17 +23,137 @@ class Room(models.Model):
     cost_per_day = models.DecimalField(max_digits=7,
                                        decimal_places=2, validators=[MinValueValidator(Decimal(0))])
     beds = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of RoomViewSet for the ordering_fields.
+            models.Index(fields=['cost_per_day', 'id'], name='room_cost_per_day_id_idx'),
+            models.Index(fields=['beds', 'id'], name='room_beds_id_idx'),
+        ]
 
     def __str__(self):
         return f'Room number {self.number}'
 
 
+class BookingQuerySet(models.QuerySet):
+    def overlapping(self, start_time, end_time):
+        """
+        Bookings intersecting the half-open period [start_time, end_time).
+        On a partitioned table start_time is also bounded from below by the length of the longest booking,
+        so that only the partitions which may hold intersecting bookings are scanned.
+        """
+        queryset = self.filter(start_time__lt=end_time, end_time__gt=start_time)
+        if settings.BOOKING_PARTITIONING:
+            queryset = queryset.filter(start_time__gt=start_time - longest_booking())
+        return queryset
+
+    def conflicting(self):
+        """
+        Bookings intersecting another booking of the same room.
+        """
+        return self.filter(Exists(
+            self.model.objects.filter(
+                room=OuterRef('room'), start_time__lt=OuterRef('end_time'), end_time__gt=OuterRef('start_time')
+            ).exclude(pk=OuterRef('pk'))
+        ))
+
+
+def longest_booking():
+    """
+    Length of the longest booking, read through the length index and cached for LONGEST_BOOKING_TIMEOUT seconds.
+    Saved bookings raise the cached length, writes racing with each other may lower it back until the timeout,
+    the periods of the saved bookings are re-checked without the bound, see service.serializers.save_guarded.
+    """
+    longest = cache.get(LONGEST_BOOKING_KEY)
+    if longest is None:
+        longest = Booking.objects.aggregate(longest=Max(F('end_time') - F('start_time')))['longest'] or timedelta(0)
+        cache.set(LONGEST_BOOKING_KEY, longest, LONGEST_BOOKING_TIMEOUT)
+    return longest
+
+
+def note_booking_length(length):
+    """
+    Raising the cached length of the longest booking to the length of a saved booking.
+    """
+    longest = cache.get(LONGEST_BOOKING_KEY)
+    if longest is not None and length > longest:
+        cache.set(LONGEST_BOOKING_KEY, length, LONGEST_BOOKING_TIMEOUT)
+
+
 class Booking(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='bookings')
     client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    # Price of the booking at the cost_per_day of the room when the period or the room was last changed.
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal(0))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookingQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Values as loaded, so that the signal receivers can tell what an update changed.
+        instance._loaded_values = {name: value for name, value in zip(field_names, values)
+                                   if value is not models.DEFERRED}
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_values', {})
+        if self.pk is not None and not {'room_id', 'start_time', 'end_time'} <= loaded.keys():
+            # An update of an instance not loaded from the database, the receivers need the stored period.
+            using = kwargs.get('using') or router.db_for_write(Booking, instance=self)
+            stored = Booking._base_manager.using(using).filter(pk=self.pk).values(
+                'room_id', 'start_time', 'end_time').first()
+            loaded = self._loaded_values = {**loaded, **(stored or {})}
+        if any(loaded.get(name) != getattr(self, name) for name in ('room_id', 'start_time', 'end_time')):
+            # Instances created from strings keep them until they are reloaded.
+            start_time, end_time = [self._meta.get_field(name).to_python(getattr(self, name))
+                                    for name in ('start_time', 'end_time')]
+            self.total_cost = booking_cost(self.room.cost_per_day, start_time, end_time)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'total_cost'}
+            if settings.BOOKING_PARTITIONING:
+                note_booking_length(end_time - start_time)
+        super().save(*args, **kwargs)
+        # The saved values are the loaded ones of the next update.
+        self._loaded_values = {field.attname: self.__dict__[field.attname] for field in self._meta.concrete_fields
+                               if field.attname in self.__dict__}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'start_time', 'end_time'], name='booking_room_period_idx'),
+            # Availability searches look into the future, so seeking by end_time skips finished stays.
+            models.Index(fields=['room', 'end_time', 'start_time'], name='booking_room_end_idx'),
+            # Keyset pagination of the own bookings list.
+            models.Index(fields=['client', 'id'], name='booking_client_id_idx'),
+        ]
 
     def __str__(self):
         return f'Booking of room {self.room} by {self.client}'
 
+
+class RoomOccupancy(models.Model):
+    """
+    Booked seconds of a room in a local day or month starting at period_start, maintained on booking writes
+    by service.rollups and rebuilt by the backfill_occupancy command.
+    """
+    DAY = 'day'
+    MONTH = 'month'
+    GRANULARITIES = [(DAY, 'Day'), (MONTH, 'Month')]
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='+')
+    granularity = models.CharField(max_length=5, choices=GRANULARITIES)
+    period_start = models.DateField()
+    booked_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'granularity', 'period_start'], name='room_occupancy_uniq'),
+        ]
+        indexes = [
+            # Statistics of all the rooms over a range of periods.
+            models.Index(fields=['granularity', 'period_start', 'room'], name='room_occupancy_period_idx'),
+        ]
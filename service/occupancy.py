@@ -0,0 +1,104 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from service.cache import calendar_generation, get_generations, replace_generations
+from service.models import Booking
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def month_starts(start_date, end_date):
+    """
+    First days of the months intersecting the half-open date range [start_date, end_date).
+    """
+    month = start_date.replace(day=1)
+    while month < end_date:
+        yield month
+        month = (month + timedelta(days=31)).replace(day=1)
+
+
+def month_bounds(month, resolution):
+    """
+    Timestamps of the slot bounds of the month in the current time zone, one more than the slots.
+    Days follow the local midnights, hours are absolute, so DST changes make days of 23 or 25 hours.
+    """
+    next_month = (month + timedelta(days=31)).replace(day=1)
+    if resolution == 'day':
+        return [local_midnight(month + timedelta(days=i)).timestamp() for i in range((next_month - month).days + 1)]
+    start, end = local_midnight(month).timestamp(), local_midnight(next_month).timestamp()
+    return [start + hour * 3600 for hour in range(int(end - start) // 3600 + 1)]
+
+
+def sweep(bounds, periods):
+    """
+    Bitmap of the slots between the bounds, '1' for a slot intersecting one of the (start, end) periods.
+    The slots of a period are found by bisection and filled by one slice assignment.
+    """
+    bits = bytearray(b'0' * (len(bounds) - 1))
+    for start, end in periods:
+        first = max(bisect_right(bounds, start) - 1, 0)
+        last = min(bisect_left(bounds, end), len(bits))
+        if first < last:
+            bits[first:last] = b'1' * (last - first)
+    return bits.decode('ascii')
+
+
+def room_calendars(room_ids, start_date, end_date, resolution):
+    """
+    Occupancy bitmaps of the rooms over [start_date, end_date) by room id, with one character per day or hour.
+
+    Bitmaps are computed per room and month, the months missing from the cache with a single query
+    for the bookings of all the rooms, and cached for settings.CALENDAR_CACHE_TIMEOUT seconds under
+    the calendar generation of the room, which booking writes replace.
+    """
+    months = list(month_starts(start_date, end_date))
+    bounds = {month: month_bounds(month, resolution) for month in months}
+
+    keys = {}
+    if settings.CALENDAR_CACHE_TIMEOUT:
+        generations = get_generations([calendar_generation(room_id) for room_id in room_ids])
+        keys = {(room_id, month): f'service:calendar:{room_id}:{generation}:{resolution}:{month:%Y-%m}'
+                for room_id, generation in zip(room_ids, generations) for month in months}
+    cached = cache.get_many(keys.values()) if keys else {}
+    bitmaps = {(room_id, month): cached.get(keys.get((room_id, month)))
+               for room_id in room_ids for month in months}
+
+    missing = [key for key, bitmap in bitmaps.items() if bitmap is None]
+    if missing:
+        missing_months = {month for _, month in missing}
+        periods = {}
+        queryset = Booking.objects.filter(room_id__in={room_id for room_id, _ in missing}).overlapping(
+            datetime.fromtimestamp(bounds[min(missing_months)][0], dt_timezone.utc),
+            datetime.fromtimestamp(bounds[max(missing_months)][-1], dt_timezone.utc)
+        ).values_list('room_id', 'start_time', 'end_time')
+        for room_id, start_time, end_time in queryset:
+            periods.setdefault(room_id, []).append((start_time.timestamp(), end_time.timestamp()))
+        for room_id, month in missing:
+            bitmaps[room_id, month] = sweep(bounds[month], periods.get(room_id, ()))
+        if keys:
+            cache.set_many({keys[key]: bitmaps[key] for key in missing}, settings.CALENDAR_CACHE_TIMEOUT)
+
+    # Slots of the range within the concatenated months.
+    first = bisect_left(bounds[months[0]], local_midnight(start_date).timestamp())
+    last = (sum(len(bounds[month]) - 1 for month in months[:-1])
+            + bisect_left(bounds[months[-1]], local_midnight(end_date).timestamp()))
+    return {room_id: ''.join(bitmaps[room_id, month] for month in months)[first:last] for room_id in room_ids}
+
+
+def invalidate_calendars(room_ids):
+    if settings.CALENDAR_CACHE_TIMEOUT:
+        replace_generations([calendar_generation(room_id) for room_id in room_ids])
+
+
+def booking_room_ids(booking):
+    """
+    Rooms whose calendars a write of the booking changes: its room and the one it was loaded with.
+    """
+    loaded = getattr(booking, '_loaded_values', {}).get('room_id')
+    return {booking.room_id} | ({loaded} if loaded is not None else set())
@@ -0,0 +1,177 @@
+import binascii
+import json
+from base64 import b64decode, b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination seeking by the ordering field with 'id' as a tie-breaker.
+
+    The cursor stores the values of the (field, id) key of the last item on the page, so every page is
+    fetched with a WHERE on the key and a LIMIT, which with an index on (field, id) costs the same
+    at any depth. Unlike rest_framework.pagination.CursorPagination no offsets are used for equal values.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = ('id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, position, reverse = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(queryset), position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() fetching the page with the async ORM.
+        """
+        queryset, position, reverse = self.get_page_queryset(queryset, request, view)
+        return self.set_page([instance async for instance in queryset], position, reverse)
+
+    def get_page_queryset(self, queryset, request, view):
+        """
+        Queryset of the requested page plus one row telling whether there are more, with the cursor position.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+        position, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = [self._reverse(field) for field in self.ordering] if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+        return queryset[:self.page_size + 1], position, reverse
+
+    def set_page(self, results, position, reverse):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Ordering from OrderingFilter of the view, if any, completed with 'id' in the direction of the last field.
+        """
+        ordering = None
+        if OrderingFilter in getattr(view, 'filter_backends', []):
+            ordering = OrderingFilter().get_ordering(request, queryset, view)
+        ordering = list(ordering or self.ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False) if self.page else None
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request, model):
+        """
+        Position and direction of the cursor, with the values converted by the model fields of the ordering,
+        which must be the one the cursor was created with.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii'), validate=True))
+            position, reverse = cursor['p'], bool(cursor['r'])
+            if (cursor['o'] != list(self.ordering) or not isinstance(position, list)
+                    or len(position) != len(self.ordering)):
+                raise ValueError
+            position = [self._field(model, field).to_python(value) for field, value in zip(self.ordering, position)]
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        position = [str(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+        cursor = {'p': position, 'r': int(reverse), 'o': list(self.ordering)}
+        encoded = b64encode(json.dumps(cursor).encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _field(model, field):
+        name = field.lstrip('-')
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Rows following the position in the ordering: (a, b) > (x, y) as (a > x) OR (a = x AND b > y).
+        """
+        condition, equal = Q(), {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
@@ -0,0 +1,232 @@
+import gzip
+import os
+import re
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from service.exporters import export_bookings
+from service.models import Booking, BOOKING_LENGTH_INDEX, BOOKING_PERIOD_CONSTRAINT
+from service.signals import bookings_archived
+
+TABLE = Booking._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(moment):
+    """
+    First day of the UTC month of the datetime, the partitions follow UTC months.
+    """
+    return moment.astimezone(dt_timezone.utc).date().replace(day=1)
+
+
+def next_month(month):
+    return (month + timedelta(days=31)).replace(day=1)
+
+
+def add_months(month, count):
+    return date(month.year + (month.month - 1 + count) // 12, (month.month - 1 + count) % 12 + 1, 1)
+
+
+def months(first, end):
+    """
+    Months from the first one up to the end one, excluded.
+    """
+    while first < end:
+        yield first
+        first = next_month(first)
+
+
+def month_datetime(month):
+    return datetime.combine(month, time.min, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def partition_months():
+    """
+    Months of the partitions of the booking table, without the default partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass', [TABLE]
+        )
+        names = [name for name, in cursor.fetchall()]
+    return sorted(date(int(match[1]), int(match[2]), 1) for name in names if (match := PARTITION_NAME.match(name)))
+
+
+def _bounds(month):
+    return f"FROM ('{month_datetime(month).isoformat()}') TO ('{month_datetime(next_month(month)).isoformat()}')"
+
+
+def _create_partition(cursor, month):
+    cursor.execute(f'CREATE TABLE {partition_name(month)} PARTITION OF {TABLE} FOR VALUES {_bounds(month)}')
+
+
+def _add_exclusion_constraint(cursor, name):
+    # Exclusion constraints cannot span partitions, each one gets its own, see service.serializers.save_guarded.
+    cursor.execute(
+        f'ALTER TABLE {name} ADD CONSTRAINT {name}_{BOOKING_PERIOD_CONSTRAINT} '
+        f"EXCLUDE USING gist (room_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&)"
+    )
+
+
+def partition_table(months_ahead):
+    """
+    Converting the booking table of PostgreSQL into a table partitioned by UTC month of start_time,
+    with a partition per month from the first booking to months_ahead months after the current one
+    and a default partition for the later bookings.
+
+    The bookings are copied in one transaction holding an exclusive lock on the table, so it should
+    run during maintenance. The primary key includes start_time, as partitioned tables require,
+    the uniqueness of ids is kept by their sequence. Indexes and foreign keys are recreated with their names.
+    """
+    old = f'{TABLE}_unpartitioned'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+
+        cursor.execute(
+            # Indexes of the constraints are recreated with them.
+            'SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i WHERE i.indrelid = %s::regclass AND NOT EXISTS '
+            '(SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid)', [old]
+        )
+        indexes = [re.sub(rf' ON (\S+\.)?{old} ', f' ON {TABLE} ', definition) for definition, in cursor.fetchall()]
+        cursor.execute("SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+                       "WHERE conrelid = %s::regclass AND contype IN ('p', 'f')", [old])
+        constraints = cursor.fetchall()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [old])
+        cursor.execute(f'SELECT last_value, is_called FROM {cursor.fetchone()[0]}')
+        last_value, is_called = cursor.fetchone()
+        cursor.execute(f'SELECT min(start_time) FROM {old}')
+        first = cursor.fetchone()[0]
+
+        cursor.execute(f'CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (start_time)')
+        current = month_start(timezone.now())
+        partitioned = list(months(min(month_start(first), current) if first else current,
+                                  add_months(current, months_ahead + 1)))
+        for month in partitioned:
+            _create_partition(cursor, month)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {old}')
+        # The identity sequence of the old table is dropped with it.
+        cursor.execute(f'DROP TABLE {old}')
+
+        sequence = f'{TABLE}_id_seq'
+        cursor.execute(f'CREATE SEQUENCE {sequence} OWNED BY {TABLE}.id')
+        cursor.execute('SELECT setval(%s, %s, %s)', [sequence, last_value, is_called])
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        for name, constraint_type, definition in constraints:
+            if constraint_type == 'p':
+                definition = 'PRIMARY KEY (id, start_time)'
+            cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+        for definition in indexes:
+            cursor.execute(definition)
+        # Reads of the length of the longest booking, which bounds the overlap searches, see BookingQuerySet.overlapping.
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {BOOKING_LENGTH_INDEX} ON {TABLE} ((end_time - start_time))')
+        for name in [*map(partition_name, partitioned), DEFAULT_PARTITION]:
+            _add_exclusion_constraint(cursor, name)
+    return len(partitioned)
+
+
+def add_partitions(months_ahead):
+    """
+    Creating the missing partitions up to months_ahead months after the current one, from the month after
+    the latest partition or from the current month, moving their bookings out of the default partition.
+    Returns the months of the created partitions.
+    """
+    existing = partition_months()
+    current = month_start(timezone.now())
+    first = min(next_month(existing[-1]), current) if existing else current
+    created = []
+    for month in months(first, add_months(current, months_ahead + 1)):
+        if month in existing:
+            continue
+        name = partition_name(month)
+        bounds = [month_datetime(month), month_datetime(next_month(month))]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE start_time >= %s AND start_time < %s '
+                f'RETURNING *) INSERT INTO {name} SELECT * FROM moved', bounds
+            )
+            cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}')
+            _add_exclusion_constraint(cursor, name)
+        created.append(month)
+    return created
+
+
+def archivable_months(before):
+    """
+    Months before the given one whose bookings may be archived: the partitions of a partitioned table,
+    otherwise every month from the first booking.
+    """
+    if is_partitioned():
+        return [month for month in partition_months() if next_month(month) <= before]
+    first = Booking.objects.aggregate(first=Min('start_time'))['first']
+    return list(months(month_start(first), before)) if first else []
+
+
+def archive_month(month, directory):
+    """
+    Writing the bookings starting in the UTC month to a gzipped NDJSON file in the directory and removing them,
+    by detaching and dropping the partition of the month or, on a table without partitions, by deleting them.
+    The occupancy rollup keeps the archived periods. Months with bookings which have not ended yet are kept.
+
+    Returns None for a kept month, otherwise the number of archived bookings and the path of the file,
+    which is None for a month without bookings.
+    """
+    bookings = Booking.objects.filter(start_time__gte=month_datetime(month),
+                                      start_time__lt=month_datetime(next_month(month)))
+    partitioned = is_partitioned()
+    path = None
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if partitioned:
+                # Writes into the partition would be lost between the export and the detach.
+                cursor.execute(f'LOCK TABLE {partition_name(month)} IN SHARE MODE')
+            if bookings.filter(end_time__gt=timezone.now()).exists():
+                return None
+            room_ids = set(bookings.values_list('room_id', flat=True).distinct())
+
+            rows = 0
+            if room_ids:
+                # An earlier archive of the month is never overwritten.
+                with gzip.open(os.path.join(directory, f'bookings-{month:%Y-%m}.ndjson.gz'), 'xt',
+                               encoding='utf-8') as file:
+                    path = file.name
+                    for chunk in export_bookings(bookings, 'ndjson'):
+                        rows += chunk.count('\n')
+                        file.write(chunk)
+
+            if partitioned:
+                cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {partition_name(month)}')
+                cursor.execute(f'DROP TABLE {partition_name(month)}')
+            elif room_ids:
+                # Deleted without the post_delete receivers, which would remove the periods from the rollup.
+                cursor.execute(f'DELETE FROM {TABLE} WHERE start_time >= %s AND start_time < %s', [
+                    connection.ops.adapt_datetimefield_value(value)
+                    for value in (month_datetime(month), month_datetime(next_month(month)))
+                ])
+            if room_ids:
+                bookings_archived(room_ids)
+    except BaseException:
+        # The bookings of a failed archive are kept, so is not its file.
+        if path is not None:
+            os.remove(path)
+        raise
+    return rows, path
@@ -9,7 +9,7 @@ class IsAdminOrRoomClient(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         return bool(
-            (obj.client == request.user and (request.method in SAFE_METHODS or request.method == 'DELETE'))
+            (obj.client_id == request.user.id and (request.method in SAFE_METHODS or request.method == 'DELETE'))
             or request.user.is_superuser
         )
 
@@ -28,3 +28,12 @@ class IsAdminOrReadOnly(BasePermission):
         return bool(
             request.method in SAFE_METHODS or request.user.is_superuser
         )
+
+
+class IsAdmin(BasePermission):
+    """
+    Checking if the user is a superuser.
+    """
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_superuser)
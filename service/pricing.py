@@ -0,0 +1,21 @@
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+MICROSECONDS_PER_DAY = timedelta(days=1) // timedelta(microseconds=1)
+
+
+def booking_cost(cost_per_day, start_time, end_time):
+    """
+    Cost of the period at cost_per_day: the price times the length in days, computed from whole microseconds
+    in Decimal and rounded half up to cents once, so 36 hours at 100.00 cost exactly 150.00.
+    """
+    microseconds = (end_time - start_time) // timedelta(microseconds=1)
+    return (Decimal(cost_per_day) * microseconds / MICROSECONDS_PER_DAY).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def quote(costs, start_time, end_time):
+    """
+    Costs of the period for the rooms, by room id, from the {room id: cost_per_day} loaded for the whole batch.
+    """
+    return {room_id: booking_cost(cost_per_day, start_time, end_time) for room_id, cost_per_day in costs.items()}
@@ -0,0 +1,160 @@
+import json
+import logging
+import random
+import re
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from service import instrumentation
+from service.middleware import view_name
+
+logger = logging.getLogger('service.queries')
+
+STACK_FRAMES = 5
+# Files of the execute wrappers, left out of the stack summaries.
+WRAPPER_FILES = {__file__, instrumentation.__file__}
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_in_lists = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_whitespace = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """
+    Shape of the query: literals and IN lists of any length replaced with placeholders, whitespace collapsed.
+    """
+    sql = _literals.sub('?', sql)
+    sql = _in_lists.sub('IN (...)', sql)
+    return _whitespace.sub(' ', sql).strip()
+
+
+def stack_summary():
+    """
+    Innermost frames of the project code which led to the query, as 'path:line in function'.
+    """
+    base_dir = str(settings.BASE_DIR)
+    frames = [frame for frame in traceback.extract_stack()
+              if frame.filename.startswith(base_dir) and 'site-packages' not in frame.filename
+              and frame.filename not in WRAPPER_FILES]
+    return [f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+            for frame in frames[-STACK_FRAMES:]]
+
+
+class Inspection:
+    """
+    Queries of a sampled request: the number per shape and the stack of the first repetition of each shape.
+    """
+    __slots__ = ('view', 'shapes', 'stacks')
+
+    def __init__(self):
+        self.view = None
+        self.shapes = Counter()
+        self.stacks = {}
+
+
+current_inspection = ContextVar('current_inspection', default=None)
+
+
+def inspect_query(execute, sql, params, many, context):
+    inspection = current_inspection.get()
+    if inspection is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        shape = normalize_sql(sql)
+        inspection.shapes[shape] += 1
+        if inspection.shapes[shape] == 2:
+            inspection.stacks[shape] = stack_summary()
+        if duration_ms >= settings.SLOW_QUERY_MS:
+            logger.warning('slow_query', extra={'data': {
+                'view': inspection.view, 'sql': shape, 'duration_ms': round(duration_ms, 3),
+                'stack': stack_summary(),
+            }})
+
+
+@receiver(connection_created)
+def install_query_inspector(sender, connection, **kwargs):
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+class QueryInspectorMiddleware:
+    """
+    Logging the queries slower than settings.SLOW_QUERY_MS and the query shapes run at least
+    settings.DUPLICATE_QUERY_THRESHOLD times in one request, a sign of N+1 queries, to the 'service.queries'
+    logger. Only a settings.QUERY_INSPECTOR_SAMPLE_RATE share of requests is inspected.
+    Enabled with settings.QUERY_INSPECTOR = True.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.QUERY_INSPECTOR_SAMPLE_RATE:
+            return self.get_response(request)
+        inspection = Inspection()
+        token = current_inspection.set(inspection)
+        try:
+            return self.get_response(request)
+        finally:
+            current_inspection.reset(token)
+            self.report_duplicates(inspection)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.QUERY_INSPECTOR_SAMPLE_RATE:
+            return await self.get_response(request)
+        # The queries run in the threads of sync_to_async, which copy the context with the inspection.
+        inspection = Inspection()
+        token = current_inspection.set(inspection)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_inspection.reset(token)
+            self.report_duplicates(inspection)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        inspection = current_inspection.get()
+        if inspection is not None:
+            inspection.view = view_name(view_func, request.method)
+
+    @staticmethod
+    def report_duplicates(inspection):
+        for shape, count in inspection.shapes.items():
+            if count >= settings.DUPLICATE_QUERY_THRESHOLD:
+                logger.warning('duplicate_query', extra={'data': {
+                    'view': inspection.view, 'sql': shape, 'count': count, 'stack': inspection.stacks.get(shape, []),
+                }})
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Log record as one JSON object with the message as 'event' and the 'data' passed in extra.
+    """
+
+    def format(self, record):
+        return json.dumps({
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+            **getattr(record, 'data', {}),
+        }, default=str)
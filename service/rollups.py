@@ -0,0 +1,159 @@
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from service.models import Room, Booking, RoomOccupancy
+from service.occupancy import local_midnight, month_starts
+
+SECONDS_PER_DAY = 86_400
+BACKFILL_BATCH_SIZE = 5_000
+
+
+def _datetime(value):
+    # Instances created from strings keep them until they are reloaded.
+    return Booking._meta.get_field('start_time').to_python(value)
+
+
+def period_seconds(start_time, end_time):
+    """
+    Seconds of the period [start_time, end_time) in every local day and month it intersects,
+    as {(granularity, period start): seconds}.
+    """
+    start, end = timezone.localtime(_datetime(start_time)), timezone.localtime(_datetime(end_time))
+    seconds = Counter()
+    day = start.date()
+    while (day_start := local_midnight(day)) < end:
+        next_day = day + timedelta(days=1)
+        day_seconds = int((min(end, local_midnight(next_day)) - max(start, day_start)).total_seconds())
+        seconds[RoomOccupancy.DAY, day] += day_seconds
+        seconds[RoomOccupancy.MONTH, day.replace(day=1)] += day_seconds
+        day = next_day
+    return seconds
+
+
+def booking_deltas(periods, sign=1):
+    """
+    Changes of the booked seconds by (room id, granularity, period start) for the (room id, start, end)
+    periods added with sign 1 or removed with sign -1.
+    """
+    deltas = Counter()
+    for room_id, start_time, end_time in periods:
+        for (granularity, period_start), seconds in period_seconds(start_time, end_time).items():
+            deltas[room_id, granularity, period_start] += sign * seconds
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Adding the deltas to the rollup rows, which are created first if missing and then locked,
+    so concurrent writes of the same periods are applied one after another.
+    """
+    deltas = {key: seconds for key, seconds in deltas.items() if seconds}
+    if not deltas:
+        return
+    with transaction.atomic(savepoint=False):
+        RoomOccupancy.objects.bulk_create(
+            [RoomOccupancy(room_id=room_id, granularity=granularity, period_start=period_start)
+             for room_id, granularity, period_start in deltas],
+            ignore_conflicts=True
+        )
+        rows = RoomOccupancy.objects.select_for_update().filter(
+            room_id__in={room_id for room_id, _, _ in deltas},
+            period_start__range=(min(key[2] for key in deltas), max(key[2] for key in deltas))
+        ).order_by('room_id', 'granularity', 'period_start')
+        rows = [row for row in rows if (row.room_id, row.granularity, row.period_start) in deltas]
+        for row in rows:
+            row.booked_seconds += deltas[row.room_id, row.granularity, row.period_start]
+        RoomOccupancy.objects.bulk_update(rows, ['booked_seconds'], batch_size=BACKFILL_BATCH_SIZE)
+
+
+def booking_saved(booking, created):
+    loaded = getattr(booking, '_loaded_values', {})
+    deltas = booking_deltas([(booking.room_id, booking.start_time, booking.end_time)])
+    if not created and {'room_id', 'start_time', 'end_time'} <= loaded.keys():
+        deltas.update(booking_deltas([(loaded['room_id'], loaded['start_time'], loaded['end_time'])], sign=-1))
+    apply_deltas(deltas)
+
+
+def booking_deleted(booking):
+    apply_deltas(booking_deltas([(booking.room_id, booking.start_time, booking.end_time)], sign=-1))
+
+
+def rebuild(room_ids=None):
+    """
+    Recomputing the rollup rows of the rooms, or of all of them, from their bookings in one transaction,
+    returning the number of rows. Bookings written meanwhile may be missed, so it is meant to run
+    while bookings are not written.
+    """
+    rows = RoomOccupancy.objects.all()
+    bookings = Booking.objects.order_by('room_id')
+    if room_ids is not None:
+        rows, bookings = rows.filter(room_id__in=room_ids), bookings.filter(room_id__in=room_ids)
+    periods = bookings.values_list('room_id', 'start_time', 'end_time').iterator(chunk_size=BACKFILL_BATCH_SIZE)
+    created, batch = 0, []
+    with transaction.atomic():
+        rows.delete()
+        for room_id, room_periods in groupby(periods, key=itemgetter(0)):
+            batch += [RoomOccupancy(room_id=room_id, granularity=granularity, period_start=period_start,
+                                    booked_seconds=seconds)
+                      for (_, granularity, period_start), seconds in booking_deltas(room_periods).items()]
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                created += len(RoomOccupancy.objects.bulk_create(batch))
+                batch = []
+        created += len(RoomOccupancy.objects.bulk_create(batch))
+    return created
+
+
+def occupancy_stats(start_date, end_date, group_by, room_ids=None):
+    """
+    Booked days, occupancy rate and revenue at the current cost_per_day of the rooms over
+    [start_date, end_date), per room, local day or month, read from the rollup rows.
+    Whole months of the range are read from the monthly rows, only the days at its edges from the daily ones.
+    """
+    full_months = [month for month in month_starts(start_date, end_date)
+                   if month >= start_date and (month + timedelta(days=31)).replace(day=1) <= end_date]
+    if group_by == 'day' or not full_months:
+        periods = Q(granularity=RoomOccupancy.DAY, period_start__gte=start_date, period_start__lt=end_date)
+    else:
+        months_end = (full_months[-1] + timedelta(days=31)).replace(day=1)
+        periods = (Q(granularity=RoomOccupancy.MONTH, period_start__gte=full_months[0],
+                     period_start__lte=full_months[-1])
+                   | Q(granularity=RoomOccupancy.DAY, period_start__gte=start_date, period_start__lt=full_months[0])
+                   | Q(granularity=RoomOccupancy.DAY, period_start__gte=months_end, period_start__lt=end_date))
+    rows = RoomOccupancy.objects.filter(periods)
+    if room_ids:
+        rows = rows.filter(room_id__in=room_ids)
+
+    key = {'room': F('room_id'), 'day': F('period_start'), 'month': TruncMonth('period_start')}[group_by]
+    groups = rows.annotate(key=key).values('key').annotate(
+        seconds=Sum('booked_seconds'),
+        cost_seconds=Sum(F('booked_seconds') * F('room__cost_per_day'), output_field=DecimalField())
+    ).order_by('key')
+
+    range_seconds = (local_midnight(end_date) - local_midnight(start_date)).total_seconds()
+    if group_by != 'room':
+        rooms = len(set(room_ids)) if room_ids else Room.objects.count()
+    stats = []
+    for group in groups:
+        if group_by == 'room':
+            capacity = range_seconds
+        else:
+            period_start = max(group['key'], start_date)
+            period_end = min(group['key'] + timedelta(days=1) if group_by == 'day'
+                             else (group['key'] + timedelta(days=31)).replace(day=1), end_date)
+            capacity = rooms * (local_midnight(period_end) - local_midnight(period_start)).total_seconds()
+        stats.append({
+            'room': group['key'] if group_by == 'room' else None,
+            'period_start': None if group_by == 'room' else group['key'],
+            'booked_days': group['seconds'] / SECONDS_PER_DAY,
+            'occupancy': group['seconds'] / capacity if capacity else 0.0,
+            'revenue': (Decimal(str(group['cost_seconds'] or 0)) / SECONDS_PER_DAY).quantize(Decimal('0.01')),
+        })
+    return stats
@@ -1,44 +1,341 @@
+from bisect import insort
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
 from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from service.availability import overlaps
+from service.db_router import primary
+from service.models import Room, Booking, BOOKING_PERIOD_CONSTRAINT
+from service.pricing import booking_cost
+from service.signals import bookings_bulk_created
+
+ROOM_UNAVAILABLE_MESSAGE = 'The room is unavailable in the selected time period.'
+INVALID_PERIOD_MESSAGE = 'The booking end time must be later than the start time.'
+INVALID_RANGE_MESSAGE = 'The end date must be later than the start date.'
+
+BULK_CREATE_MAX_ITEMS = 10_000
+BULK_CREATE_BATCH_SIZE = 1_000
+
+ROOM_IMPORT_FORMATS = ('csv', 'jsonl')
+
+# Longest calendar range in days for each resolution.
+CALENDAR_MAX_DAYS = {'day': 366, 'hour': 31}
+
+FREE_SLOTS_MAX_HORIZON = timedelta(days=366)
+FREE_SLOTS_MAX_LIMIT = 100
+
+OCCUPANCY_STATS_GROUPS = ('room', 'day', 'month')
+
+QUOTE_MAX_ROOMS = 1_000
+
 
-from service.models import Room, Booking
+def save_guarded(save, room_ids):
+    """
+    Saving bookings of the rooms so that a concurrent overlapping write results in the same 400 response.
+    On PostgreSQL the exclusion constraint rejects the rows, on other databases
+    the periods are re-checked inside the writing transaction.
+    The constraints of a partitioned table only cover each partition, so the periods are re-checked as well,
+    after locking the rooms so that the writes of the same room are serialized.
+    """
+    try:
+        with transaction.atomic():
+            if settings.BOOKING_PARTITIONING:
+                list(Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk').values_list('pk'))
+            bookings = save()
+            if (connection.vendor != 'postgresql' or settings.BOOKING_PARTITIONING) and Booking.objects.filter(
+                    pk__in=[booking.pk for booking in bookings]
+            ).conflicting().exists():
+                raise IntegrityError(BOOKING_PERIOD_CONSTRAINT)
+    except IntegrityError as exc:
+        if BOOKING_PERIOD_CONSTRAINT not in str(exc):
+            raise
+        raise serializers.ValidationError(ROOM_UNAVAILABLE_MESSAGE)
+    return bookings
 
 
 class RoomSerializer(serializers.ModelSerializer):
     class Meta:
         model = Room
-        fields = '__all__'
+        exclude = ['updated_at']
+
+
+class RoomImportSerializer(serializers.ModelSerializer):
+    """
+    Validating imported rooms. Existing numbers are updated, so uniqueness is not checked.
+    """
+
+    class Meta:
+        model = Room
+        fields = ['number', 'cost_per_day', 'beds']
+        extra_kwargs = {'number': {'validators': []}}
+
+
+class RoomImportRequestSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=ROOM_IMPORT_FORMATS, required=False)
+    batch_size = serializers.IntegerField(min_value=1, max_value=BULK_CREATE_MAX_ITEMS, default=1_000)
+
+    def validate(self, data):
+        if 'file_format' not in data:
+            data['file_format'] = data['file'].name.rsplit('.', 1)[-1].lower()
+        if data['file_format'] not in ROOM_IMPORT_FORMATS:
+            raise serializers.ValidationError({'file_format': 'Cannot detect the format of the file.'})
+        return data
+
+
+class RoomImportResultSerializer(serializers.Serializer):
+    rows = serializers.IntegerField()
+    imported = serializers.IntegerField()
+    skipped = serializers.IntegerField()
+    seconds = serializers.FloatField()
+    rows_per_second = serializers.FloatField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
+class RoomCacheStatsSerializer(serializers.Serializer):
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+    hit_rate = serializers.FloatField()
+
+
+class RoomCalendarRequestSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField(help_text='The day after the last day of the calendar.')
+    resolution = serializers.ChoiceField(choices=list(CALENDAR_MAX_DAYS), default='day')
+
+    def validate(self, data):
+        if data['end'] <= data['start']:
+            raise serializers.ValidationError(INVALID_RANGE_MESSAGE)
+        max_days = CALENDAR_MAX_DAYS[data['resolution']]
+        if (data['end'] - data['start']).days > max_days:
+            raise serializers.ValidationError(
+                f'The calendar cannot be longer than {max_days} days with the {data["resolution"]} resolution.'
+            )
+        return data
+
+
+class RoomCalendarSerializer(serializers.Serializer):
+    room = serializers.IntegerField(source='pk')
+    number = serializers.CharField()
+    occupancy = serializers.CharField(help_text="One character per day or hour, '1' if it is booked.")
+
+
+class FreeSlotRequestSerializer(serializers.Serializer):
+    duration = serializers.DurationField(min_value=timedelta(minutes=1), max_value=FREE_SLOTS_MAX_HORIZON,
+                                         help_text="For example, '3 00:00:00' or 'P3D' for three days.")
+    earliest_start = serializers.DateTimeField(required=False, help_text='Now by default.')
+    horizon = serializers.DurationField(default=timedelta(days=30), max_value=FREE_SLOTS_MAX_HORIZON,
+                                        help_text='Length of the search period from the earliest start.')
+    limit = serializers.IntegerField(min_value=1, max_value=FREE_SLOTS_MAX_LIMIT, default=10)
+
+    def validate(self, data):
+        # Bookings cannot start in the past.
+        data['earliest_start'] = max(data.get('earliest_start', timezone.now()), timezone.now())
+        if data['duration'] > data['horizon']:
+            raise serializers.ValidationError('The duration cannot be longer than the horizon.')
+        return data
+
+
+class FreeSlotSerializer(serializers.Serializer):
+    room = RoomSerializer()
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+
+
+class OccupancyStatsRequestSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField(help_text='The day after the last day of the range.')
+    group_by = serializers.ChoiceField(choices=OCCUPANCY_STATS_GROUPS, default='room')
+    room = serializers.ListField(child=serializers.IntegerField(), required=False,
+                                 help_text='Room ids, all the rooms by default.')
+
+    def validate(self, data):
+        if data['end'] <= data['start']:
+            raise serializers.ValidationError(INVALID_RANGE_MESSAGE)
+        return data
+
+
+class OccupancyStatsSerializer(serializers.Serializer):
+    room = serializers.IntegerField(allow_null=True)
+    period_start = serializers.DateField(allow_null=True)
+    booked_days = serializers.FloatField()
+    occupancy = serializers.FloatField()
+    revenue = serializers.DecimalField(max_digits=20, decimal_places=2)
+
+
+class QuoteRequestSerializer(serializers.Serializer):
+    room = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=QUOTE_MAX_ROOMS,
+                                 help_text='Room ids.')
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+
+    def validate(self, data):
+        if data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError(INVALID_PERIOD_MESSAGE)
+        return data
+
+
+class QuoteSerializer(serializers.Serializer):
+    room = serializers.IntegerField()
+    cost_per_day = serializers.DecimalField(max_digits=7, decimal_places=2)
+    total_cost = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class PoolStatsSerializer(serializers.Serializer):
+    size = serializers.IntegerField()
+    max_size = serializers.IntegerField()
+    in_use = serializers.IntegerField()
+    waiting = serializers.IntegerField()
+    requests = serializers.IntegerField()
+    queued = serializers.IntegerField()
+    wait_ms = serializers.IntegerField()
+    avg_wait_ms = serializers.FloatField()
+    errors = serializers.IntegerField()
+
+
+class DatabaseStatsSerializer(serializers.Serializer):
+    alias = serializers.CharField()
+    vendor = serializers.CharField()
+    conn_max_age = serializers.IntegerField(allow_null=True)
+    conn_health_checks = serializers.BooleanField()
+    connected = serializers.BooleanField()
+    connections_opened = serializers.IntegerField()
+    pool = PoolStatsSerializer(allow_null=True)
 
 
 class BookingSerializer(serializers.ModelSerializer):
 
     client = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(),
+        queryset=User.objects.only('id'),
         default=serializers.CurrentUserDefault()
     )
 
     class Meta:
         model = Booking
-        fields = '__all__'
+        exclude = ['updated_at']
+        read_only_fields = ['total_cost']
+        # Related objects are only needed for their ids and the room for its price.
+        extra_kwargs = {'room': {'queryset': Room.objects.only('id', 'cost_per_day')}}
 
     def validate(self, data):
-        for booking in Booking.objects.filter(room=data['room']):
-            """
-            Checking whether the booking time period does not intersect with the other ones.
-            """
-
-            start_time = data['start_time'].astimezone()
-            end_time = data['start_time'].astimezone()
-            if (
-                    (
-                        start_time <= booking.start_time <= end_time or
-                        booking.start_time <= end_time <= booking.end_time or
-                        start_time < booking.start_time and end_time > booking.end_time or
-                        booking.start_time < start_time and booking.end_time > end_time
-                    ) or timezone.now() > start_time
-            ):
-                raise serializers.ValidationError(
-                    'The room is unavailable in the selected time period.'
-                )
+        """
+        Checking whether the booking time period does not intersect with the other ones.
+        The check is a single indexed query returning at most one conflicting row.
+        """
+        room = data.get('room', getattr(self.instance, 'room', None))
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = data.get('end_time', getattr(self.instance, 'end_time', None))
+
+        if end_time <= start_time:
+            raise serializers.ValidationError(INVALID_PERIOD_MESSAGE)
+
+        conflicts = Booking.objects.filter(room=room).overlapping(start_time, end_time)
+        if self.instance is not None:
+            conflicts = conflicts.exclude(pk=self.instance.pk)
+
+        # The check must see the latest bookings, replicas may lag behind.
+        with primary():
+            if timezone.now() > start_time or conflicts.exists():
+                raise serializers.ValidationError(ROOM_UNAVAILABLE_MESSAGE)
         return data
+
+    def create(self, validated_data):
+        create = super().create
+        return save_guarded(lambda: [create(validated_data)], [validated_data['room'].pk])[0]
+
+    def update(self, instance, validated_data):
+        update = super().update
+        room_id = validated_data['room'].pk if 'room' in validated_data else instance.room_id
+        return save_guarded(lambda: [update(instance, validated_data)], [room_id])[0]
+
+
+class BookingBulkItemSerializer(serializers.Serializer):
+    """
+    One booking of a bulk request. Related objects are resolved by BookingBulkSerializer in bulk.
+    """
+    room = serializers.IntegerField()
+    client = serializers.IntegerField(required=False)
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+
+
+class BookingBulkSerializer(serializers.ListSerializer):
+    """
+    Validating bookings against each other and against the database with a fixed number of queries
+    and creating them with bulk_create in one transaction.
+    Errors are reported per item, in the order of the request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('child', BookingBulkItemSerializer())
+        kwargs.setdefault('allow_empty', False)
+        kwargs.setdefault('max_length', BULK_CREATE_MAX_ITEMS)
+        super().__init__(*args, **kwargs)
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        request = self.context['request']
+        for item in items:
+            item.setdefault('client', request.user.pk)
+
+        rooms = Room.objects.in_bulk({item['room'] for item in items})
+        clients = User.objects.in_bulk({item['client'] for item in items})
+
+        periods = {}
+        if rooms:
+            existing = Booking.objects.filter(room_id__in=rooms).overlapping(
+                min(item['start_time'] for item in items),
+                max(item['end_time'] for item in items)
+            ).values_list('room_id', 'start_time', 'end_time')
+            with primary():
+                existing = list(existing)
+            for room_id, start_time, end_time in existing:
+                periods.setdefault(room_id, []).append((start_time, end_time))
+            for room_periods in periods.values():
+                room_periods.sort()
+
+        now = timezone.now()
+        errors = []
+        for item in items:
+            item_errors = {}
+            if item['room'] not in rooms:
+                item_errors['room'] = [f'Invalid pk "{item["room"]}" - object does not exist.']
+            if item['client'] not in clients:
+                item_errors['client'] = [f'Invalid pk "{item["client"]}" - object does not exist.']
+            if item['end_time'] <= item['start_time']:
+                item_errors[api_settings.NON_FIELD_ERRORS_KEY] = [INVALID_PERIOD_MESSAGE]
+            elif item['room'] in rooms:
+                room_periods = periods.setdefault(item['room'], [])
+                if now > item['start_time'] or overlaps(room_periods, item['start_time'], item['end_time']):
+                    item_errors[api_settings.NON_FIELD_ERRORS_KEY] = [ROOM_UNAVAILABLE_MESSAGE]
+                elif not item_errors:
+                    insort(room_periods, (item['start_time'], item['end_time']))
+            errors.append(item_errors)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        for item in items:
+            item['room'] = rooms[item['room']]
+            item['client'] = clients[item['client']]
+        return items
+
+    def create(self, validated_data):
+        def save():
+            # bulk_create does not call save(), the prices are computed from the rooms loaded for the validation.
+            bookings = Booking.objects.bulk_create(
+                [Booking(**item, total_cost=booking_cost(item['room'].cost_per_day, item['start_time'],
+                                                         item['end_time']))
+                 for item in validated_data],
+                batch_size=BULK_CREATE_BATCH_SIZE
+            )
+            # In the writing transaction, like the post_save receivers, so the rollup is updated with the rows.
+            bookings_bulk_created(bookings)
+            return bookings
+
+        return save_guarded(save, {item['room'].pk for item in validated_data})
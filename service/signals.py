@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from service import rollups
+from service.availability import availability_index
+from service.cache import room_cache, room_generation, ROOMS_GENERATION, BOOKINGS_GENERATION
+from service.models import Room, Booking, note_booking_length
+from service.occupancy import booking_room_ids, invalidate_calendars
+
+
+@receiver(post_save, sender=Booking)
+def update_availability_index(sender, instance, **kwargs):
+    if settings.AVAILABILITY_ENGINE == 'memory':
+        transaction.on_commit(lambda: availability_index.add(instance))
+
+
+@receiver(post_delete, sender=Booking)
+def remove_from_availability_index(sender, instance, **kwargs):
+    if settings.AVAILABILITY_ENGINE == 'memory':
+        booking_id = instance.pk
+        transaction.on_commit(lambda: availability_index.discard(booking_id))
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_booking_cache(sender, instance, **kwargs):
+    room_cache.invalidate(BOOKINGS_GENERATION)
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_room_calendars(sender, instance, **kwargs):
+    invalidate_calendars(booking_room_ids(instance))
+
+
+@receiver(post_save, sender=Booking)
+def add_to_occupancy_rollup(sender, instance, created, **kwargs):
+    rollups.booking_saved(instance, created)
+
+
+@receiver(post_delete, sender=Booking)
+def remove_from_occupancy_rollup(sender, instance, origin=None, **kwargs):
+    # The rollup rows of a deleted room are deleted with it.
+    if isinstance(origin, Room) or isinstance(origin, QuerySet) and origin.model is Room:
+        return
+    rollups.booking_deleted(instance)
+
+
+@receiver([post_save, post_delete], sender=Room)
+def invalidate_room_cache(sender, instance, **kwargs):
+    room_cache.invalidate(ROOMS_GENERATION, room_generation(instance.pk))
+
+
+def bookings_bulk_created(bookings):
+    """
+    Doing the work of the post_save receivers, which bulk_create does not trigger.
+    """
+    if settings.BOOKING_PARTITIONING and bookings:
+        note_booking_length(max(booking.end_time - booking.start_time for booking in bookings))
+    if settings.AVAILABILITY_ENGINE == 'memory':
+        transaction.on_commit(lambda: [availability_index.add(booking) for booking in bookings])
+    room_cache.invalidate(BOOKINGS_GENERATION)
+    invalidate_calendars({booking.room_id for booking in bookings})
+    rollups.apply_deltas(rollups.booking_deltas(
+        (booking.room_id, booking.start_time, booking.end_time) for booking in bookings
+    ))
+
+
+def bookings_archived(room_ids):
+    """
+    Doing the work of the post_delete receivers for bookings archived without loading them,
+    except for the occupancy rollup, which keeps the statistics of the archived periods.
+    """
+    if settings.AVAILABILITY_ENGINE == 'memory':
+        transaction.on_commit(availability_index.invalidate)
+    room_cache.invalidate(BOOKINGS_GENERATION)
+    invalidate_calendars(room_ids)
+
+
+def rooms_bulk_saved(room_ids):
+    """
+    Doing the work of the post_save receivers, which bulk_create does not trigger.
+    """
+    room_cache.invalidate(ROOMS_GENERATION, *(room_generation(room_id) for room_id in room_ids))
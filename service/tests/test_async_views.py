@@ -0,0 +1,100 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from authentication.authentication import token_cache
+from authentication.tokens import issue_tokens
+from service.models import Room, Booking
+
+
+class AsyncViewsTestCase(TestCase):
+    """
+    Async views answer the same as the synchronous viewset actions.
+    """
+
+    def setUp(self):
+        token_cache.clear()
+        self.user_1 = User.objects.create_user(username='user_1', password='userpassword123')
+        self.user_2 = User.objects.create_user(username='user_2', password='userpassword123')
+        self.token_user_1 = Token.objects.create(user=self.user_1).key
+        self.access_user_2 = issue_tokens(self.user_2)['access']
+
+        self.room_1 = Room.objects.create(number='111', cost_per_day=100, beds=1)
+        self.room_2 = Room.objects.create(number='222', cost_per_day=200, beds=2)
+        self.booking_1 = Booking.objects.create(room=self.room_1, client=self.user_1,
+                                                start_time='2034-05-29T09:10:01Z',
+                                                end_time='2034-06-29T09:10:01Z')
+        self.booking_2 = Booking.objects.create(room=self.room_2, client=self.user_2,
+                                                start_time='2034-05-29T09:10:01Z',
+                                                end_time='2034-06-29T09:10:01Z')
+
+    def assertSameResponse(self, async_response, url, headers=None):
+        response = APIClient().get(url, headers=headers)
+        self.assertEqual(async_response.status_code, response.status_code)
+        self.assertEqual(async_response.json(), response.json())
+
+    async def test_room_list(self):
+        query = '?available_rooms=34-06-30_00:00:00,34-07-30_00:00:00&ordering=-cost_per_day&page_size=1'
+        response = await self.async_client.get(reverse('booking:async-room-list') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([room['id'] for room in response.json()['results']], [self.room_2.id])
+        self.assertIsNotNone(response.json()['next'])
+
+        response = await self.async_client.get(
+            reverse('booking:async-room-list') + '?available_rooms=34-06-01_00:00:00,34-06-02_00:00:00')
+        self.assertEqual(response.json()['results'], [])
+
+        response = await self.async_client.get(reverse('booking:async-room-list') + '?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(BOOKING_PARTITIONING=True)
+    async def test_room_list_partitioned(self):
+        # The length of the longest booking is read from the database on a cache miss.
+        cache.clear()
+        response = await self.async_client.get(
+            reverse('booking:async-room-list') + '?available_rooms=34-06-28_00:00:00,34-06-30_00:00:00')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_same_as_sync(self):
+        self.assertSameResponse(self.client.get(reverse('booking:async-room-list') + '?ordering=beds'),
+                                reverse('booking:room-list') + '?ordering=beds')
+        self.assertSameResponse(self.client.get(reverse('booking:async-room-detail', args=[self.room_1.id])),
+                                reverse('booking:room-detail', args=[self.room_1.id]))
+
+        headers = {'Authorization': f'Token {self.token_user_1}'}
+        self.assertSameResponse(self.client.get(reverse('booking:async-booking-list'), headers=headers),
+                                reverse('booking:booking-list'), headers)
+
+    async def test_room_detail(self):
+        url = reverse('booking:async-room-detail', args=[self.room_1.id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()['number'], '111')
+
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await self.async_client.get(reverse('booking:async-room-detail', args=[0]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_booking_list(self):
+        url = reverse('booking:async-booking-list')
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get(url, headers={'Authorization': 'Token invalid'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = await self.async_client.get(url, headers={'Authorization': f'Token {self.token_user_1}'})
+        self.assertEqual([booking['id'] for booking in response.json()['results']], [self.booking_1.id])
+
+        response = await self.async_client.get(url, headers={'Authorization': f'Bearer {self.access_user_2}'})
+        self.assertEqual([booking['id'] for booking in response.json()['results']], [self.booking_2.id])
@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from service.management.benchmarks import compare_results, latency_summary
+from service.models import Room, Booking
+
+
+class BenchmarkSuiteTestCase(TestCase):
+
+    def test_latency_summary(self):
+        summary = latency_summary([float(ms) for ms in range(1, 101)], elapsed=2.0, errors=1)
+        self.assertEqual(summary['requests'], 100)
+        self.assertEqual(summary['throughput'], 50.0)
+        self.assertAlmostEqual(summary['p50_ms'], 50.5)
+        self.assertAlmostEqual(summary['p95_ms'], 95.05)
+        self.assertAlmostEqual(summary['p99_ms'], 99.01)
+
+    def test_compare_results(self):
+        baseline = {'scenarios': {'room_search': {'throughput': 100.0, 'p95_ms': 10.0, 'errors': 0}}}
+
+        results = {'scenarios': {'room_search': {'throughput': 85.0, 'p95_ms': 11.5, 'errors': 0}}}
+        self.assertEqual(compare_results(baseline, results, 0.2), [])
+
+        results = {'scenarios': {'room_search': {'throughput': 70.0, 'p95_ms': 13.0, 'errors': 2},
+                                 'booking_list': {'throughput': 1.0, 'p95_ms': 1.0, 'errors': 0}}}
+        self.assertEqual(len(compare_results(baseline, results, 0.2)), 3)
+
+    def test_suite(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('benchmark_suite', rooms=5, users=2, bookings_per_room=3, requests=6,
+                         concurrency=1, output=output, stdout=StringIO())
+            with open(output) as file:
+                report = json.load(file)
+            self.assertEqual(set(report['scenarios']), {'room_search', 'booking_create', 'booking_list'})
+            for summary in report['scenarios'].values():
+                self.assertEqual(summary['requests'], 6)
+                self.assertEqual(summary['errors'], 0)
+
+            self.assertFalse(Room.objects.exists())
+            self.assertFalse(Booking.objects.exists())
+
+            for summary in report['scenarios'].values():
+                summary['throughput'] *= 1_000
+            with open(output, 'w') as file:
+                json.dump(report, file)
+            with self.assertRaises(CommandError):
+                call_command('benchmark_suite', rooms=5, users=2, bookings_per_room=3, requests=6,
+                             concurrency=1, baseline=output, stdout=StringIO())
+
+
+class StressBookingsTestCase(TransactionTestCase):
+
+    def stress(self, concurrency, rounds):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('stress_bookings', concurrency=[concurrency], rounds=rounds, output=output,
+                         stdout=StringIO())
+            with open(output) as file:
+                report = json.load(file)
+        result = report['levels'][str(concurrency)]
+        self.assertEqual(result['requests'], concurrency * rounds)
+        self.assertEqual((result['double_bookings'], result['no_booking'], result['errors']), (0, 0, 0))
+        self.assertFalse(Room.objects.exists())
+        self.assertFalse(Booking.objects.exists())
+
+    def test_one_booking_per_round(self):
+        self.stress(1, rounds=3)
+
+    def test_parallel_bookings(self):
+        # The in-memory test database of SQLite locks tables instead of waiting for them, so parallel requests
+        # need PostgreSQL or a database on disk, such as SQLite with a TEST NAME in the database settings.
+        # Checked here, the test database is only set up after the test modules are imported.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('in-memory SQLite database')
+        self.stress(4, rounds=5)
@@ -1,4 +1,17 @@
+import csv
+import json
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -51,18 +64,18 @@ class BookingApiTestCase(APITestCase):
         url = reverse('booking:booking-list')
         data_1 = {
             'room': self.room_1.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
         }
         data_2 = {
             'room': self.room_1.id,
-            'start_time': '2024-06-01T09:10:01Z',
-            'end_time': '2024-06-10T09:10:01Z'
+            'start_time': '2034-06-01T09:10:01Z',
+            'end_time': '2034-06-10T09:10:01Z'
         }
         data_3 = {
             'room': self.room_1.id,
-            'start_time': '2024-07-29T09:10:01Z',
-            'end_time': '2024-08-29T09:10:01Z'
+            'start_time': '2034-07-29T09:10:01Z',
+            'end_time': '2034-08-29T09:10:01Z'
         }
 
         response = self.client.post(url, data=data_1)
@@ -83,17 +96,50 @@ class BookingApiTestCase(APITestCase):
         })
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_create_booking_adjacent_and_past(self):
+        url = reverse('booking:booking-list')
+        data_1 = {
+            'room': self.room_1.id,
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
+        }
+        data_2 = {
+            'room': self.room_1.id,
+            'start_time': '2034-06-29T09:10:01Z',
+            'end_time': '2034-07-29T09:10:01Z'
+        }
+        data_3 = {
+            'room': self.room_2.id,
+            'start_time': '2020-05-29T09:10:01Z',
+            'end_time': '2020-06-29T09:10:01Z'
+        }
+
+        response = self.client.post(url, data=data_1, headers={
+            'Authorization': f'Token {self.token_user_1}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(url, data=data_2, headers={
+            'Authorization': f'Token {self.token_user_2}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(url, data=data_3, headers={
+            'Authorization': f'Token {self.token_user_2}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_booking_list(self):
         url = reverse('booking:booking-list')
         data_1 = {
             'room': self.room_1.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
         }
         data_2 = {
             'room': self.room_2.id,
-            'start_time': '2024-06-01T09:10:01Z',
-            'end_time': '2024-06-10T09:10:01Z'
+            'start_time': '2034-06-01T09:10:01Z',
+            'end_time': '2034-06-10T09:10:01Z'
         }
 
         self.client.post(url, data=data_1, headers={
@@ -111,8 +157,9 @@ class BookingApiTestCase(APITestCase):
                 'id': booking_1_id,
                 'client': self.user_1_id,
                 'room': self.room_1.id,
-                'start_time': '2024-05-29T09:10:01Z',
-                'end_time': '2024-06-29T09:10:01Z'
+                'start_time': '2034-05-29T09:10:01Z',
+                'end_time': '2034-06-29T09:10:01Z',
+                'total_cost': '3100.00'
             }
         ]
         expected_data_2 = [
@@ -120,8 +167,9 @@ class BookingApiTestCase(APITestCase):
                 'id': booking_2_id,
                 'client': self.user_2_id,
                 'room': self.room_2.id,
-                'start_time': '2024-06-01T09:10:01Z',
-                'end_time': '2024-06-10T09:10:01Z'
+                'start_time': '2034-06-01T09:10:01Z',
+                'end_time': '2034-06-10T09:10:01Z',
+                'total_cost': '1800.00'
             }
         ]
 
@@ -130,15 +178,17 @@ class BookingApiTestCase(APITestCase):
                 'id': booking_1_id,
                 'client': self.user_1_id,
                 'room': self.room_1.id,
-                'start_time': '2024-05-29T09:10:01Z',
-                'end_time': '2024-06-29T09:10:01Z'
+                'start_time': '2034-05-29T09:10:01Z',
+                'end_time': '2034-06-29T09:10:01Z',
+                'total_cost': '3100.00'
             },
             {
                 'id': booking_2_id,
                 'client': self.user_2_id,
                 'room': self.room_2.id,
-                'start_time': '2024-06-01T09:10:01Z',
-                'end_time': '2024-06-10T09:10:01Z'
+                'start_time': '2034-06-01T09:10:01Z',
+                'end_time': '2034-06-10T09:10:01Z',
+                'total_cost': '1800.00'
             }
         ]
 
@@ -149,31 +199,31 @@ class BookingApiTestCase(APITestCase):
             'Authorization': f'Token {self.token_user_1}'
         })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(expected_data_1, response.data)
+        self.assertEqual(expected_data_1, response.data['results'])
 
         response = self.client.get(url, headers={
             'Authorization': f'Token {self.token_user_2}'
         })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(expected_data_2, response.data)
+        self.assertEqual(expected_data_2, response.data['results'])
 
         response = self.client.get(url, headers={
             'Authorization': f'Token {self.token_superuser}'
         })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(expected_data_3, response.data)
+        self.assertEqual(expected_data_3, response.data['results'])
 
     def test_booking_detail(self):
         url = reverse('booking:booking-list')
         data_1 = {
             'room': self.room_1.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
         }
         data_2 = {
             'room': self.room_2.id,
-            'start_time': '2024-06-01T09:10:01Z',
-            'end_time': '2024-06-10T09:10:01Z'
+            'start_time': '2034-06-01T09:10:01Z',
+            'end_time': '2034-06-10T09:10:01Z'
         }
 
         self.client.post(url, data=data_1, headers={
@@ -190,16 +240,18 @@ class BookingApiTestCase(APITestCase):
             'id': booking_1_id,
             'client': self.user_1_id,
             'room': self.room_1.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z',
+            'total_cost': '3100.00'
         }
 
         expected_data_2 = {
             'id': booking_2_id,
             'client': self.user_2_id,
             'room': self.room_2.id,
-            'start_time': '2024-06-01T09:10:01Z',
-            'end_time': '2024-06-10T09:10:01Z'
+            'start_time': '2034-06-01T09:10:01Z',
+            'end_time': '2034-06-10T09:10:01Z',
+            'total_cost': '1800.00'
         }
 
         url_user_1 = reverse('booking:booking-detail', args=(booking_1_id,))
@@ -228,14 +280,14 @@ class BookingApiTestCase(APITestCase):
 
         data_1 = {
             'room': self.room_1.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
         }
         data_2 = {
             'client': self.user_1_id,
             'room': self.room_1.id,
-            'start_time': '2024-07-29T09:10:01Z',
-            'end_time': '2024-08-29T09:10:01Z'
+            'start_time': '2034-07-29T09:10:01Z',
+            'end_time': '2034-08-29T09:10:01Z'
         }
 
         self.client.post(url, data=data_1, headers={
@@ -268,8 +320,9 @@ class BookingApiTestCase(APITestCase):
             'id': booking_1_id,
             'client': self.user_1_id,
             'room': self.room_1.id,
-            'start_time': '2024-07-29T09:10:01Z',
-            'end_time': '2024-08-29T09:10:01Z'
+            'start_time': '2034-07-29T09:10:01Z',
+            'end_time': '2034-08-29T09:10:01Z',
+            'total_cost': '3100.00'
         })
 
         response = self.client.patch(url_user_1, data=data_1, headers={
@@ -280,8 +333,9 @@ class BookingApiTestCase(APITestCase):
             'id': booking_1_id,
             'client': self.user_1_id,
             'room': self.room_1.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z',
+            'total_cost': '3100.00'
         })
 
     def test_delete_booking(self):
@@ -289,14 +343,14 @@ class BookingApiTestCase(APITestCase):
 
         data_1 = {
             'room': self.room_1.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
         }
 
         data_2 = {
             'room': self.room_2.id,
-            'start_time': '2024-05-29T09:10:01Z',
-            'end_time': '2024-06-29T09:10:01Z'
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
         }
 
         self.client.post(url, data=data_1, headers={
@@ -332,4 +386,268 @@ class BookingApiTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Booking.objects.all().count(), 0)
 
+    def test_bulk_create_booking(self):
+        url = reverse('booking:booking-bulk')
+        data = [
+            {
+                'room': self.room_1.id,
+                'start_time': '2034-05-29T09:10:01Z',
+                'end_time': '2034-06-29T09:10:01Z'
+            },
+            {
+                'room': self.room_1.id,
+                'start_time': '2034-06-29T09:10:01Z',
+                'end_time': '2034-07-29T09:10:01Z'
+            },
+            {
+                'room': self.room_2.id,
+                'start_time': '2034-05-29T09:10:01Z',
+                'end_time': '2034-06-29T09:10:01Z'
+            },
+        ]
+
+        response = self.client.post(url, data=data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(url, data=data, format='json', headers={
+            'Authorization': f'Token {self.token_user_1}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['client'] for item in response.data], [self.user_1_id] * 3)
+        self.assertEqual(Booking.objects.all().count(), 3)
+
+        data = [
+            {
+                'room': self.room_2.id,
+                'start_time': '2034-08-01T09:10:01Z',
+                'end_time': '2034-08-10T09:10:01Z'
+            },
+            {
+                'room': self.room_2.id,
+                'start_time': '2034-08-05T09:10:01Z',
+                'end_time': '2034-08-15T09:10:01Z'
+            },
+            {
+                'room': self.room_1.id,
+                'start_time': '2034-06-01T09:10:01Z',
+                'end_time': '2034-06-10T09:10:01Z'
+            },
+            {
+                'room': 0,
+                'start_time': '2034-06-01T09:10:01Z',
+                'end_time': '2034-06-10T09:10:01Z'
+            },
+        ]
+        response = self.client.post(url, data=data, format='json', headers={
+            'Authorization': f'Token {self.token_user_2}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('non_field_errors', response.data[1])
+        self.assertIn('non_field_errors', response.data[2])
+        self.assertIn('room', response.data[3])
+        self.assertEqual(Booking.objects.all().count(), 3)
+
+    @override_settings(TOKEN_CACHE_TTL=0)
+    def test_bulk_create_booking_query_count(self):
+        url = reverse('booking:booking-bulk')
+        start = datetime(2034, 1, 1, tzinfo=timezone.utc)
+
+        query_counts = []
+        # Both batches fit into one INSERT, SQLite limits it to 999 parameters.
+        for offset, size in [(0, 10), (1000, 150)]:
+            data = [
+                {
+                    'room': (self.room_1.id, self.room_2.id)[i % 2],
+                    'start_time': (start + timedelta(days=offset + i)).isoformat(),
+                    'end_time': (start + timedelta(days=offset + i + 1)).isoformat()
+                }
+                for i in range(size)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(url, data=data, format='json', headers={
+                    'Authorization': f'Token {self.token_user_1}'
+                })
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            query_counts.append(len(context.captured_queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(Booking.objects.all().count(), 160)
+
+    def test_export_bookings(self):
+        url = reverse('booking:booking-export')
+        booking = Booking.objects.create(room=self.room_1, client_id=self.user_1_id,
+                                         start_time='2034-05-29T09:10:01Z',
+                                         end_time='2034-06-29T09:10:01Z')
+        expected_data = {
+            'id': booking.id,
+            'room': self.room_1.id,
+            'client': self.user_1_id,
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z',
+            'total_cost': '3100.00'
+        }
+
+        response = self.client.get(url, headers={
+            'Authorization': f'Token {self.token_user_1}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.get(url, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([expected_data], [json.loads(line) for line in lines])
+
+        response = self.client.get(url, data={'file_format': 'csv'}, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([{key: str(value) for key, value in expected_data.items()}], rows)
+
+        response = self.client.get(url, data={'file_format': 'xml'}, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_export_bookings_memory(self):
+        url = reverse('booking:booking-export')
+        start = datetime(2034, 1, 1, tzinfo=timezone.utc)
+
+        peaks = []
+        for size in [2_000, 20_000]:
+            Booking.objects.bulk_create(
+                Booking(room=self.room_1, client_id=self.user_1_id,
+                        start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i + 1))
+                for i in range(len(peaks) * 2_000, size)
+            )
+            response = self.client.get(url, headers={
+                'Authorization': f'Token {self.token_superuser}'
+            })
+            tracemalloc.start()
+            exported = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.assertEqual(exported, size)
+
+        # Ten times more rows must not need noticeably more memory.
+        self.assertLess(peaks[1], peaks[0] * 2)
+
+    def test_conditional_get(self):
+        booking = Booking.objects.create(room=self.room_1, client_id=self.user_1_id,
+                                         start_time='2034-05-29T09:10:01Z',
+                                         end_time='2034-06-29T09:10:01Z')
+        url_list = reverse('booking:booking-list')
+        url_detail = reverse('booking:booking-detail', args=(booking.id,))
+
+        for url in [url_list, url_detail]:
+            response = self.client.get(url, headers={
+                'Authorization': f'Token {self.token_user_1}'
+            })
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+
+            response = self.client.get(url, headers={
+                'Authorization': f'Token {self.token_user_1}',
+                'If-None-Match': etag
+            })
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            response = self.client.get(url, headers={
+                'Authorization': f'Token {self.token_user_2}',
+                'If-None-Match': etag
+            })
+            self.assertNotEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+            self.client.patch(url_detail, data={'end_time': booking.end_time}, headers={
+                'Authorization': f'Token {self.token_superuser}'
+            })
+            response = self.client.get(url, headers={
+                'Authorization': f'Token {self.token_user_1}',
+                'If-None-Match': etag
+            })
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_total_cost(self):
+        headers = {'Authorization': f'Token {self.token_superuser}'}
+        response = self.client.post(reverse('booking:booking-list'), data={
+            'room': self.room_1.id,
+            'start_time': '2034-05-29T00:00:00Z',
+            'end_time': '2034-05-30T12:00:00Z',
+            'total_cost': '1.00'
+        }, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_cost'], '150.00')
+        url = reverse('booking:booking-detail', args=(response.data['id'],))
+
+        # The price is kept when the room price changes and recomputed when the booking does.
+        Room.objects.filter(pk=self.room_1.id).update(cost_per_day=1000)
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.data['total_cost'], '150.00')
+        response = self.client.patch(url, data={'room': self.room_2.id}, headers=headers)
+        self.assertEqual(response.data['total_cost'], '300.00')
+        response = self.client.patch(url, data={'end_time': '2034-05-29T06:00:00Z'}, headers=headers)
+        self.assertEqual(response.data['total_cost'], '50.00')
+
+        response = self.client.post(reverse('booking:booking-bulk'), data=[
+            {'room': self.room_1.id, 'start_time': '2034-06-01T00:00:00Z', 'end_time': '2034-06-01T01:00:00Z'},
+            {'room': self.room_2.id, 'start_time': '2034-06-01T00:00:00Z', 'end_time': '2034-06-03T00:00:00Z'},
+        ], format='json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([booking['total_cost'] for booking in response.data], ['41.67', '400.00'])
+
+    def test_total_cost_migration(self):
+        price_bookings = import_module('service.migrations.0013_booking_total_cost').price_bookings
+        booking = Booking.objects.create(room=self.room_1, client_id=self.user_1_id,
+                                         start_time='2034-05-29T00:00:00Z', end_time='2034-05-30T12:00:00Z')
+        Booking.objects.filter(pk=booking.pk).update(total_cost=0)
+
+        price_bookings(apps, SimpleNamespace(connection=connection))
+        booking.refresh_from_db()
+        self.assertEqual(booking.total_cost, Decimal('150.00'))
+
+    def test_long_bookings_overlap(self):
+        url = reverse('booking:booking-list')
+        headers = {'Authorization': f'Token {self.token_user_1}'}
+        response = self.client.post(url, data={
+            'room': self.room_1.id,
+            'start_time': '2035-01-01T00:00:00Z',
+            'end_time': '2035-05-01T00:00:00Z'
+        }, headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # On a partitioned table overlap searches look back as far as the longest booking.
+        start_time = datetime(2035, 4, 10, tzinfo=timezone.utc)
+        with override_settings(BOOKING_PARTITIONING=True):
+            cache.clear()
+            self.assertTrue(Booking.objects.overlapping(start_time, start_time + timedelta(days=1)).exists())
+            response = self.client.post(url, data={
+                'room': self.room_1.id,
+                'start_time': '2035-04-10T00:00:00Z',
+                'end_time': '2035-04-11T00:00:00Z'
+            }, headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+            # The cached length is raised by longer bookings.
+            Booking.objects.create(room=self.room_2, client_id=self.user_1_id,
+                                   start_time='2036-01-01T00:00:00Z', end_time='2036-12-01T00:00:00Z')
+            start_time = datetime(2036, 11, 1, tzinfo=timezone.utc)
+            self.assertTrue(Booking.objects.overlapping(start_time, start_time + timedelta(days=1)).exists())
+        cache.clear()
+
+    def test_exclusion_constraint_migration_check(self):
+        check_booking_periods = import_module('service.migrations.0008_booking_room_period_excl').check_booking_periods
+        check_booking_periods(connection)
+
+        first = Booking.objects.create(room=self.room_1, client_id=self.user_1_id,
+                                       start_time='2034-05-01T00:00:00Z', end_time='2034-05-03T00:00:00Z')
+        second = Booking.objects.create(room=self.room_1, client_id=self.user_1_id,
+                                        start_time='2034-05-02T00:00:00Z', end_time='2034-05-04T00:00:00Z')
+        Booking.objects.create(room=self.room_2, client_id=self.user_1_id,
+                               start_time='2034-05-02T00:00:00Z', end_time='2034-05-04T00:00:00Z')
+        with self.assertRaisesMessage(RuntimeError, f'bookings {first.id} and {second.id} of room {self.room_1.id} '
+                                                    'overlap.'):
+            check_booking_periods(connection)
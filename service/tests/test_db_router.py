@@ -0,0 +1,106 @@
+import random
+from collections import Counter
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from service.db_router import ReplicaRouter, primary, replica_health, replica_reads
+from service.models import Room
+
+
+@override_settings(DATABASE_REPLICAS={'replica_1': 1, 'replica_2': 3})
+class ReplicaRouterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        replica_health.mark('replica_1', True)
+        replica_health.mark('replica_2', True)
+        self.token = replica_reads.set(True)
+
+    def tearDown(self):
+        replica_reads.reset(self.token)
+        replica_health.clear()
+
+    def test_weights(self):
+        random.seed(0)
+        counts = Counter(self.router.db_for_read(Room) for _ in range(1000))
+        self.assertEqual(set(counts), {'replica_1', 'replica_2'})
+        self.assertAlmostEqual(counts['replica_2'] / 1000, 0.75, delta=0.05)
+
+    def test_health(self):
+        replica_health.mark('replica_1', False)
+        self.assertEqual({self.router.db_for_read(Room) for _ in range(100)}, {'replica_2'})
+
+        replica_health.mark('replica_2', False)
+        self.assertEqual(self.router.db_for_read(Room), DEFAULT_DB_ALIAS)
+
+    def test_primary(self):
+        self.assertEqual(self.router.db_for_write(Room), DEFAULT_DB_ALIAS)
+        with primary():
+            self.assertEqual(self.router.db_for_read(Room), DEFAULT_DB_ALIAS)
+        self.assertNotEqual(self.router.db_for_read(Room), DEFAULT_DB_ALIAS)
+
+        replica_reads.set(False)
+        self.assertEqual(self.router.db_for_read(Room), DEFAULT_DB_ALIAS)
+        self.assertFalse(self.router.allow_migrate('replica_1', 'service'))
+
+
+@override_settings(DATABASE_REPLICAS={DEFAULT_DB_ALIAS: 1})
+class ReplicaReadApiTestCase(APITestCase):
+    """
+    The primary plays the replica, the calls of choose_replica() show which queries may go to a replica.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user_1 = User.objects.create_user(username='user_1', password='userpassword123')
+        self.user_2 = User.objects.create_user(username='user_2', password='userpassword123')
+        self.token_user_1 = Token.objects.create(user=self.user_1).key
+        self.token_user_2 = Token.objects.create(user=self.user_2).key
+        self.room = Room.objects.create(number='111', cost_per_day=100, beds=1)
+
+    def test_reads_after_write(self):
+        url = reverse('booking:booking-list')
+        headers_user_1 = {'Authorization': f'Token {self.token_user_1}'}
+
+        with mock.patch.object(ReplicaRouter, 'choose_replica', return_value=DEFAULT_DB_ALIAS) as choose_replica:
+            response = self.client.get(url, headers=headers_user_1)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(choose_replica.called)
+
+            choose_replica.reset_mock()
+            response = self.client.post(url, data={
+                'room': self.room.id,
+                'start_time': '2034-05-29T09:10:01Z',
+                'end_time': '2034-06-29T09:10:01Z'
+            }, headers=headers_user_1)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertFalse(choose_replica.called)
+
+            response = self.client.get(url, headers=headers_user_1)
+            self.assertEqual(len(response.data['results']), 1)
+            self.assertFalse(choose_replica.called)
+
+            response = self.client.get(url, headers={'Authorization': f'Token {self.token_user_2}'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(choose_replica.called)
+
+    @override_settings(ROOM_CACHE_TIMEOUT=60)
+    def test_cached_responses_rendered_from_primary(self):
+        url = reverse('booking:room-list')
+        with mock.patch.object(ReplicaRouter, 'choose_replica', return_value=DEFAULT_DB_ALIAS) as choose_replica:
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertFalse(choose_replica.called)
+
+        with override_settings(ROOM_CACHE_TIMEOUT=0), \
+                mock.patch.object(ReplicaRouter, 'choose_replica', return_value=DEFAULT_DB_ALIAS) as choose_replica:
+            self.client.get(url)
+            self.assertTrue(choose_replica.called)
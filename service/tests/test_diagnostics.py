@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from service.diagnostics import connections_opened
+from service.models import Room
+
+
+class DatabaseStatsTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user_1', password='userpassword123')
+        self.superuser = User.objects.create_superuser(username='superuser', password='password')
+
+    def test_database_stats(self):
+        url = reverse('booking:diagnostics-db')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.superuser)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        default = next(database for database in response.data if database['alias'] == 'default')
+        self.assertTrue(default['connected'])
+        self.assertEqual(default['connections_opened'], connections_opened['default'])
+        self.assertIsNone(default['pool'])
+
+
+class ConnectionReuseTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.max_age = connection.settings_dict['CONN_MAX_AGE']
+
+    def tearDown(self):
+        connection.settings_dict['CONN_MAX_AGE'] = self.max_age
+
+    def connections_opened(self, max_age, requests):
+        # The test client never closes the connection, the requests are reproduced with the signals doing it.
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection.close()
+        opened = connections_opened['default']
+        for _ in range(requests):
+            request_started.send(sender=self.__class__)
+            Room.objects.exists()
+            request_finished.send(sender=self.__class__)
+        return connections_opened['default'] - opened
+
+    def test_persistent_connections(self):
+        # Checked here, the test database is only set up after the test modules are imported.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('in-memory SQLite databases are never closed')
+        self.assertEqual(self.connections_opened(60, requests=2), 1)
+        self.assertEqual(self.connections_opened(0, requests=2), 2)
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from service.availability import availability_index, first_free_window
+from service.filters import RoomFilter
+from service.models import Room, Booking
+
+
+class RoomFilterTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create(username='user', password='password')
+        self.room_1 = Room.objects.create(number='111', cost_per_day=100, beds=1)
+        self.room_2 = Room.objects.create(number='222', cost_per_day=200, beds=2)
+        Booking.objects.create(room=self.room_1, client=user,
+                               start_time='2034-04-22T09:10:01Z',
+                               end_time='2034-04-25T09:10:01Z')
+        Booking.objects.create(room=self.room_1, client=user,
+                               start_time='2034-04-26T09:10:01Z',
+                               end_time='2034-04-28T09:10:01Z')
+
+    def test_available_rooms_without_duplicates(self):
+        queryset = RoomFilter({'available_rooms': '34-04-29_09:10:01,34-05-21_09:10:01'},
+                              Room.objects.all()).qs
+        self.assertEqual([self.room_1, self.room_2], list(queryset))
+
+        queryset = RoomFilter({'available_rooms': '34-04-21_09:10:01,34-05-21_09:10:01'},
+                              Room.objects.all()).qs
+        self.assertEqual([self.room_2], list(queryset))
+
+    def test_available_rooms_uses_index(self):
+        if connection.vendor == 'postgresql':
+            # The tables are too small for the planner to prefer an index on its own.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        queryset = RoomFilter({'available_rooms': '34-04-21_09:10:01,34-05-21_09:10:01'},
+                              Room.objects.all()).qs
+        plan = queryset.explain()
+
+        self.assertRegex(plan, 'booking_room_(end|period)_idx')
+        self.assertNotRegex(plan, r'Seq Scan on service_booking|SCAN U0')
+
+    def test_first_free_window(self):
+        periods = [(2, 4), (5, 7), (7, 8), (11, 12)]
+        self.assertEqual(first_free_window(periods, 0, 20, 2), 0)
+        self.assertEqual(first_free_window(periods, 1, 20, 2), 8)
+        self.assertEqual(first_free_window(periods, 3, 20, 3), 8)
+        self.assertEqual(first_free_window(periods, 3, 10, 3), None)
+        self.assertEqual(first_free_window(periods, 9, 15, 3), 12)
+        self.assertEqual(first_free_window([], 9, 10, 2), None)
+
+
+@override_settings(AVAILABILITY_ENGINE='memory')
+class MemoryRoomFilterTestCase(TestCase):
+    def setUp(self):
+        availability_index.invalidate()
+        self.user = User.objects.create(username='user', password='password')
+        self.room_1 = Room.objects.create(number='111', cost_per_day=100, beds=1)
+        self.room_2 = Room.objects.create(number='222', cost_per_day=200, beds=2)
+        self.booking = Booking.objects.create(room=self.room_1, client=self.user,
+                                              start_time='2034-04-22T09:10:01Z',
+                                              end_time='2034-04-25T09:10:01Z')
+
+    def tearDown(self):
+        availability_index.invalidate()
+
+    def test_available_rooms(self):
+        for value, expected in [
+            ('34-04-21_09:10:01,34-04-22_09:10:01', [self.room_1, self.room_2]),
+            ('34-04-21_09:10:01,34-04-23_09:10:01', [self.room_2]),
+            ('34-04-24_09:10:01,34-04-30_09:10:01', [self.room_2]),
+            ('34-04-25_09:10:01,34-04-30_09:10:01', [self.room_1, self.room_2]),
+        ]:
+            queryset = RoomFilter({'available_rooms': value}, Room.objects.all()).qs
+            self.assertEqual(expected, list(queryset))
+
+    def test_index_follows_booking_signals(self):
+        value = '34-05-01_09:10:01,34-05-10_09:10:01'
+        queryset = RoomFilter({'available_rooms': value}, Room.objects.all()).qs
+        self.assertEqual([self.room_1, self.room_2], list(queryset))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(room=self.room_2, client=self.user,
+                                             start_time='2034-05-05T09:10:01Z',
+                                             end_time='2034-05-15T09:10:01Z')
+        with self.assertNumQueries(1):
+            queryset = RoomFilter({'available_rooms': value}, Room.objects.all()).qs
+            self.assertEqual([self.room_1], list(queryset))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        queryset = RoomFilter({'available_rooms': value}, Room.objects.all()).qs
+        self.assertEqual([self.room_1, self.room_2], list(queryset))
+
+    def test_writes_during_rebuild_are_kept(self):
+        booking = Booking(pk=self.booking.pk + 1, room=self.room_2, client=self.user,
+                          start_time='2034-04-22T09:10:01Z', end_time='2034-04-25T09:10:01Z')
+        iterator = QuerySet.iterator
+
+        def write_while_reading(queryset, *args, **kwargs):
+            # Writes of other threads, committed after the query started.
+            availability_index.add(booking)
+            availability_index.discard(self.booking.pk)
+            yield from iterator(queryset, *args, **kwargs)
+
+        with patch.object(QuerySet, 'iterator', write_while_reading):
+            availability_index.rebuild()
+        start_time = datetime(2034, 4, 23, tzinfo=timezone.utc)
+        self.assertEqual(availability_index.busy_rooms(start_time, start_time + timedelta(days=1)), {self.room_2.id})
+
+    @override_settings(AVAILABILITY_INDEX_TTL=-1)
+    def test_stale_index_is_read_during_rebuild(self):
+        availability_index.rebuild()
+        start_time = datetime(2034, 4, 23, tzinfo=timezone.utc)
+        with availability_index._rebuild_lock, self.assertNumQueries(0):
+            self.assertEqual(availability_index.busy_rooms(start_time, start_time + timedelta(days=1)),
+                             {self.room_1.id})
+        with self.assertNumQueries(1):
+            availability_index.busy_rooms(start_time, start_time + timedelta(days=1))
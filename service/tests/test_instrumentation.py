@@ -0,0 +1,65 @@
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from service.instrumentation import request_metrics
+from service.models import Room
+
+
+class PerformanceMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+        request_metrics.clear()
+        self.user = User.objects.create_user(username='user_1', password='userpassword123')
+        self.superuser = User.objects.create_superuser(username='superuser', password='password')
+        self.room = Room.objects.create(number='111', cost_per_day=100, beds=1)
+
+    def server_timing(self, response):
+        return {name: float(duration) for name, duration in re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing'])}
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('booking:room-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(f'desc="{len(context.captured_queries)} queries"', response['Server-Timing'])
+
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'serialize', 'total'})
+        self.assertGreater(timing['serialize'], 0)
+        self.assertGreaterEqual(timing['total'], timing['db'] + timing['serialize'])
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('booking:booking-list'), data={
+            'room': self.room.id,
+            'start_time': '2034-05-29T09:10:01Z',
+            'end_time': '2034-06-29T09:10:01Z'
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('Server-Timing', response)
+
+    def test_metrics(self):
+        self.client.get(reverse('booking:room-list'))
+        self.client.get(reverse('booking:room-detail', args=[self.room.id]))
+        self.client.get(reverse('booking:async-room-list'))
+        url = reverse('booking:diagnostics-metrics')
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.superuser)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+        metrics = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', metrics)
+        self.assertIn('http_request_duration_seconds_count{view="RoomViewSet.list"} 1', metrics)
+        self.assertIn('http_request_duration_seconds_count{view="RoomViewSet.retrieve"} 1', metrics)
+        self.assertIn('http_request_duration_seconds_count{view="async_views.room_list"} 1', metrics)
+        self.assertIn('http_request_db_queries_bucket{view="RoomViewSet.list",le="+Inf"} 1', metrics)
@@ -0,0 +1,186 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from service.models import Room, Booking, RoomOccupancy, BOOKING_LENGTH_INDEX, BOOKING_PERIOD_CONSTRAINT
+from service.partitions import (TABLE, DEFAULT_PARTITION, add_months, add_partitions, archive_month, is_partitioned,
+                                month_datetime, month_start, partition_months, partition_name, partition_table)
+
+
+@override_settings(TIME_ZONE='UTC')
+class ArchiveBookingsTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user_1', password='userpassword123')
+        self.room_1 = Room.objects.create(number='111', cost_per_day=100, beds=1)
+        self.room_2 = Room.objects.create(number='222', cost_per_day=200, beds=2)
+
+    def test_archive_without_partitions(self):
+        for room, start_time, end_time in [
+            (self.room_1, '2020-01-05T00:00:00Z', '2020-01-07T00:00:00Z'),
+            (self.room_2, '2020-01-31T12:00:00Z', '2020-02-02T12:00:00Z'),
+            (self.room_1, '2020-03-10T00:00:00Z', '2020-03-11T00:00:00Z'),
+            (self.room_1, '2020-04-10T00:00:00Z', '2020-04-11T00:00:00Z'),
+        ]:
+            Booking.objects.create(room=room, client=self.user, start_time=start_time, end_time=end_time)
+        ongoing = Booking.objects.create(room=self.room_2, client=self.user,
+                                         start_time=timezone.now() - timedelta(days=40),
+                                         end_time=timezone.now() + timedelta(days=1))
+        rollup_rows = RoomOccupancy.objects.count()
+
+        with tempfile.TemporaryDirectory() as directory:
+            stdout = StringIO()
+            call_command('archive_bookings', '--before', '2020-04', '--output-dir', directory, '--dry-run',
+                         stdout=stdout)
+            self.assertEqual(stdout.getvalue(), 'Months to archive: 2020-01, 2020-02, 2020-03.\n')
+            self.assertEqual(Booking.objects.count(), 5)
+
+            call_command('archive_bookings', '--before', '2020-04', '--output-dir', directory, stdout=StringIO())
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['bookings-2020-01.ndjson.gz', 'bookings-2020-03.ndjson.gz'])
+            with gzip.open(os.path.join(directory, 'bookings-2020-01.ndjson.gz'), 'rt') as file:
+                archived = [json.loads(line) for line in file]
+            self.assertEqual([(booking['room'], booking['start_time'], booking['total_cost']) for booking in archived],
+                             [(self.room_1.id, '2020-01-05T00:00:00Z', '200.00'),
+                              (self.room_2.id, '2020-01-31T12:00:00Z', '400.00')])
+            self.assertEqual(Booking.objects.filter(start_time__year=2020).count(), 1)
+            # The statistics of the archived periods are kept.
+            self.assertEqual(RoomOccupancy.objects.count(), rollup_rows)
+
+            # The month of a booking which has not ended yet is kept.
+            stdout = StringIO()
+            call_command('archive_bookings', '--output-dir', directory, '--keep-months', '0', stdout=stdout)
+            self.assertIn(f'{month_start(ongoing.start_time):%Y-%m}: kept', stdout.getvalue())
+            self.assertTrue(Booking.objects.filter(pk=ongoing.pk).exists())
+            self.assertFalse(Booking.objects.filter(start_time__year=2020).exists())
+
+    def test_existing_archive_is_kept(self):
+        Booking.objects.create(room=self.room_1, client=self.user,
+                               start_time='2020-01-05T00:00:00Z', end_time='2020-01-07T00:00:00Z')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bookings-2020-01.ndjson.gz')
+            with gzip.open(path, 'wt') as file:
+                file.write('{}\n')
+            with self.assertRaises(CommandError):
+                call_command('archive_bookings', '--before', '2020-02', '--output-dir', directory, stdout=StringIO())
+            with gzip.open(path, 'rt') as file:
+                self.assertEqual(file.read(), '{}\n')
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_partitioning_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_bookings', stdout=StringIO())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'partitioning requires PostgreSQL')
+@override_settings(TIME_ZONE='UTC')
+class PartitionTableTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user_1', password='userpassword123')
+        self.room_1 = Room.objects.create(number='111', cost_per_day=100, beds=1)
+        self.room_2 = Room.objects.create(number='222', cost_per_day=200, beds=2)
+
+    def query(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def partition_of(self, booking):
+        return self.query(f'SELECT tableoid::regclass::text FROM {TABLE} WHERE id = %s', [booking.pk])[0][0]
+
+    def test_partition_populated_table(self):
+        current = month_start(timezone.now())
+        future_start = month_datetime(add_months(current, 4)) + timedelta(days=10)
+        bookings = [
+            Booking.objects.create(room=room, client=self.user, start_time=start_time, end_time=end_time)
+            for room, start_time, end_time in [
+                (self.room_1, '2020-01-05T00:00:00Z', '2020-01-07T00:00:00Z'),
+                (self.room_2, '2020-01-31T12:00:00Z', '2020-02-02T12:00:00Z'),
+                (self.room_1, '2020-03-10T00:00:00Z', '2020-03-11T00:00:00Z'),
+                (self.room_2, timezone.now() - timedelta(days=40), timezone.now() + timedelta(days=1)),
+                (self.room_1, future_start, future_start + timedelta(days=2)),
+            ]
+        ]
+        future = bookings[-1]
+        indexes = {name for name, in self.query('SELECT indexname FROM pg_indexes WHERE tablename = %s', [TABLE])}
+        foreign_keys = self.query("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                                  "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname", [TABLE])
+
+        partitioned = partition_table(2)
+        self.assertTrue(is_partitioned())
+        self.assertEqual(partitioned, len(partition_months()))
+        self.assertEqual(partition_months()[0], date(2020, 1, 1))
+        self.assertEqual(partition_months()[-1], add_months(current, 2))
+
+        # Rows, ids and the sequence are kept.
+        self.assertEqual(sorted(Booking.objects.values_list('pk', flat=True)), [booking.pk for booking in bookings])
+        new = Booking.objects.create(room=self.room_2, client=self.user,
+                                     start_time='2020-03-10T00:00:00Z', end_time='2020-03-11T00:00:00Z')
+        self.assertGreater(new.pk, future.pk)
+        self.assertEqual(self.partition_of(new), partition_name(date(2020, 3, 1)))
+        self.assertEqual(self.partition_of(future), DEFAULT_PARTITION)
+
+        # Indexes and foreign keys are recreated with their names, the primary key includes start_time.
+        # The index of the exclusion constraint is replaced by those of the partitions.
+        self.assertEqual(
+            {name for name, in self.query('SELECT indexname FROM pg_indexes WHERE tablename = %s', [TABLE])},
+            indexes - {BOOKING_PERIOD_CONSTRAINT} | {BOOKING_LENGTH_INDEX}
+        )
+        self.assertEqual(self.query("SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+                                    "WHERE conrelid = %s::regclass AND contype = 'p'", [TABLE]),
+                         [('PRIMARY KEY (id, start_time)',)])
+        self.assertEqual(self.query("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                                    "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname", [TABLE]),
+                         foreign_keys)
+        self.assertEqual(len(foreign_keys), 2)
+
+        # Each partition rejects overlapping bookings of a room.
+        self.assertEqual(
+            {name for name, in self.query("SELECT conname FROM pg_constraint WHERE contype = 'x'")},
+            {f'{name}_{BOOKING_PERIOD_CONSTRAINT}' for name in [*map(partition_name, partition_months()),
+                                                                 DEFAULT_PARTITION]}
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Booking.objects.create(room=self.room_1, client=self.user,
+                                   start_time='2020-03-10T12:00:00Z', end_time='2020-03-12T00:00:00Z')
+
+        # Overlap searches only scan the partitions which may hold intersecting bookings.
+        with override_settings(BOOKING_PARTITIONING=True):
+            cache.clear()
+            start_time = month_datetime(current)
+            plan = Booking.objects.overlapping(start_time, start_time + timedelta(days=1)).explain()
+            self.assertNotIn(partition_name(date(2020, 1, 1)), plan)
+            self.assertIn(partition_name(current), plan)
+        cache.clear()
+
+        # Bookings of the new partitions are moved out of the default one.
+        self.assertEqual(add_partitions(4), [add_months(current, 3), add_months(current, 4)])
+        self.assertEqual(self.partition_of(future), partition_name(month_start(future_start)))
+        self.assertEqual(add_partitions(4), [])
+
+        rollup_rows = RoomOccupancy.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            rows, path = archive_month(date(2020, 1, 1), directory)
+            self.assertEqual(rows, 2)
+            self.assertEqual(path, os.path.join(directory, 'bookings-2020-01.ndjson.gz'))
+            with gzip.open(path, 'rt') as file:
+                self.assertEqual([json.loads(line)['id'] for line in file], [bookings[0].pk, bookings[1].pk])
+        self.assertNotIn(date(2020, 1, 1), partition_months())
+        self.assertFalse(self.query('SELECT 1 FROM pg_class WHERE relname = %s', [partition_name(date(2020, 1, 1))]))
+        self.assertFalse(Booking.objects.filter(start_time__year=2020, start_time__month=1).exists())
+        self.assertEqual(RoomOccupancy.objects.count(), rollup_rows)
+        # The month of a booking which has not ended yet is kept.
+        self.assertIsNone(archive_month(month_start(bookings[3].start_time), tempfile.gettempdir()))
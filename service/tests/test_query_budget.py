@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from service.models import Room, Booking
+
+
+@override_settings(TOKEN_CACHE_TTL=0)
+class QueryBudgetTestCase(APITestCase):
+    """
+    Every endpoint has a fixed number of queries, whatever the number of rows.
+    The token cache is disabled, so the budgets include the token lookup.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user', password='userpassword123')
+        self.superuser = User.objects.create_superuser(username='superuser', password='password')
+        self.headers = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.superuser_headers = {'Authorization': f'Token {Token.objects.create(user=self.superuser).key}'}
+        self.start = datetime(2034, 1, 1, tzinfo=timezone.utc)
+
+    def create_data(self, size):
+        rooms = Room.objects.bulk_create(
+            Room(number=f'{size}-{i}', cost_per_day=100, beds=1) for i in range(size)
+        )
+        return Booking.objects.bulk_create(
+            Booking(room=room, client=self.user, start_time=self.start + timedelta(days=size),
+                    end_time=self.start + timedelta(days=size + 1))
+            for room in rooms
+        )
+
+    def test_query_budget(self):
+        # Token lookup, then the work of the endpoint. The SQLite fallback re-checks created bookings.
+        recheck = 0 if connection.vendor == 'postgresql' else 1
+        for size in [1, 25]:
+            booking = self.create_data(size)[0]
+            url_booking = reverse('booking:booking-detail', args=(booking.id,))
+            url_room = reverse('booking:room-detail', args=(booking.room_id,))
+
+            with self.assertNumQueries(1):
+                self.client.get(reverse('booking:room-list'))
+            with self.assertNumQueries(1):
+                self.client.get(reverse('booking:room-list'), data={
+                    'available_rooms': '34-01-01_00:00:00,34-02-01_00:00:00', 'ordering': 'beds'
+                })
+            with self.assertNumQueries(1):
+                self.client.get(url_room)
+            with self.assertNumQueries(2):
+                self.client.get(reverse('booking:booking-list'), headers=self.headers)
+            with self.assertNumQueries(2):
+                self.client.get(reverse('booking:booking-list'), headers=self.superuser_headers)
+            with self.assertNumQueries(2):
+                response = self.client.get(url_booking, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            # Token, room, overlap check, savepoint, insert, occupancy rollup upsert (3), release.
+            with self.assertNumQueries(9 + recheck):
+                response = self.client.post(reverse('booking:booking-list'), data={
+                    'room': booking.room_id,
+                    'start_time': '2035-01-01T00:00:00Z',
+                    'end_time': '2035-01-02T00:00:00Z',
+                }, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+            with self.assertNumQueries(6):
+                response = self.client.delete(url_booking, headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            Booking.objects.filter(start_time__year=2035).delete()
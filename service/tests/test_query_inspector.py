@@ -0,0 +1,86 @@
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import reverse
+
+from service.models import Room
+from service.query_inspector import JSONFormatter, QueryInspectorMiddleware, normalize_sql
+
+
+def n_plus_one_view(request):
+    rooms = [Room.objects.get(pk=pk) for pk in Room.objects.values_list('pk', flat=True)]
+    return HttpResponse(str(len(rooms)))
+
+
+@override_settings(QUERY_INSPECTOR=True, QUERY_INSPECTOR_SAMPLE_RATE=1.0, SLOW_QUERY_MS=10_000,
+                   DUPLICATE_QUERY_THRESHOLD=3)
+class QueryInspectorTestCase(TestCase):
+
+    def setUp(self):
+        for number in range(4):
+            Room.objects.create(number=str(number), cost_per_day=100, beds=1)
+        self.middleware = QueryInspectorMiddleware(self.get_response)
+        self.request = RequestFactory().get('/')
+
+    def get_response(self, request):
+        self.middleware.process_view(request, n_plus_one_view, (), {})
+        return n_plus_one_view(request)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT  "id" FROM "t1" WHERE "a" = \'x\'\n AND "b" IN (%s, %s, %s) LIMIT 21'),
+            'SELECT "id" FROM "t1" WHERE "a" = ? AND "b" IN (...) LIMIT ?'
+        )
+        self.assertEqual(normalize_sql('SELECT 1 WHERE "id" IN (%s)'), 'SELECT ? WHERE "id" IN (...)')
+
+    def test_duplicate_queries(self):
+        with self.assertLogs('service.queries', level='WARNING') as logs:
+            self.middleware(self.request)
+
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.getMessage(), 'duplicate_query')
+        self.assertEqual(record.data['count'], 4)
+        self.assertEqual(record.data['view'], 'test_query_inspector.n_plus_one_view')
+        self.assertIn('WHERE "service_room"."id" = %s', record.data['sql'])
+        self.assertTrue(any('in n_plus_one_view' in frame for frame in record.data['stack']))
+
+        formatted = json.loads(JSONFormatter().format(record))
+        self.assertEqual(formatted['event'], 'duplicate_query')
+        self.assertEqual(formatted['count'], 4)
+
+    async def test_async_duplicate_queries(self):
+        async def get_response(request):
+            return await sync_to_async(self.get_response)(request)
+
+        middleware = QueryInspectorMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertLogs('service.queries', level='WARNING') as logs:
+            await middleware(self.request)
+        self.assertEqual([(record.getMessage(), record.data['count']) for record in logs.records],
+                         [('duplicate_query', 4)])
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries(self):
+        user = User.objects.create_superuser(username='superuser', password='password')
+        self.client.force_login(user)
+        with self.assertLogs('service.queries', level='WARNING') as logs:
+            self.client.get(reverse('booking:room-list'))
+
+        slow = [record for record in logs.records if record.getMessage() == 'slow_query']
+        self.assertTrue(slow)
+        self.assertEqual({record.data['view'] for record in slow}, {'RoomViewSet.list'})
+
+    @override_settings(QUERY_INSPECTOR_SAMPLE_RATE=0.0)
+    def test_sampling(self):
+        with self.assertNoLogs('service.queries', level='WARNING'):
+            self.middleware(self.request)
+
+    def test_json_formatter(self):
+        record = logging.LogRecord('service.queries', logging.WARNING, __file__, 1, 'slow_query', None, None)
+        record.data = {'sql': 'SELECT ?', 'duration_ms': 1.5}
+        self.assertEqual(json.loads(JSONFormatter().format(record))['duration_ms'], 1.5)
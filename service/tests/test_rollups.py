@@ -0,0 +1,144 @@
+from datetime import date
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from service import rollups
+from service.models import Room, Booking, RoomOccupancy
+
+
+@override_settings(TIME_ZONE='UTC')
+class OccupancyRollupTestCase(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user_1', password='userpassword123')
+        self.superuser = User.objects.create_superuser(username='superuser', password='password')
+        self.room_1 = Room.objects.create(number='111', cost_per_day=100, beds=1)
+        self.room_2 = Room.objects.create(number='222', cost_per_day=200, beds=2)
+
+    @staticmethod
+    def snapshot():
+        return {(row.room_id, row.granularity, row.period_start): row.booked_seconds
+                for row in RoomOccupancy.objects.all() if row.booked_seconds}
+
+    def test_incremental_maintenance(self):
+        booking = Booking.objects.create(room=self.room_1, client=self.user,
+                                         start_time='2034-01-31T12:00:00Z',
+                                         end_time='2034-02-01T18:00:00Z')
+        self.assertEqual(self.snapshot(), {
+            (self.room_1.id, 'day', date(2034, 1, 31)): 43_200,
+            (self.room_1.id, 'day', date(2034, 2, 1)): 64_800,
+            (self.room_1.id, 'month', date(2034, 1, 1)): 43_200,
+            (self.room_1.id, 'month', date(2034, 2, 1)): 64_800,
+        })
+
+        self.client.force_authenticate(self.superuser)
+        response = self.client.patch(reverse('booking:booking-detail', args=(booking.id,)), data={
+            'room': self.room_2.id, 'end_time': '2034-02-03T00:00:00Z'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('booking:booking-bulk'), data=[
+            {'room': self.room_1.id, 'start_time': '2034-03-01T00:00:00Z', 'end_time': '2034-03-04T00:00:00Z'},
+            {'room': self.room_1.id, 'start_time': '2034-03-10T00:00:00Z', 'end_time': '2034-03-11T00:00:00Z'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        Booking.objects.get(start_time='2034-03-10T00:00:00Z').delete()
+
+        incremental = self.snapshot()
+        self.assertEqual(incremental[self.room_2.id, 'month', date(2034, 2, 1)], 2 * 86_400)
+        self.assertEqual(incremental[self.room_1.id, 'month', date(2034, 3, 1)], 3 * 86_400)
+        self.assertNotIn((self.room_1.id, 'month', date(2034, 1, 1)), incremental)
+        call_command('backfill_occupancy', stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+        room_id = self.room_2.id
+        self.room_2.delete()
+        self.assertFalse(RoomOccupancy.objects.filter(room_id=room_id).exists())
+
+    def test_update_of_unloaded_instance(self):
+        booking = Booking.objects.create(room=self.room_1, client=self.user,
+                                         start_time='2034-01-31T12:00:00Z', end_time='2034-02-01T18:00:00Z')
+        Booking(pk=booking.pk, room=self.room_2, client=self.user,
+                start_time='2034-02-10T00:00:00Z', end_time='2034-02-11T00:00:00Z').save()
+        self.assertEqual(self.snapshot(), {
+            (self.room_2.id, 'day', date(2034, 2, 10)): 86_400,
+            (self.room_2.id, 'month', date(2034, 2, 1)): 86_400,
+        })
+
+    def test_migration_backfill(self):
+        backfill = import_module('service.migrations.0012_room_occupancy').backfill
+        for room, start_time, end_time in [
+            (self.room_1, '2034-01-31T12:00:00Z', '2034-02-01T18:00:00Z'),
+            (self.room_1, '2034-03-01T00:00:00Z', '2034-03-04T00:00:00Z'),
+            (self.room_2, '2034-02-28T22:00:00Z', '2034-03-01T02:00:00Z'),
+        ]:
+            Booking.objects.create(room=room, client=self.user, start_time=start_time, end_time=end_time)
+        incremental = self.snapshot()
+        RoomOccupancy.objects.all().delete()
+
+        backfill(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_occupancy_stats(self):
+        url = reverse('booking:stats-occupancy')
+        for room, start_time, end_time in [
+            (self.room_1, '2033-12-31T00:00:00Z', '2034-01-02T00:00:00Z'),
+            (self.room_1, '2034-06-10T12:00:00Z', '2034-06-11T00:00:00Z'),
+            (self.room_2, '2035-02-27T00:00:00Z', '2035-03-03T00:00:00Z'),
+        ]:
+            Booking.objects.create(room=room, client=self.user, start_time=start_time, end_time=end_time)
+        params = {'start': '2033-12-31', 'end': '2035-03-02'}
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url, data=params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(self.superuser)
+        response = self.client.get(url, data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['room'], row['booked_days'], row['revenue']) for row in response.data],
+                         [(self.room_1.id, 2.5, '250.00'), (self.room_2.id, 3.0, '600.00')])
+        self.assertAlmostEqual(response.data[0]['occupancy'], 2.5 / 426)
+
+        response = self.client.get(url, data={**params, 'group_by': 'month', 'room': [self.room_1.id]})
+        self.assertEqual([(row['period_start'], row['booked_days'], row['occupancy']) for row in response.data],
+                         [('2033-12-01', 1.0, 1.0), ('2034-01-01', 1.0, 1 / 31), ('2034-06-01', 0.5, 0.5 / 30)])
+
+        response = self.client.get(url, data={'start': '2035-02-28', 'end': '2035-03-02', 'group_by': 'day'})
+        self.assertEqual([(row['period_start'], row['occupancy'], row['revenue']) for row in response.data],
+                         [('2035-02-28', 0.5, '200.00'), ('2035-03-01', 0.5, '200.00')])
+
+        response = self.client.get(url, data={'start': '2035-03-02', 'end': '2035-03-02'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_whole_months_read_from_monthly_rows(self):
+        Booking.objects.create(room=self.room_1, client=self.user,
+                               start_time='2034-01-30T00:00:00Z', end_time='2034-03-02T00:00:00Z')
+        with self.assertNumQueries(1):
+            stats = rollups.occupancy_stats(date(2034, 1, 31), date(2034, 3, 2), 'room')
+        self.assertEqual(stats[0]['booked_days'], 30)
+        self.assertEqual(stats[0]['revenue'], Decimal('3000.00'))
+
+        # Only the monthly row of February and the daily rows around it are read.
+        RoomOccupancy.objects.filter(granularity='day', period_start__month=2).delete()
+        stats = rollups.occupancy_stats(date(2034, 1, 31), date(2034, 3, 2), 'room')
+        self.assertEqual(stats[0]['booked_days'], 30)
+
+    def test_bulk_create_rolls_back_with_rollup(self):
+        self.client.force_authenticate(self.superuser)
+        with mock.patch('service.rollups.apply_deltas', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.client.post(reverse('booking:booking-bulk'), data=[
+                {'room': self.room_1.id, 'start_time': '2034-03-01T00:00:00Z', 'end_time': '2034-03-04T00:00:00Z'},
+            ], format='json')
+        self.assertFalse(Booking.objects.exists())
@@ -1,8 +1,19 @@
+import json
+from base64 import b64encode
+from decimal import Decimal
+
 from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from service.availability import availability_index
+from service.cache import room_cache
 from service.models import Room, Booking
 
 
@@ -65,19 +76,19 @@ class RoomApiTestCase(APITestCase):
 
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.data['results'], expected_data)
 
         response = self.client.get(url, headers={
             'Authorization': f'Token {self.token_user_1}'
         })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.data['results'], expected_data)
 
         response = self.client.get(url, headers={
             'Authorization': f'Token {self.token_superuser}'
         })
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(response.data['results'], expected_data)
 
     def test_room_detail(self):
         url = reverse('booking:room-detail', args=(self.room_1.id,))
@@ -258,10 +269,10 @@ class RoomApiTestCase(APITestCase):
             },
         ]
         response = self.client.get(url, data={'ordering': 'cost_per_day'})
-        self.assertEqual(expected_data_cost_per_day, response.data)
+        self.assertEqual(expected_data_cost_per_day, response.data['results'])
 
         response = self.client.get(url, data={'ordering': 'beds'})
-        self.assertEqual(expected_data_beds, response.data)
+        self.assertEqual(expected_data_beds, response.data['results'])
 
     def test_filter(self):
         url = reverse('booking:room-list')
@@ -278,7 +289,7 @@ class RoomApiTestCase(APITestCase):
         ]
 
         response = self.client.get(url, data={'cost_per_day': '200.00'})
-        self.assertEqual(expected_data_cost_per_day, response.data)
+        self.assertEqual(expected_data_cost_per_day, response.data['results'])
 
         expected_data_beds = [
             {
@@ -295,7 +306,7 @@ class RoomApiTestCase(APITestCase):
             },
         ]
         response = self.client.get(url, data={'beds': '1'})
-        self.assertEqual(expected_data_beds, response.data)
+        self.assertEqual(expected_data_beds, response.data['results'])
 
     def test_available_rooms(self):
         url = reverse('booking:room-list')
@@ -324,7 +335,7 @@ class RoomApiTestCase(APITestCase):
         ]
         response = self.client.get(url, data={'available_rooms': '24-04-21_09:10:01,24-05-21_09:10:01'})
 
-        self.assertEqual(expected_data_1, response.data)
+        self.assertEqual(expected_data_1, response.data['results'])
 
         Booking.objects.create(room=self.room_1, client=user,
                                start_time='2024-04-22T09:10:01Z',
@@ -332,13 +343,309 @@ class RoomApiTestCase(APITestCase):
 
         response = self.client.get(url, data={'available_rooms': '24-04-21_09:10:01,24-05-21_09:10:01'})
 
-        self.assertEqual(expected_data_2, response.data)
+        self.assertEqual(expected_data_2, response.data['results'])
 
         Booking.objects.create(room=self.room_2, client=user,
                                start_time='2024-05-20T09:10:01Z',
                                end_time='2024-06-20T09:10:01Z')
 
         response = self.client.get(url, data={'available_rooms': '24-04-21_09:10:01,24-05-21_09:10:01'})
-        self.assertEqual([], response.data)
+        self.assertEqual([], response.data['results'])
+
+    def test_import_rooms(self):
+        url = reverse('booking:room-import-rooms')
+        csv_content = (
+            b'number,cost_per_day,beds\n'
+            b'111,150.00,2\n'
+            b'333,300.00,3\n'
+            b'444,-1,1\n'
+        )
+        jsonl_content = (
+            b'{"number": "333", "cost_per_day": "350.00", "beds": 3}\n'
+            b'{"number": "555", "cost_per_day": "500.00", "beds": 5}\n'
+        )
+
+        response = self.client.post(url, data={
+            'file': SimpleUploadedFile('rooms.csv', csv_content)
+        }, headers={
+            'Authorization': f'Token {self.token_user_1}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = self.client.post(url, data={
+            'file': SimpleUploadedFile('rooms.csv', csv_content),
+            'batch_size': 2
+        }, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['rows'], response.data['imported'], response.data['skipped']), (3, 2, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 3)
+
+        response = self.client.post(url, data={
+            'file': SimpleUploadedFile('rooms.jsonl', jsonl_content)
+        }, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['imported'], 2)
+
+        self.assertEqual(
+            list(Room.objects.order_by('number').values_list('number', 'cost_per_day', 'beds')),
+            [('111', Decimal('150.00'), 2), ('222', Decimal('200.00'), 2),
+             ('333', Decimal('350.00'), 3), ('555', Decimal('500.00'), 5)]
+        )
+
+        response = self.client.post(url, data={
+            'file': SimpleUploadedFile('rooms.txt', csv_content)
+        }, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pagination(self):
+        url = reverse('booking:room-list')
+        for i in range(3, 10):
+            Room.objects.create(number=f'{i}{i}{i}', cost_per_day=100 * (i % 3), beds=i % 2 + 1)
+
+        for ordering in ['beds', '-cost_per_day']:
+            field = ordering.lstrip('-')
+            expected_ids = [room.id for room in sorted(
+                Room.objects.all(),
+                key=lambda room: (getattr(room, field), room.id), reverse=ordering.startswith('-')
+            )]
+
+            ids, link = [], f'{url}?ordering={ordering}&page_size=2'
+            while link:
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(link)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('OFFSET', context.captured_queries[-1]['sql'])
+                self.assertLessEqual(len(response.data['results']), 2)
+                ids += [room['id'] for room in response.data['results']]
+                last_page, link = response.data, response.data['next']
+            self.assertEqual(expected_ids, ids)
+
+            ids, link = [], last_page['previous']
+            while link:
+                response = self.client.get(link)
+                ids = [room['id'] for room in response.data['results']] + ids
+                link = response.data['previous']
+            self.assertEqual(expected_ids[:len(ids)], ids)
+            self.assertEqual(len(expected_ids) - len(last_page['results']), len(ids))
+
+        response = self.client.get(url, data={'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        def cursor(**values):
+            return b64encode(json.dumps({'p': ['1'], 'r': 0, 'o': ['id'], **values}).encode()).decode()
+
+        response = self.client.get(url, data={'cursor': cursor(p=['abc'])})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, data={'cursor': cursor(p=['x', '1'], o=['cost_per_day', 'id']),
+                                              'ordering': 'cost_per_day'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # A cursor of another ordering of the same length.
+        response = self.client.get(url, data={'cursor': cursor(p=['1', '1'], o=['beds', 'id']),
+                                              'ordering': 'cost_per_day'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(url, data={'cursor': cursor(p=['1', '1'], o=['beds', 'id']), 'ordering': 'beds'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(ROOM_CACHE_TIMEOUT=60)
+    def test_cache(self):
+        cache.clear()
+        room_cache.reset_stats()
+        # The session of the logins in setUp would cost a query on every request.
+        self.client.cookies.clear()
+        url_list = reverse('booking:room-list')
+        url_detail = reverse('booking:room-detail', args=(self.room_1.id,))
+        available_rooms = {'available_rooms': '34-04-21_09:10:01,34-05-21_09:10:01'}
+        user = User.objects.create(username='user', password='userpassword123')
+
+        for url, data in [(url_list, {}), (url_list, available_rooms), (url_detail, {})]:
+            response = self.client.get(url, data=data)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            with self.assertNumQueries(0):
+                response = self.client.get(url, data=data)
+            self.assertEqual(response['X-Cache'], 'HIT')
+
+        Booking.objects.create(room=self.room_1, client=user,
+                               start_time='2034-04-22T09:10:01Z',
+                               end_time='2034-04-25T09:10:01Z')
+        response = self.client.get(url_list, data=available_rooms)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([self.room_2.id], [room['id'] for room in response.data['results']])
+        self.assertEqual(self.client.get(url_list)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url_detail)['X-Cache'], 'HIT')
+
+        self.client.patch(url_detail, data={'beds': 4}, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        response = self.client.get(url_detail)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['beds'], 4)
+        response = self.client.get(url_list)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['beds'], 4)
+        self.assertEqual(self.client.get(reverse('booking:room-detail', args=(self.room_2.id,)))['X-Cache'], 'MISS')
+
+        response = self.client.get(reverse('booking:room-cache-stats'), headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['hits'], response.data['misses']), (5, 7))
+
+    def test_conditional_get(self):
+        url_list = reverse('booking:room-list')
+        url_detail = reverse('booking:room-detail', args=(self.room_1.id,))
+
+        for url in [url_list, url_detail]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response['ETag']
+
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+
+            self.client.patch(url_detail, data={'beds': self.room_1.beds + 1}, headers={
+                'Authorization': f'Token {self.token_superuser}'
+            })
+            self.room_1.refresh_from_db()
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+        # Last-Modified is informative, a write in the same second keeps it.
+        response = self.client.get(url_detail)
+        self.assertIn('Last-Modified', response)
+        self.client.patch(url_detail, data={'beds': self.room_1.beds + 1}, headers={
+            'Authorization': f'Token {self.token_superuser}'
+        })
+        response = self.client.get(url_detail, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['beds'], self.room_1.beds + 1)
+
+        response = self.client.get(url_list)
+        etag = response['ETag']
+        Room.objects.filter(id=self.room_2.id).delete()
+        response = self.client.get(url_list, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_calendar(self):
+        url = reverse('booking:room-calendar')
+        user = User.objects.create(username='user', password='userpassword123')
+        Booking.objects.create(room=self.room_1, client=user,
+                               start_time='2034-03-24T22:00:00Z',
+                               end_time='2034-03-27T09:00:00Z')
+        Booking.objects.create(room=self.room_1, client=user,
+                               start_time='2034-03-31T12:00:00Z',
+                               end_time='2034-04-02T08:00:00Z')
+
+        response = self.client.get(url, data={'start': '2034-03-23', 'end': '2034-04-03'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'room': self.room_1.id, 'number': '111', 'occupancy': '01111000111'},
+            {'room': self.room_2.id, 'number': '222', 'occupancy': '00000000000'},
+        ])
+
+        # Summer time starts on 2034-03-26, so the day has 23 hours.
+        response = self.client.get(url, data={'start': '2034-03-26', 'end': '2034-03-27',
+                                              'resolution': 'hour', 'ids': self.room_1.id})
+        self.assertEqual(response.data['results'][0]['occupancy'], '1' * 23)
+        response = self.client.get(url, data={'start': '2034-03-31', 'end': '2034-04-01',
+                                              'resolution': 'hour', 'ids': self.room_1.id})
+        self.assertEqual(response.data['results'][0]['occupancy'], '0' * 14 + '1' * 10)
+
+        for data in [{'start': '2034-03-23', 'end': '2034-03-23'},
+                     {'start': '2034-03-01', 'end': '2034-05-01', 'resolution': 'hour'},
+                     {'start': '2034-03-01'}]:
+            response = self.client.get(url, data=data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(CALENDAR_CACHE_TIMEOUT=60)
+    def test_calendar_cache(self):
+        cache.clear()
+        self.client.cookies.clear()
+        url = reverse('booking:room-calendar')
+        data = {'start': '2034-03-30', 'end': '2034-04-03'}
+        user = User.objects.create(username='user', password='userpassword123')
+
+        with self.assertNumQueries(2):
+            self.client.get(url, data=data)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, data=data)
+        self.assertEqual([room['occupancy'] for room in response.data['results']], ['0000', '0000'])
+
+        booking = Booking.objects.create(room=self.room_1, client=user,
+                                         start_time='2034-03-31T12:00:00Z',
+                                         end_time='2034-04-01T12:00:00Z')
+        response = self.client.get(url, data=data)
+        self.assertEqual([room['occupancy'] for room in response.data['results']], ['0110', '0000'])
+
+        # Moving the booking to another room changes the calendars of both.
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.room = self.room_2
+        booking.save()
+        response = self.client.get(url, data=data)
+        self.assertEqual([room['occupancy'] for room in response.data['results']], ['0000', '0110'])
+
+    def test_free_slots(self):
+        url = reverse('booking:room-free-slots')
+        user = User.objects.create(username='user', password='userpassword123')
+        room_3 = Room.objects.create(number='333', cost_per_day=300, beds=2)
+        for room, start_time, end_time in [
+            (self.room_1, '2034-04-21T00:00:00Z', '2034-04-23T00:00:00Z'),
+            (self.room_1, '2034-04-24T00:00:00Z', '2034-04-26T00:00:00Z'),
+            (self.room_2, '2034-04-20T12:00:00Z', '2034-04-22T00:00:00Z'),
+        ]:
+            Booking.objects.create(room=room, client=user, start_time=start_time, end_time=end_time)
+        params = {'duration': 'P3D', 'earliest_start': '2034-04-20T00:00:00Z'}
+
+        for engine in ['sql', 'memory']:
+            with self.subTest(engine=engine), override_settings(AVAILABILITY_ENGINE=engine):
+                availability_index.invalidate()
+                response = self.client.get(url, data=params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(
+                    [(slot['room']['id'], slot['start_time'], slot['end_time']) for slot in response.data],
+                    [(room_3.id, '2034-04-20T00:00:00Z', '2034-04-23T00:00:00Z'),
+                     (self.room_2.id, '2034-04-22T00:00:00Z', '2034-04-25T00:00:00Z'),
+                     (self.room_1.id, '2034-04-26T00:00:00Z', '2034-04-29T00:00:00Z')]
+                )
+
+                response = self.client.get(url, data={**params, 'beds': 2, 'limit': 1})
+                self.assertEqual([slot['room']['id'] for slot in response.data], [room_3.id])
+                response = self.client.get(url, data={**params, 'horizon': 'P6D', 'ordering': '-cost_per_day'})
+                self.assertEqual([slot['room']['id'] for slot in response.data], [room_3.id, self.room_2.id])
+        availability_index.invalidate()
+
+        for data in [{'duration': 'P3D', 'horizon': 'P2D'}, {'duration': 'P3D', 'limit': 0}, {}]:
+            response = self.client.get(url, data=data)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_quote(self):
+        self.client.cookies.clear()
+        url = reverse('booking:room-quote')
+        params = {'room': [self.room_2.id, self.room_1.id],
+                  'start_time': '2034-04-20T00:00:00Z', 'end_time': '2034-04-21T12:00:00Z'}
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, data=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'room': self.room_2.id, 'cost_per_day': '200.00', 'total_cost': '300.00'},
+            {'room': self.room_1.id, 'cost_per_day': '100.00', 'total_cost': '150.00'},
+        ])
+
+        response = self.client.get(url, data={**params, 'end_time': '2034-04-20T00:00:01Z'})
+        self.assertEqual([room['total_cost'] for room in response.data], ['0.00', '0.00'])
 
+        response = self.client.get(url, data={**params, 'room': [self.room_1.id, 0]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'room': ['Invalid pk "0" - object does not exist.']})
 
+        response = self.client.get(url, data={**params, 'end_time': params['start_time']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
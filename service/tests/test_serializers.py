@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.exceptions import ValidationError
 
 from service.models import Room, Booking
 from service.serializers import RoomSerializer, BookingSerializer
@@ -57,15 +58,34 @@ class BookingSerializerTestCase(TestCase):
                 'room': room_1.id,
                 'client': user_1.id,
                 'start_time': '2024-03-29T09:10:01Z',
-                'end_time': '2024-05-29T09:11:11Z'
+                'end_time': '2024-05-29T09:11:11Z',
+                'total_cost': '6100.08'
             },
             {
                 'id': booking_2.id,
                 'room': room_2.id,
                 'client': user_2.id,
                 'start_time': '2024-07-29T09:10:01Z',
-                'end_time': '2024-09-29T09:11:11Z'
+                'end_time': '2024-09-29T09:11:11Z',
+                'total_cost': '12400.16'
             },
         ]
 
         self.assertEqual(expected_data, serializer_data)
+
+    def test_booking_serializer_save_rejects_overlap(self):
+        user = User.objects.create(username='user', password='password')
+        room = Room.objects.create(number='111', cost_per_day=100, beds=1)
+        Booking.objects.create(room=room, client=user,
+                               start_time='2034-03-29 09:10:01+00:00',
+                               end_time='2034-05-29 09:11:11+00:00')
+
+        # Simulating a concurrent request that passed validation before the first insert.
+        with self.assertRaises(ValidationError):
+            BookingSerializer().create({
+                'room': room,
+                'client': user,
+                'start_time': '2034-04-01 09:10:01+00:00',
+                'end_time': '2034-04-10 09:10:01+00:00'
+            })
+        self.assertEqual(Booking.objects.count(), 1)
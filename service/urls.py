@@ -1,6 +1,8 @@
+from django.urls import path
 from rest_framework.routers import SimpleRouter
 
-from service.views import RoomViewSet, BookingViewSet
+from service.async_views import room_list, room_detail, booking_list
+from service.views import RoomViewSet, BookingViewSet, DatabaseStatsView, MetricsView, OccupancyStatsView
 
 app_name = 'booking'
 
@@ -8,6 +10,13 @@ router = SimpleRouter()
 router.register(r'room', RoomViewSet)
 router.register(r'booking', BookingViewSet)
 
-urlpatterns = []
+urlpatterns = [
+    path('async/room/', room_list, name='async-room-list'),
+    path('async/room/<int:pk>/', room_detail, name='async-room-detail'),
+    path('async/booking/', booking_list, name='async-booking-list'),
+    path('diagnostics/db/', DatabaseStatsView.as_view(), name='diagnostics-db'),
+    path('diagnostics/metrics/', MetricsView.as_view(), name='diagnostics-metrics'),
+    path('stats/occupancy/', OccupancyStatsView.as_view(), name='stats-occupancy'),
+]
 
 urlpatterns += router.urls
@@ -1,14 +1,39 @@
+import codecs
+
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from drf_spectacular.utils import extend_schema_view, extend_schema
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import BaseRenderer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from service.cache import room_cache, room_generation, ROOMS_GENERATION, BOOKINGS_GENERATION
+from service.availability import earliest_free_windows
+from service.diagnostics import database_stats
+from service.exporters import EXPORT_FORMATS, export_bookings
 from service.filters import RoomFilter
+from service.importers import import_rooms, read_rows
+from service.instrumentation import request_metrics
+from service.mixins import ConditionalGetMixin, ReplicaReadMixin
 from service.models import Room, Booking
-from service.permissions import IsAdminOrReadOnly, IsAdminOrRoomClient
-from service.serializers import RoomSerializer, BookingSerializer
+from service.occupancy import room_calendars
+from service.permissions import IsAdmin, IsAdminOrReadOnly, IsAdminOrRoomClient
+from service.pricing import quote
+from service.rollups import occupancy_stats
+from service.serializers import (
+    RoomSerializer, BookingSerializer, BookingBulkSerializer, BookingBulkItemSerializer,
+    RoomImportRequestSerializer, RoomImportResultSerializer, RoomCacheStatsSerializer, DatabaseStatsSerializer,
+    RoomCalendarRequestSerializer, RoomCalendarSerializer, FreeSlotRequestSerializer, FreeSlotSerializer,
+    OccupancyStatsRequestSerializer, OccupancyStatsSerializer, QuoteRequestSerializer, QuoteSerializer
+)
 
 
 @extend_schema(tags=['Комнаты, модель Room'])
@@ -40,8 +65,51 @@ from service.serializers import RoomSerializer, BookingSerializer
         summary='Удаление комнаты',
         description='Доступно только суперюзеру.'
     ),
+    import_rooms=extend_schema(
+        summary='Импорт комнат из файла',
+        description='Доступно только суперюзеру. Принимает файл CSV с заголовком или JSONL с полями '
+                    "'number', 'cost_per_day' и 'beds'. Комнаты с существующими номерами обновляются. "
+                    'Файл обрабатывается пакетами, некорректные строки пропускаются.',
+        request={'multipart/form-data': RoomImportRequestSerializer},
+        responses=RoomImportResultSerializer
+    ),
+    cache_stats=extend_schema(
+        summary='Статистика кэша комнат',
+        description='Доступно только суперюзеру. Количество попаданий и промахов кэша ответов '
+                    'списка и детальной информации о комнатах в текущем процессе.',
+        responses=RoomCacheStatsSerializer
+    ),
+    calendar=extend_schema(
+        summary='Календарь занятости комнат',
+        description='Доступно всем пользователем, в том числе и неавторизованным. Для каждой комнаты '
+                    "возвращается строка занятости с периода 'start' до 'end' (не включая его): один символ "
+                    "на день или час (параметр 'resolution'), '1' - если в это время есть бронирование. "
+                    "Комнаты фильтруются теми же параметрами, что и список, в том числе 'ids' "
+                    "(например, '?ids=1,2,3'). Календари кэшируются по комнатам и месяцам.",
+        parameters=[RoomCalendarRequestSerializer],
+        responses=RoomCalendarSerializer(many=True)
+    ),
+    free_slots=extend_schema(
+        summary='Поиск свободных окон',
+        description='Доступно всем пользователем, в том числе и неавторизованным. Возвращает не больше '
+                    "'limit' комнат с самыми ранними свободными окнами длительностью 'duration', которые "
+                    "начинаются не раньше 'earliest_start' и заканчиваются в пределах 'horizon' от него. "
+                    "Комнаты фильтруются теми же параметрами, что и список (например, 'beds' и 'cost_per_day'), "
+                    'при равном начале окна сохраняется порядок сортировки списка.',
+        parameters=[FreeSlotRequestSerializer],
+        responses=FreeSlotSerializer(many=True)
+    ),
+    quote=extend_schema(
+        summary='Расчет стоимости бронирования',
+        description='Доступно всем пользователем, в том числе и неавторизованным. Стоимость бронирования '
+                    "периода с 'start_time' до 'end_time' для одной или нескольких комнат, указанных "
+                    "параметром 'room' (например, '?room=1&room=2'): стоимость суток, умноженная на "
+                    'длительность в сутках, с округлением до копеек.',
+        parameters=[QuoteRequestSerializer],
+        responses=QuoteSerializer(many=True)
+    ),
 )
-class RoomViewSet(ModelViewSet):
+class RoomViewSet(ReplicaReadMixin, ConditionalGetMixin, ModelViewSet):
     queryset = Room.objects.all()
     permission_classes = [IsAdminOrReadOnly]
     serializer_class = RoomSerializer
@@ -49,6 +117,78 @@ class RoomViewSet(ModelViewSet):
     filterset_class = RoomFilter
     ordering_fields = ['cost_per_day', 'beds']
 
+    def list(self, request, *args, **kwargs):
+        dependencies = [ROOMS_GENERATION]
+        if 'available_rooms' in request.query_params:
+            dependencies.append(BOOKINGS_GENERATION)
+        return room_cache.response(request, 'list', dependencies,
+                                   lambda: super(RoomViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        def render():
+            return super(RoomViewSet, self).retrieve(request, *args, **kwargs)
+
+        # Generations are kept by numeric id, '05' and '5' must share one.
+        if not kwargs['pk'].isdigit():
+            return render()
+        room_id = int(kwargs['pk'])
+        return room_cache.response(request, f'detail:{room_id}', [room_generation(room_id)], render)
+
+    @action(detail=False, methods=['get'])
+    def calendar(self, request, *args, **kwargs):
+        serializer = RoomCalendarRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        rooms = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        calendars = room_calendars([room.pk for room in rooms], params['start'], params['end'], params['resolution'])
+        for room in rooms:
+            room.occupancy = calendars[room.pk]
+        return self.get_paginated_response(RoomCalendarSerializer(rooms, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='free-slots', pagination_class=None)
+    def free_slots(self, request, *args, **kwargs):
+        serializer = FreeSlotRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        windows = earliest_free_windows(self.filter_queryset(self.get_queryset()), params['earliest_start'],
+                                        params['earliest_start'] + params['horizon'], params['duration'],
+                                        params['limit'])
+        rooms = Room.objects.in_bulk([room_id for _, room_id in windows])
+        slots = [{'room': rooms[room_id], 'start_time': start_time, 'end_time': start_time + params['duration']}
+                 for start_time, room_id in windows]
+        return Response(FreeSlotSerializer(slots, many=True).data)
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def quote(self, request, *args, **kwargs):
+        serializer = QuoteRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        costs = dict(Room.objects.filter(pk__in=params['room']).values_list('pk', 'cost_per_day'))
+        missing = [room_id for room_id in dict.fromkeys(params['room']) if room_id not in costs]
+        if missing:
+            raise ValidationError({'room': [f'Invalid pk "{room_id}" - object does not exist.' for room_id in missing]})
+        prices = quote(costs, params['start_time'], params['end_time'])
+        return Response(QuoteSerializer([
+            {'room': room_id, 'cost_per_day': costs[room_id], 'total_cost': prices[room_id]}
+            for room_id in dict.fromkeys(params['room'])
+        ], many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdmin])
+    def cache_stats(self, request, *args, **kwargs):
+        return Response(RoomCacheStatsSerializer(room_cache.stats()).data)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_rooms(self, request, *args, **kwargs):
+        serializer = RoomImportRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            result = import_rooms(read_rows(codecs.iterdecode(data['file'], 'utf-8'), data['file_format']),
+                                  data['batch_size'])
+        except ValueError as exc:
+            raise ValidationError({'file': [str(exc)]})
+        return Response(RoomImportResultSerializer(result).data)
+
 
 @extend_schema(tags=['Бронирования, модель Booking'])
 @extend_schema_view(
@@ -77,21 +217,110 @@ class RoomViewSet(ModelViewSet):
         summary='Удаление бронирования',
         description='Доступно владельцу бронирования и суперюзеру.'
     ),
+    bulk=extend_schema(
+        summary='Массовое создание бронирований',
+        description='Доступно всем авторизованным пользователям. Бронирования проверяются на предмет '
+                    'пересечения друг с другом и с существующими бронированиями и создаются в одной '
+                    'транзакции. Ошибки возвращаются списком в порядке переданных бронирований.',
+        request=BookingBulkItemSerializer(many=True),
+        responses={status.HTTP_201_CREATED: BookingSerializer(many=True)}
+    ),
+    export=extend_schema(
+        summary='Выгрузка всех бронирований',
+        description='Доступно только суперюзеру. Бронирования передаются потоком в формате NDJSON '
+                    "(по умолчанию) или CSV, формат указывается параметром 'file_format'.",
+        parameters=[OpenApiParameter('file_format', enum=EXPORT_FORMATS, required=False)],
+        responses={(status.HTTP_200_OK, 'application/x-ndjson'): OpenApiTypes.STR,
+                   (status.HTTP_200_OK, 'text/csv'): OpenApiTypes.STR}
+    ),
 )
-class BookingViewSet(ModelViewSet):
+class BookingViewSet(ReplicaReadMixin, ConditionalGetMixin, ModelViewSet):
     queryset = Booking.objects.all()
     permission_classes = [IsAuthenticated, IsAdminOrRoomClient]
     serializer_class = BookingSerializer
 
-    def list(self, request, *args, **kwargs):
-        if request.user.is_superuser:
-            queryset = self.filter_queryset(self.get_queryset())
-        else:
-            queryset = self.filter_queryset(self.get_queryset()).filter(client=request.user)
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and not self.request.user.is_superuser:
+            queryset = queryset.filter(client=self.request.user)
+        return queryset
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        serializer = BookingBulkSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.save()
+        return Response(BookingSerializer(bookings, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated, IsAdmin])
+    def export(self, request, *args, **kwargs):
+        file_format = request.query_params.get('file_format', 'ndjson')
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError({'file_format': [f'Expected one of {", ".join(EXPORT_FORMATS)}.']})
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_bookings(self.get_queryset(), file_format),
+                                         content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="bookings.{file_format}"'
+        return response
+
+
+@extend_schema(
+    tags=['Диагностика'],
+    summary='Статистика подключений к базам данных',
+    description='Доступно только суперюзеру. Для каждой базы данных: настройки постоянных подключений, '
+                'количество открытых в текущем процессе подключений и статистика пула подключений, '
+                'если он включен (занятые подключения, ожидающие запросы, время ожидания).',
+    responses=DatabaseStatsSerializer(many=True)
+)
+class DatabaseStatsView(APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(DatabaseStatsSerializer(database_stats(), many=True).data)
+
+
+@extend_schema(
+    tags=['Статистика'],
+    summary='Загрузка комнат и выручка',
+    description='Доступно только суперюзеру. Количество забронированных дней, доля занятого времени '
+                "и выручка по текущей стоимости суток за период с 'start' до 'end' (не включая его) "
+                "по комнатам, дням или месяцам (параметр 'group_by'). Комнаты можно указать параметром "
+                "'room' (например, '?room=1&room=2'). Данные берутся из предварительно посчитанных "
+                'сумм по дням и месяцам, которые обновляются при изменении бронирований; '
+                'периоды без бронирований не возвращаются.',
+    parameters=[OccupancyStatsRequestSerializer],
+    responses=OccupancyStatsSerializer(many=True)
+)
+class OccupancyStatsView(APIView):
+    permission_classes = [IsAdmin]
+
+    def get(self, request, *args, **kwargs):
+        serializer = OccupancyStatsRequestSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        stats = occupancy_stats(params['start'], params['end'], params['group_by'], params.get('room'))
+        return Response(OccupancyStatsSerializer(stats, many=True).data)
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, str) else str(data)
+
+
+@extend_schema(
+    tags=['Диагностика'],
+    summary='Метрики запросов в формате Prometheus',
+    description='Доступно только суперюзеру. Гистограммы времени выполнения, количества и времени запросов '
+                'к базе данных, времени сериализации и размера ответа по представлениям в текущем процессе.',
+    responses={(status.HTTP_200_OK, 'text/plain'): OpenApiTypes.STR}
+)
+class MetricsView(APIView):
+    permission_classes = [IsAdmin]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request, *args, **kwargs):
+        return Response(request_metrics.expose(), content_type='text/plain; version=0.0.4; charset=utf-8')